@@ -3,11 +3,14 @@
 エンティティや部屋定義のデータクラスと、チームで拡張する軽量エンジンを提供する。
 """
 
+from .actions import Action, Opcode
+from .cache import DungeonCache
 from .dungeon import DungeonSetup, build_default_dungeon
+from .events import EventBus
 from .entities import Ghost, Item, ItemType, Player
 from .room import Door, Room
 from .state import GameState
-from .engine import GameEngine
+from .engine import AsyncGameEngine, GameEngine
 from .types import Direction
 
 __all__ = [
@@ -18,8 +21,13 @@ __all__ = [
     "Door",
     "GameState",
     "GameEngine",
+    "AsyncGameEngine",
     "DungeonSetup",
     "build_default_dungeon",
+    "DungeonCache",
     "ItemType",
     "Direction",
+    "Action",
+    "Opcode",
+    "EventBus",
 ]
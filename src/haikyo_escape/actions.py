@@ -0,0 +1,150 @@
+"""エンジンが直接受け付ける型付きの行動表現と、テキストコマンドからの変換。
+
+`Action` はオペコードと小さな整数オペランドだけを持つ。方向はコード（`DIRECTIONS` の添字）、
+アイテムは足元やインベントリの並び順の添字で表すため、ボットや台本から渡す場合は
+文字列の分割や名前照合を一切行わずに解決できる。テキスト入力は `parse_action` で
+同じ表現へ変換してから処理する。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple
+
+from .types import Direction
+
+if TYPE_CHECKING:
+    from .entities import Item
+    from .state import GameState
+
+
+class Opcode(IntEnum):
+    """プレイヤー行動の種別。"""
+
+    MOVE = 1
+    SEARCH = 2
+    TAKE = 3
+    USE = 4
+    WAIT = 5
+    QUIT = 6
+
+
+# オペランドの方向コード -> 方向。
+DIRECTIONS: Tuple[Direction, ...] = tuple(Direction)
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+
+# テキストから解決できなかったオペランド。エラーメッセージを出して処理を続ける。
+NO_MATCH = -1
+
+
+@dataclass(frozen=True)
+class Action:
+    """オペコードと整数オペランドの組。
+
+    - `MOVE` – 方向コードの並び（速度上限を超えた分は切り捨てる）。
+    - `TAKE` – 足元の見えているアイテムの添字。省略すると全部拾う。
+    - `USE` – インベントリの添字。
+    `source` はテキストから変換した場合の元の入力で、ログやテレメトリの表示にだけ使う。
+    """
+
+    opcode: Opcode
+    operands: Tuple[int, ...] = ()
+    source: Optional[str] = None
+
+    @classmethod
+    def move(cls, *directions: Direction) -> "Action":
+        return cls(Opcode.MOVE, tuple(DIRECTION_CODES[direction] for direction in directions))
+
+    @classmethod
+    def take(cls, index: Optional[int] = None) -> "Action":
+        return cls(Opcode.TAKE, () if index is None else (index,))
+
+    @classmethod
+    def use(cls, index: int) -> "Action":
+        return cls(Opcode.USE, (index,))
+
+    def operand_text(self, index: int) -> str:
+        """エラーメッセージ用に、オペランドを入力時の表記で返す。"""
+        if self.source is not None:
+            tokens = self.source.split()
+            if index + 1 < len(tokens):
+                return tokens[index + 1]
+        return str(self.operands[index])
+
+    def __str__(self) -> str:
+        if self.source is not None:
+            return self.source
+        words = [self.opcode.name.lower()]
+        if self.opcode == Opcode.MOVE:
+            words.extend(
+                DIRECTIONS[code].name.lower() if 0 <= code < len(DIRECTIONS) else str(code)
+                for code in self.operands
+            )
+        elif self.opcode == Opcode.TAKE and not self.operands:
+            words.append("all")
+        else:
+            words.extend(str(operand) for operand in self.operands)
+        return " ".join(words)
+
+
+SEARCH = Action(Opcode.SEARCH)
+TAKE_ALL = Action(Opcode.TAKE)
+WAIT = Action(Opcode.WAIT)
+QUIT = Action(Opcode.QUIT)
+
+
+def parse_action(state: "GameState", raw_action: str) -> Optional[Action]:
+    """テキストコマンドを現在の状態に照らして `Action` へ変換する。
+
+    解釈できない入力はその旨をログに残して None を返す。アイテム名の照合は
+    行動を解決する直前の状態で行うため、添字はそのターンの並び順と一致する。
+    """
+    text = (raw_action or "").strip()
+    if not text:
+        state.record("No action specified.")
+        return None
+
+    tokens = text.split()
+    verb = tokens[0].lower()
+    args = tokens[1:]
+
+    if verb == "move":
+        return Action(Opcode.MOVE, tuple(_direction_code(token) for token in args), raw_action)
+    if verb == "search":
+        return Action(Opcode.SEARCH, (), raw_action)
+    if verb == "take":
+        if not args or args[0].lower() == "all":
+            return Action(Opcode.TAKE, (), raw_action)
+        player = state.player
+        items = state.items_at_position(player.room_id, player.position, include_hidden=False)
+        return Action(Opcode.TAKE, (_match_item(items, args[0]),), raw_action)
+    if verb == "use":
+        if not args:
+            return Action(Opcode.USE, (), raw_action)
+        return Action(Opcode.USE, (_match_item(state.player.inventory, args[0]),), raw_action)
+    if verb == "wait":
+        return Action(Opcode.WAIT, (), raw_action)
+    if verb == "quit":
+        return Action(Opcode.QUIT, (), raw_action)
+
+    state.record(f"Unknown action '{raw_action}'.")
+    return None
+
+
+def _direction_code(token: str) -> int:
+    try:
+        return DIRECTION_CODES[Direction.from_token(token)]
+    except ValueError:
+        return NO_MATCH
+
+
+def _match_item(items: Sequence["Item"], token: str) -> int:
+    """ID・名前（大文字小文字を区別しない）、次に添字の順でアイテムを探す。"""
+    query = token.lower()
+    for index, item in enumerate(items):
+        if item.item_id.lower() == query or item.name.lower() == query:
+            return index
+    if query.isdigit() and int(query) < len(items):
+        return int(query)
+    return NO_MATCH
@@ -0,0 +1,66 @@
+"""難易度調整用のパラメータをまとめた設定。
+
+`GameEngine(balance=...)` に渡すと、幽霊の出現間隔・出現確率・移動距離とアイテムの効果時間を
+コードを書き換えずに変えられる。既定値は従来のルール（5歩ごとに1/6、2/3で1マス）と同じ。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field, fields
+from typing import Dict, Mapping
+
+from .entities import Item
+
+# メタデータにも上書きにも効果時間がないアイテムの既定ターン数。
+DEFAULT_SPEED_BOOST_TURNS = 5
+DEFAULT_FREEZE_TURNS = 3
+
+# スイープのパラメータ名でアイテムの効果時間を指定するときの接頭辞（例: "duration.GHOST_FREEZE"）。
+DURATION_PREFIX = "duration."
+
+
+@dataclass(frozen=True)
+class BalanceConfig:
+    """幽霊とアイテムに関する調整値。"""
+
+    # 1体目の出現判定を行う累計歩数の間隔。
+    first_spawn_interval: int = 5
+    # 出現判定の成功確率の分母（1/N）。
+    spawn_one_in: int = 6
+    # 幽霊が1ターンに1マスだけ動く確率。残りは2マス動く。
+    ghost_single_step_chance: float = 2 / 3
+    # アイテム ID または `ItemType` 名 -> 効果ターン数。アイテム ID の指定を優先する。
+    item_durations: Mapping[str, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.first_spawn_interval <= 0:
+            raise ValueError("first_spawn_interval must be positive.")
+        if self.spawn_one_in <= 0:
+            raise ValueError("spawn_one_in must be positive.")
+        if not 0.0 <= self.ghost_single_step_chance <= 1.0:
+            raise ValueError("ghost_single_step_chance must be between 0 and 1.")
+
+    @classmethod
+    def from_params(cls, params: Mapping[str, object]) -> "BalanceConfig":
+        """フィールド名と `duration.<アイテムID または種別名>` をキーにした辞書から組み立てる。"""
+        names = {f.name for f in fields(cls)} - {"item_durations"}
+        values: Dict[str, object] = {}
+        durations: Dict[str, int] = {}
+        for key, value in params.items():
+            if key.startswith(DURATION_PREFIX):
+                durations[key[len(DURATION_PREFIX):]] = int(value)  # type: ignore[call-overload]
+            elif key in names:
+                values[key] = value
+            else:
+                raise ValueError(f"Unknown balance parameter '{key}'.")
+        return cls(item_durations=durations, **values)  # type: ignore[arg-type]
+
+    def duration_for(self, item: Item, default: int) -> int:
+        """`item` の効果ターン数。上書きがなければアイテムのメタデータ、それもなければ `default`。"""
+        # 探索時に引いたアイテムの ID は "<テンプレート ID>@<部屋>:<座標>" なので、テンプレート ID で引く。
+        override = self.item_durations.get(item.item_id.split("@", 1)[0])
+        if override is None:
+            override = self.item_durations.get(item.item_type.name)
+        if override is not None:
+            return override
+        return int(item.metadata.get("duration", default))  # type: ignore[call-overload]
@@ -0,0 +1,372 @@
+"""生成済みダンジョンをディスクへ保存し、同じシードでの再生成を省くキャッシュ。
+
+キーは (生成器バージョン, シード, パラメータ) から作るダイジェストで、内容はタプルだけで
+表現した `DungeonSetup` を `marshal` で直列化したもの。容量を超えたら最も古く参照された
+エントリから削除する（サイズ基準の LRU）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import random
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Mapping, Optional
+
+from .dungeon import GENERATOR_VERSION, DungeonSetup, build_default_dungeon
+from .entities import Item, ItemType
+from .loot import LootEntry, LootTable, LootTables
+from .room import Door, Room, RoomLayout
+from .types import Direction
+
+DungeonBuilder = Callable[..., DungeonSetup]
+
+# 直列化形式を変えたら更新する。古い形式のファイルは別キーになり自然に追い出される。
+_FORMAT_VERSION = 2
+_SUFFIX = ".dgn"
+
+# 直列化済みの部屋行 -> 復元済みレイアウト。生成マップのように毎回異なる場合に備えて上限を設ける。
+_layouts: dict[tuple, RoomLayout] = {}
+_LAYOUT_INTERN_LIMIT = 4096
+
+
+def cache_key(version: str, seed: int, params: Optional[Mapping[str, object]] = None) -> str:
+    """生成器バージョン・シード・パラメータから内容アドレスを求める。"""
+    material = repr((_FORMAT_VERSION, version, seed, sorted((params or {}).items())))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def dump_setup(setup: DungeonSetup) -> bytes:
+    """`DungeonSetup` をタプルのみの構造に落として直列化する。"""
+    rooms = tuple(
+        (
+            room.room_id,
+            room.name,
+            room.width,
+            room.height,
+            tuple(sorted(room.walls)),
+            tuple(sorted(room.fragile_walls)),
+            tuple(sorted(room.explore_positions)),
+            tuple(
+                (position, tuple(sorted(direction.name for direction in directions)))
+                for position, directions in room.one_way_exits.items()
+            ),
+            tuple(
+                (
+                    direction.name,
+                    door.target_room_id,
+                    door.position,
+                    door.target_position,
+                    door.direction.name,
+                    door.is_locked,
+                    door.requires_key,
+                    door.one_way,
+                )
+                for direction, door in room.doors.items()
+            ),
+        )
+        for room in setup.rooms.values()
+    )
+    items = tuple(
+        (
+            item.item_id,
+            item.name,
+            item.item_type.name,
+            item.room_id,
+            item.hidden,
+            item.position,
+            dict(item.metadata),
+        )
+        for item in setup.items.values()
+    )
+    payload = (
+        _FORMAT_VERSION,
+        rooms,
+        items,
+        setup.start_room_id,
+        setup.start_position,
+        setup.exit_room_id,
+        setup.exit_position,
+        tuple(sorted(setup.safe_rooms)),
+        _dump_loot(setup.loot),
+    )
+    return marshal.dumps(payload)
+
+
+def _dump_loot(loot: Optional[LootTables]) -> Optional[tuple]:
+    if loot is None:
+        return None
+    return (
+        loot.seed,
+        _dump_table(loot.default),
+        tuple((room_id, _dump_table(table)) for room_id, table in loot.rooms.items()),
+        tuple(
+            (room_id, position, _dump_table(table))
+            for (room_id, position), table in loot.tiles.items()
+        ),
+    )
+
+
+def _dump_table(table: Optional[LootTable]) -> Optional[tuple]:
+    if table is None:
+        return None
+    entries = tuple(
+        (entry.key, entry.name, entry.item_type.name, entry.weight, dict(entry.metadata))
+        for entry in table.entries
+    )
+    return (entries, table.empty_weight)
+
+
+def load_setup(data: bytes) -> DungeonSetup:
+    """`dump_setup` の出力から新しい `DungeonSetup` を組み立てる。
+
+    保存時点で検証済みのため、`RoomLayout.add_*` の範囲チェックは通さずに集合を直接詰める。
+    """
+    payload = marshal.loads(data)
+    if payload[0] != _FORMAT_VERSION:
+        raise ValueError(f"Unsupported dungeon cache format: {payload[0]}")
+    (
+        _,
+        room_rows,
+        item_rows,
+        start_room_id,
+        start_position,
+        exit_room_id,
+        exit_position,
+        safe,
+        loot,
+    ) = payload
+
+    rooms: dict[str, Room] = {}
+    for row in room_rows:
+        # 同じ内容のレイアウトはプロセス内で1つだけ作り、全ゲームで共有する。
+        layout = _layouts.get(row)
+        if layout is None:
+            if len(_layouts) >= _LAYOUT_INTERN_LIMIT:
+                _layouts.clear()
+            layout = _layouts[row] = _build_layout(row)
+        rooms[layout.room_id] = Room(layout=layout)
+
+    items = {
+        item_id: Item(
+            item_id=item_id,
+            name=name,
+            item_type=ItemType[item_type],
+            room_id=room_id,
+            hidden=hidden,
+            position=position,
+            metadata=metadata,
+        )
+        for item_id, name, item_type, room_id, hidden, position, metadata in item_rows
+    }
+    return DungeonSetup(
+        rooms=rooms,
+        items=items,
+        start_room_id=start_room_id,
+        start_position=start_position,
+        exit_room_id=exit_room_id,
+        exit_position=exit_position,
+        safe_rooms=set(safe),
+        loot=_load_loot(loot),
+    )
+
+
+def _load_loot(row: Optional[tuple]) -> Optional[LootTables]:
+    if row is None:
+        return None
+    seed, default, rooms, tiles = row
+    # 同じ内容のテーブルは1つにまとめる（部屋ごとに同じテーブルを割り当てることが多い）。
+    tables: dict[str, LootTable] = {}
+
+    def table(table_row: Optional[tuple]) -> Optional[LootTable]:
+        if table_row is None:
+            return None
+        key = repr(table_row)
+        if key not in tables:
+            entries, empty_weight = table_row
+            tables[key] = LootTable(
+                [
+                    LootEntry(entry_key, name, ItemType[item_type], weight, metadata)
+                    for entry_key, name, item_type, weight, metadata in entries
+                ],
+                empty_weight=empty_weight,
+            )
+        return tables[key]
+
+    return LootTables(
+        seed=seed,
+        default=table(default),
+        rooms={room_id: table(table_row) for room_id, table_row in rooms},  # type: ignore[misc]
+        tiles={  # type: ignore[misc]
+            (room_id, position): table(table_row) for room_id, position, table_row in tiles
+        },
+    )
+
+
+def _build_layout(row: tuple) -> RoomLayout:
+    room_id, name, width, height, walls, fragile, explore, one_way, doors = row
+    layout = RoomLayout(
+        room_id=room_id,
+        name=name,
+        width=width,
+        height=height,
+        walls=set(walls),
+        fragile_walls=set(fragile),
+        explore_positions=set(explore),
+        one_way_exits={
+            position: {Direction[name] for name in names} for position, names in one_way
+        },
+    )
+    for door_row in doors:
+        (
+            key,
+            target,
+            position,
+            target_position,
+            direction,
+            locked,
+            requires_key,
+            one_way_door,
+        ) = door_row
+        door = Door(
+            target_room_id=target,
+            position=position,
+            target_position=target_position,
+            direction=Direction[direction],
+            is_locked=locked,
+            requires_key=requires_key,
+            one_way=one_way_door,
+        )
+        layout.doors[Direction[key]] = door
+        layout.door_positions[position] = door
+    return layout
+
+
+class DungeonCache:
+    """シード付きダンジョン生成の結果をディレクトリに保持する LRU キャッシュ。
+
+    復元にも部屋とアイテムの組み立て直しがかかるため、効果があるのは生成に時間のかかる
+    手続き生成（100部屋で生成 約2ms に対し復元 約0.5ms）。標準ダンジョンは生成と復元が
+    同程度なので、シミュレーションでは `simulation.procedural_setups` からだけ使う。
+    """
+
+    def __init__(
+        self, directory: str | os.PathLike[str], max_bytes: int = 64 * 1024 * 1024
+    ) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive.")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # ダイジェスト -> ファイルサイズ。先頭ほど長く参照されていない。
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        self._scan()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get_or_build(
+        self,
+        seed: Optional[int],
+        *,
+        params: Optional[Mapping[str, object]] = None,
+        builder: DungeonBuilder = build_default_dungeon,
+        version: str = GENERATOR_VERSION,
+    ) -> DungeonSetup:
+        """キャッシュ済みならそれを復元し、なければ `builder(Random(seed), **params)` で生成する。
+
+        シードが `None` の場合は再現性がないため、キャッシュを通さず毎回生成する。
+        """
+        params = dict(params or {})
+        if seed is None:
+            return builder(random.Random(), **params)
+
+        key = cache_key(f"{builder.__module__}.{builder.__qualname__}:{version}", seed, params)
+        setup = self._load(key)
+        if setup is not None:
+            self.hits += 1
+            return setup
+
+        self.misses += 1
+        setup = builder(random.Random(seed), **params)
+        self._store(key, dump_setup(setup))
+        return setup
+
+    def clear(self) -> None:
+        for key in list(self._entries):
+            self._evict(key)
+
+    # ------------------------------------------------------------------
+    # 内部処理
+    # ------------------------------------------------------------------
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{_SUFFIX}"
+
+    def _scan(self) -> None:
+        found = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._shrink()
+
+    def _load(self, key: str) -> Optional[DungeonSetup]:
+        if key not in self._entries:
+            return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            setup = load_setup(data)
+        except (OSError, ValueError, EOFError, TypeError):
+            # 別プロセスに消された・壊れたファイルは取り除いて再生成に回す。
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        try:
+            os.utime(path)  # 再起動後も参照順を復元できるよう mtime を更新する。
+        except OSError:
+            pass
+        return setup
+
+    def _store(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)
+        self._entries[key] = len(data)
+        self._total_bytes += len(data)
+        self._shrink()
+
+    def _shrink(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._evict(oldest)
+
+    def _evict(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is None:
+            return
+        self._total_bytes -= size
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
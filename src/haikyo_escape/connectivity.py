@@ -0,0 +1,491 @@
+"""ドア単位の到達可能性グラフと、強連結成分による「詰み」の検出。
+
+部屋の中のマス移動は部屋ごとの BFS で畳み込み、ノードは「ドアのマス・ドアの到着マス・
+明示した地点」だけにする。一方通行ドア・一方通行床・施錠ドア・崩した壁をすべて反映するため、
+「今の所持品と崩した壁のまま、ここから出口へ辿り着けるか」をマス数に比例する時間で判定できる。
+`validate_seeds` はシードごとの検証をプロセスプールへ配り、生成器のスイープで使う。
+"""
+
+from __future__ import annotations
+
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .dungeon import DungeonSetup, build_default_dungeon
+from .entities import Item, ItemType
+from .room import Door, Room
+from .types import Direction, Position
+
+if TYPE_CHECKING:
+    from .cache import DungeonBuilder
+    from .state import GameState
+
+Node = Tuple[str, Position]
+# `EscapeMonitor` がグラフを作り直す条件。
+EscapeInputs = Tuple[int, bool, bool, Tuple[Node, ...]]
+
+_STEPS = tuple((direction, *direction.delta) for direction in Direction)
+
+
+class DoorGraph:
+    """部屋をまたぐ移動を辺に持つ有向グラフ。
+
+    `has_key` なら施錠ドアを通れるものとし、`can_break` なら崩れていない脆い壁も通路とみなす
+    （破壊道具を使える前提の楽観的な判定）。`points` には出口やアイテムなど、到達判定の
+    対象にしたいマスを渡す。
+    """
+
+    def __init__(
+        self,
+        rooms: Mapping[str, Room],
+        *,
+        has_key: bool = False,
+        can_break: bool = False,
+        points: Iterable[Node] = (),
+    ) -> None:
+        self.rooms = rooms
+        self.has_key = has_key
+        self.can_break = can_break
+        self.nodes: List[Node] = []
+        self._index: Dict[Node, int] = {}
+        self._edges: List[List[int]] = []
+        self._components: Optional[List[int]] = None
+        self._reverse: Optional[List[List[int]]] = None
+        # `entry_nodes` で使った部屋ごとのマス遷移。毎ターンの問い合わせで作り直さない。
+        self._successor_cache: Dict[str, Dict[Position, Tuple[List[Position], List[int]]]] = {}
+
+        anchors: Dict[str, List[Position]] = {room_id: [] for room_id in rooms}
+        for room_id, room in rooms.items():
+            for door in room.doors.values():
+                anchors[room_id].append(door.position)
+                anchors.setdefault(door.target_room_id, []).append(door.target_position)
+        for room_id, position in points:
+            anchors.setdefault(room_id, []).append(position)
+        for room_id, positions in anchors.items():
+            for position in positions:
+                self._add_node((room_id, position))
+
+        for room_id, positions in anchors.items():
+            room = rooms.get(room_id)
+            if room is None:
+                continue
+            successors = self._successors(room_id, room)
+            for position in dict.fromkeys(positions):
+                source = self._index[(room_id, position)]
+                self._edges[source] = [
+                    target
+                    for target in self._walk(room_id, successors, position)
+                    if target != source
+                ]
+
+    # ------------------------------------------------------------------
+    # 構築
+    # ------------------------------------------------------------------
+    def _add_node(self, node: Node) -> int:
+        index = self._index.get(node)
+        if index is None:
+            index = self._index[node] = len(self.nodes)
+            self.nodes.append(node)
+            self._edges.append([])
+        return index
+
+    def _successors(
+        self, room_id: str, room: Room
+    ) -> Dict[Position, Tuple[List[Position], List[int]]]:
+        """マスごとに、1手で動ける部屋内のマスと、ドアをくぐった先のノードを求める。
+
+        判定は `GameState.move_player_step` と同じ順で行う（足元のドア → 一方通行床 → 前方のドア → 壁）。
+        """
+        result: Dict[Position, Tuple[List[Position], List[int]]] = {}
+        width, height = room.width, room.height
+        doors = room.door_positions
+        one_way = room.one_way_exits
+        blocked = room.walls
+        if self.can_break:
+            blocked = blocked - room.fragile_walls
+        for y in range(height):
+            for x in range(width):
+                position = (x, y)
+                tiles: List[Position] = []
+                crossings: List[int] = []
+                door_here = doors.get(position)
+                allowed = one_way.get(position)
+                for direction, dx, dy in _STEPS:
+                    if door_here is not None and door_here.direction == direction:
+                        self._cross(door_here, crossings)
+                        continue
+                    if allowed is not None and direction not in allowed:
+                        continue
+                    candidate = (x + dx, y + dy)
+                    door_ahead = doors.get(candidate)
+                    if door_ahead is not None and door_ahead.direction == direction:
+                        self._cross(door_ahead, crossings)
+                    elif (
+                        0 <= candidate[0] < width
+                        and 0 <= candidate[1] < height
+                        and candidate not in blocked
+                    ):
+                        tiles.append(candidate)
+                result[position] = (tiles, crossings)
+        return result
+
+    def _cross(self, door: Door, crossings: List[int]) -> None:
+        if door.is_locked and not self.has_key:
+            return
+        target = self._index.get((door.target_room_id, door.target_position))
+        if target is not None:
+            crossings.append(target)
+
+    def _walk(
+        self,
+        room_id: str,
+        successors: Dict[Position, Tuple[List[Position], List[int]]],
+        origin: Position,
+    ) -> Set[int]:
+        """`origin` から部屋の中を歩いて届くノードと、ドアをくぐった先のノードを返す。"""
+        reached: Set[int] = set()
+        if origin not in successors:
+            return reached
+        seen = {origin}
+        queue = deque([origin])
+        index = self._index
+        while queue:
+            position = queue.popleft()
+            node = index.get((room_id, position))
+            if node is not None:
+                reached.add(node)
+            tiles, crossings = successors[position]
+            reached.update(crossings)
+            for candidate in tiles:
+                if candidate not in seen:
+                    seen.add(candidate)
+                    queue.append(candidate)
+        return reached
+
+    # ------------------------------------------------------------------
+    # 到達判定
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def entry_nodes(self, node: Node) -> Set[int]:
+        """任意のマスから部屋の中を歩いて最初に届くノード。マス自体がノードならそれだけを返す。"""
+        index = self._index.get(node)
+        if index is not None:
+            return {index}
+        room_id, position = node
+        successors = self._successor_cache.get(room_id)
+        if successors is None:
+            room = self.rooms.get(room_id)
+            if room is None:
+                return set()
+            successors = self._successor_cache[room_id] = self._successors(room_id, room)
+        return self._walk(room_id, successors, position)
+
+    def index_of(self, node: Node) -> Optional[int]:
+        return self._index.get(node)
+
+    def reachable(self, sources: Iterable[Node]) -> Set[Node]:
+        """`sources` のいずれかから到達できるノードの集合。"""
+        return {self.nodes[index] for index in self._reachable_indices(sources)}
+
+    def can_reach(self, source: Node, target: Node) -> bool:
+        target_index = self._index.get(target)
+        if target_index is None:
+            raise KeyError(f"{target} is not a node; pass it in `points` when building the graph.")
+        return target_index in self._reachable_indices((source,))
+
+    def _reachable_indices(self, sources: Iterable[Node]) -> Set[int]:
+        seen: Set[int] = set()
+        for source in sources:
+            seen |= self.entry_nodes(source)
+        queue = deque(seen)
+        edges = self._edges
+        while queue:
+            for target in edges[queue.popleft()]:
+                if target not in seen:
+                    seen.add(target)
+                    queue.append(target)
+        return seen
+
+    def coreachable(self, targets: Iterable[Node]) -> Set[int]:
+        """`targets` のいずれかへ到達できるノードの番号（`entry_nodes` と同じ）。逆向きの辺で BFS する。"""
+        if self._reverse is None:
+            self._reverse = [[] for _ in self.nodes]
+            for source, edges in enumerate(self._edges):
+                for target in edges:
+                    self._reverse[target].append(source)
+        reverse = self._reverse
+        seen = {self._index[node] for node in targets}
+        queue = deque(seen)
+        while queue:
+            for source in reverse[queue.popleft()]:
+                if source not in seen:
+                    seen.add(source)
+                    queue.append(source)
+        return seen
+
+    # ------------------------------------------------------------------
+    # 強連結成分
+    # ------------------------------------------------------------------
+    def component_ids(self) -> List[int]:
+        """ノードごとの強連結成分の番号（Tarjan 法、反復版）。番号は逆トポロジカル順に振られる。"""
+        if self._components is not None:
+            return self._components
+        count = len(self.nodes)
+        edges = self._edges
+        order = [-1] * count
+        low = [0] * count
+        component = [-1] * count
+        on_stack = [False] * count
+        stack: List[int] = []
+        counter = 0
+        next_component = 0
+        for root in range(count):
+            if order[root] != -1:
+                continue
+            work: List[Tuple[int, int]] = [(root, 0)]
+            while work:
+                node, edge_index = work.pop()
+                if edge_index == 0:
+                    order[node] = low[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack[node] = True
+                else:
+                    # 子から戻ってきたところ。子の low を取り込む。
+                    low[node] = min(low[node], low[edges[node][edge_index - 1]])
+                node_edges = edges[node]
+                while edge_index < len(node_edges):
+                    child = node_edges[edge_index]
+                    edge_index += 1
+                    if order[child] == -1:
+                        work.append((node, edge_index))
+                        work.append((child, 0))
+                        break
+                    if on_stack[child]:
+                        low[node] = min(low[node], order[child])
+                else:
+                    if low[node] == order[node]:
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component[member] = next_component
+                            if member == node:
+                                break
+                        next_component += 1
+        self._components = component
+        return component
+
+    def components(self) -> List[List[Node]]:
+        grouped: Dict[int, List[Node]] = {}
+        for index, component in enumerate(self.component_ids()):
+            grouped.setdefault(component, []).append(self.nodes[index])
+        return [grouped[component] for component in sorted(grouped)]
+
+    def traps(self, source: Node, target: Node) -> List[List[Node]]:
+        """`source` から入れるのに `target` へ抜けられない強連結成分（詰みの領域）を返す。
+
+        成分の縮約グラフで出口を持たない成分（シンク）のうち、`target` を含まないものだけを
+        数える。そこへ入るとどう動いても `target` には戻れない。
+        """
+        if target not in self._index:
+            raise KeyError(f"{target} is not a node; pass it in `points` when building the graph.")
+        component = self.component_ids()
+        target_component = component[self._index[target]]
+        reachable = self._reachable_indices((source,))
+        has_exit: Set[int] = set()
+        for node in reachable:
+            for child in self._edges[node]:
+                if component[child] != component[node]:
+                    has_exit.add(component[node])
+        trapped: Dict[int, List[Node]] = {}
+        for node in sorted(reachable):
+            node_component = component[node]
+            if node_component not in has_exit and node_component != target_component:
+                trapped.setdefault(node_component, []).append(self.nodes[node])
+        return [trapped[key] for key in sorted(trapped)]
+
+
+# ---------------------------------------------------------------------------
+# ゲーム状態・生成結果への適用
+# ---------------------------------------------------------------------------
+
+
+class EscapeMonitor:
+    """プレイヤーがまだ出口へ辿り着けるかを毎ターン判定するためのキャッシュ。
+
+    「出口へ辿り着けるノード」の集合を、所持品（正規の鍵・破壊道具の有無と鍵の位置）と
+    壁（`state.layout_version`）が変わったときだけ作り直す。毎ターンの判定は、プレイヤーの
+    いる部屋の中を歩いて届くノードがその集合に含まれるかを見るだけで済む。
+    """
+
+    def __init__(self) -> None:
+        self._signature: Optional[Tuple[object, ...]] = None
+        self._inputs: Optional[EscapeInputs] = None
+        self._graph: Optional[DoorGraph] = None
+        self._alive: Set[int] = set()
+        self._default = True
+        # マス -> 判定結果。同じマスへ戻ってきたときは部屋の中を歩き直さない。
+        self._verdicts: Dict[Node, bool] = {}
+        self.rebuilds = 0
+
+    def can_escape(self, state: "GameState") -> bool:
+        signature = _escape_signature(state)
+        if signature != self._signature:
+            self._signature = signature
+            # 鍵や破壊道具に関係しない所持品の変化なら、グラフはそのまま使える。
+            inputs = _escape_inputs(state)
+            if inputs != self._inputs:
+                self._rebuild(state, inputs)
+        if self._graph is None:
+            return self._default
+        here = (state.player.room_id, state.player.position)
+        verdict = self._verdicts.get(here)
+        if verdict is None:
+            verdict = not self._alive.isdisjoint(self._graph.entry_nodes(here))
+            self._verdicts[here] = verdict
+        return verdict
+
+    def _rebuild(self, state: "GameState", inputs: EscapeInputs) -> None:
+        self._inputs = inputs
+        self.rebuilds += 1
+        self._graph = None
+        self._alive = set()
+        self._verdicts.clear()
+        _, has_key, can_break, keys = inputs
+        if state.exit_room_id is None or state.exit_position is None:
+            self._default = True
+            return
+        self._default = False
+        exit_node: Node = (state.exit_room_id, state.exit_position)
+
+        with_key = DoorGraph(
+            state.rooms, has_key=True, can_break=can_break, points=(exit_node, *keys)
+        )
+        alive = with_key.coreachable((exit_node,))
+        if has_key:
+            self._graph, self._alive = with_key, alive
+            return
+
+        # 鍵を拾った地点から出口へ行ける鍵だけを、鍵なしのグラフでの目標にする。
+        usable = [node for node in keys if with_key.index_of(node) in alive]
+        if not usable:
+            return
+        without_key = DoorGraph(state.rooms, can_break=can_break, points=usable)
+        self._graph = without_key
+        self._alive = without_key.coreachable(usable)
+
+
+def can_escape(state: "GameState") -> bool:
+    """今の所持品と崩した壁のまま、プレイヤーが出口へ辿り着ける可能性があるか。
+
+    鍵を持っていなければ、まだ手に入る正規の鍵まで歩けてかつそこから出口へ行けるかで判定する。
+    破壊道具が残っていれば（所持・未発見を問わず）脆い壁はすべて崩せるものと楽観的に扱い、
+    詰んでいないのに詰みと判定することはない。毎ターン判定する場合は `EscapeMonitor` を使う。
+    """
+    return EscapeMonitor().can_escape(state)
+
+
+def _escape_signature(state: "GameState") -> Tuple[object, ...]:
+    """到達可能性が変わり得るときに必ず変わるキー。
+
+    鍵や破壊道具を拾えば所持数が、使えば `items_used` が、壁が崩れれば `layout_version` が進む。
+    """
+    return (state.layout_version, len(state.player.inventory), state.items_used)
+
+
+def _escape_inputs(state: "GameState") -> EscapeInputs:
+    """(壁の版, 正規の鍵を持っているか, 破壊道具が残っているか, 拾える正規の鍵の位置)。"""
+    can_break = False
+    keys: List[Node] = []
+    for item in state.items.values():
+        if item.item_type == ItemType.WALL_BREAKER and item.room_id != "consumed":
+            can_break = True
+        elif _is_master_key(item):
+            node = _item_node(item)
+            if node is not None:
+                keys.append(node)
+    if not can_break and state.loot is not None:
+        # まだ調べていない探索マスから破壊道具が出る可能性がある。
+        can_break = state.loot.may_yield(ItemType.WALL_BREAKER)
+    return state.layout_version, state._player_has_valid_key(), can_break, tuple(keys)
+
+
+def validate_setup(setup: DungeonSetup) -> List[str]:
+    """生成結果の問題点を文字列で返す。空なら、破壊道具を使わずに必ず脱出できる配置。
+
+    鍵を拾う前に入り込むと鍵へ戻れなくなる領域と、鍵を拾った後に出口へ行けなくなる領域も
+    詰みとして報告する。
+    """
+    problems: List[str] = []
+    start: Node = (setup.start_room_id, setup.start_position)
+    exit_node: Node = (setup.exit_room_id, setup.exit_position)
+    key = next((_item_node(item) for item in setup.items.values() if _is_master_key(item)), None)
+    if key is None:
+        return ["no master key is placed"]
+
+    before = DoorGraph(setup.rooms, points=(start, key))
+    if not before.can_reach(start, key):
+        problems.append(f"master key at {key} is unreachable from the start {start}")
+    else:
+        for trap in before.traps(start, key):
+            problems.append(f"before the key, trapped in {_describe(trap)}")
+
+    after = DoorGraph(setup.rooms, has_key=True, points=(key, exit_node))
+    if not after.can_reach(key, exit_node):
+        problems.append(f"exit {exit_node} is unreachable from the master key {key}")
+    else:
+        for trap in after.traps(key, exit_node):
+            problems.append(f"after the key, trapped in {_describe(trap)}")
+    return problems
+
+
+def validate_seeds(
+    seeds: Sequence[int],
+    *,
+    builder: "DungeonBuilder" = build_default_dungeon,
+    params: Optional[Mapping[str, object]] = None,
+    max_workers: Optional[int] = None,
+) -> Dict[int, List[str]]:
+    """各シードで `builder(Random(seed), **params)` を生成して検証し、問題のあったシードだけを返す。
+
+    `builder` はプロセス間で受け渡すため、モジュールの最上位で定義した関数であること。
+    `max_workers=0` ならプロセスプールを使わずにこのプロセスで順に検証する。
+    """
+    params = dict(params or {})
+    jobs = [(seed, builder, params) for seed in seeds]
+    if max_workers == 0:
+        results = map(_validate_seed, jobs)
+        return {seed: problems for seed, problems in results if problems}
+    workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return {
+            seed: problems
+            for seed, problems in pool.map(_validate_seed, jobs, chunksize=chunksize)
+            if problems
+        }
+
+
+def _validate_seed(job: Tuple[int, "DungeonBuilder", Dict[str, object]]) -> Tuple[int, List[str]]:
+    seed, builder, params = job
+    return seed, validate_setup(builder(random.Random(seed), **params))
+
+
+def _is_master_key(item: Item) -> bool:
+    return item.item_type == ItemType.KEY and bool(item.metadata.get("is_master", False))
+
+
+def _item_node(item: Item) -> Optional[Node]:
+    if item.position is None or item.room_id in ("inventory", "consumed"):
+        return None
+    return (item.room_id, item.position)
+
+
+def _describe(nodes: List[Node]) -> str:
+    rooms = sorted({room_id for room_id, _ in nodes})
+    return ", ".join(rooms)
@@ -0,0 +1,142 @@
+"""観戦者やリモート UI 向けに、ある版数以降の状態変化だけをまとめた差分。
+
+`GameState` は変更のたびに (種別, キー) を変更ジャーナルへ積み、`diff_since(version)` は
+その区間に触れられたキーの現在値だけを読み出す。全体のスナップショット同士を比較しない。
+同じ区間の差分は状態側でメモ化され、JSON 化もオブジェクトごとに1回しか行わないため、
+同じ版数の観戦者が多数いても計算と直列化のコストは1回分で済む。
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .entities import Ghost, Item
+    from .state import GameState
+
+# 変更ジャーナルの種別。
+PLAYER = "player"
+GHOST = "ghost"
+ITEM = "item"
+WALL = "wall"
+EFFECT = "effect"
+LOG = "log"
+
+Change = Tuple[str, object]
+
+
+@dataclass
+class StateDelta:
+    """`since` から `version` までの変化。`full` のときは全体のスナップショット。
+
+    位置は `[部屋ID, x, y]`、インベントリ内や消費済みのアイテムは座標を持たない。
+    効果は `"種別:対象"` をキーに残りターン数（0 は解除）を持つ。
+    """
+
+    since: int
+    version: int
+    full: bool
+    turn: int
+    is_over: bool
+    winner: Optional[str]
+    player: Optional[List[object]] = None
+    ghosts: Dict[str, List[object]] = field(default_factory=dict)
+    items: Dict[str, List[object]] = field(default_factory=dict)
+    walls: List[List[object]] = field(default_factory=list)
+    effects: Dict[str, int] = field(default_factory=dict)
+    log: List[str] = field(default_factory=list)
+    _json: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, object]:
+        payload: Dict[str, object] = {
+            "since": self.since,
+            "version": self.version,
+            "full": self.full,
+            "turn": self.turn,
+            "is_over": self.is_over,
+            "winner": self.winner,
+        }
+        if self.player is not None:
+            payload["player"] = self.player
+        for name in ("ghosts", "items", "walls", "effects", "log"):
+            value = getattr(self, name)
+            if value:
+                payload[name] = value
+        return payload
+
+    def to_json(self) -> bytes:
+        """UTF-8 の JSON。初回だけ直列化し、以降は同じバイト列を返す。"""
+        if self._json is None:
+            text = json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+            self._json = text.encode("utf-8")
+        return self._json
+
+
+def build_delta(state: "GameState", since: int, changes: Optional[Iterable[Change]]) -> StateDelta:
+    """`changes` に触れられたキーの現在値から差分を組み立てる。None なら全体を返す。"""
+    delta = StateDelta(
+        since=since,
+        version=state.version,
+        full=changes is None,
+        turn=state.turn_count,
+        is_over=state.is_over,
+        winner=state.winner,
+    )
+    if changes is None:
+        _fill_full(state, delta)
+        return delta
+
+    ghosts = {ghost.entity_id: ghost for ghost in state.ghosts}
+    first_log: Optional[int] = None
+    for kind, key in changes:
+        if kind == LOG:
+            if first_log is None:
+                first_log = key  # type: ignore[assignment]
+        elif kind == PLAYER:
+            delta.player = _player_row(state)
+        elif kind == GHOST:
+            ghost = ghosts.get(key)  # type: ignore[arg-type]
+            if ghost is not None:
+                delta.ghosts[ghost.entity_id] = _ghost_row(ghost)
+        elif kind == ITEM:
+            item = state.items.get(key)  # type: ignore[arg-type]
+            if item is not None:
+                delta.items[item.item_id] = _item_row(item)
+        elif kind == WALL:
+            room_id, (x, y) = key  # type: ignore[misc]
+            delta.walls.append([room_id, x, y])
+        elif kind == EFFECT:
+            effect_kind, target = key  # type: ignore[misc]
+            delta.effects[f"{effect_kind}:{target}"] = state.effect_remaining(effect_kind, target)
+    if first_log is not None:
+        # 削られたログは返せないため、残っている範囲から始める。
+        delta.log = state.log[max(first_log - state.log_offset, 0):]
+    return delta
+
+
+def _fill_full(state: "GameState", delta: StateDelta) -> None:
+    delta.player = _player_row(state)
+    delta.ghosts = {ghost.entity_id: _ghost_row(ghost) for ghost in state.ghosts}
+    delta.items = {item.item_id: _item_row(item) for item in state.items.values()}
+    for room_id, room in state.rooms.items():
+        for x, y in sorted(room.broken_walls):
+            delta.walls.append([room_id, x, y])
+    for effect_kind, target in state.active_effects():
+        delta.effects[f"{effect_kind}:{target}"] = state.effect_remaining(effect_kind, target)
+    delta.log = list(state.log)
+
+
+def _player_row(state: "GameState") -> List[object]:
+    player = state.player
+    return [player.room_id, *player.position]
+
+
+def _ghost_row(ghost: "Ghost") -> List[object]:
+    return [ghost.room_id, *ghost.position, ghost.is_spawned]
+
+
+def _item_row(item: "Item") -> List[object]:
+    position = list(item.position) if item.position is not None else None
+    return [item.room_id, position, item.hidden]
@@ -1,15 +1,26 @@
-"""廃墟脱出ゲーム向けの標準ダンジョンレイアウトとアイテム配置を定義する。"""
+"""廃墟脱出ゲーム向けの標準ダンジョンレイアウトとアイテム配置を定義する。
+
+手配置の 3×3 レイアウトに加え、負荷試験向けに任意の大きさの迷路を作る
+`build_procedural_dungeon` を提供する。
+"""
 
 from __future__ import annotations
 
 import random
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+from dataclasses import dataclass, fields, replace
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
 
 from .entities import Item, ItemType
-from .room import Door, Room
+from .loot import LootEntry, LootTable, LootTables
+from .room import Door, Room, RoomLayout
 from .types import Direction, Position
 
+# レイアウトやアイテム配置の生成手順を変えたら更新する。生成物キャッシュのキーに含まれる。
+GENERATOR_VERSION = "default-1"
+# `build_procedural_dungeon` 用。`DungeonCache.get_or_build(..., version=...)` に渡す。
+PROCEDURAL_GENERATOR_VERSION = "procedural-2"
+
 
 @dataclass
 class DungeonSetup:
@@ -20,13 +31,15 @@ class DungeonSetup:
     exit_room_id: str
     exit_position: Position
     safe_rooms: set[str]
+    # 探索時に引くアイテムテーブル。None なら `items` に全アイテムが配置済み。
+    loot: Optional[LootTables] = None
 
 
 def build_default_dungeon(rng: Optional[random.Random] = None) -> DungeonSetup:
     rng = rng or random.Random()
 
-    rooms = _build_rooms()
-    _connect_rooms(rooms)
+    # レイアウトは全ゲームで共有し、各ゲームには差分だけを持つ `Room` を渡す。
+    rooms = {room_id: Room(layout=layout) for room_id, layout in _default_layouts().items()}
 
     start_room_id = "r0"
     start_position = (2, 5)
@@ -52,6 +65,14 @@ def build_default_dungeon(rng: Optional[random.Random] = None) -> DungeonSetup:
 # ---------------------------------------------------------------------------
 
 
+@lru_cache(maxsize=None)
+def _default_layouts() -> Dict[str, RoomLayout]:
+    """標準レイアウトを一度だけ組み立て、プロセス内の全ゲームで共有する。"""
+    rooms = _build_rooms()
+    _connect_rooms(rooms)
+    return {room_id: room.layout for room_id, room in rooms.items()}
+
+
 def _build_rooms() -> Dict[str, Room]:
     rooms: Dict[str, Room] = {}
 
@@ -192,24 +213,324 @@ def _connect_rooms(rooms: Dict[str, Room]) -> None:
     connect_north_south(rooms["r5"], rooms["r8"])
 
 
+# ---------------------------------------------------------------------------
+# 手続き型ダンジョン生成
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class GeneratorConfig:
+    """`build_procedural_dungeon` のパラメータ。割合はすべて 0.0〜1.0 の確率。
+
+    各部屋の中央の行（`(room_height - 1) // 2`）と列（`room_width // 2`）を「背骨」と呼び、
+    ドアはすべて背骨の端に置く。背骨には壁も一方通行床も置かないため、部屋に入れば
+    どのドアへも必ず辿り着ける。
+    """
+
+    columns: int = 10
+    rows: int = 10
+    room_width: int = 6
+    room_height: int = 6
+    # 背骨以外のマスが壁になる確率と、そのうち脆い壁にする割合。
+    wall_density: float = 0.25
+    fragile_ratio: float = 0.2
+    # 背骨に隣接するマスを、背骨方向にしか出られない一方通行床にする確率。
+    one_way_ratio: float = 0.05
+    # 全域木に含まれない隣接部屋の組に追加ドアを置く確率と、追加ドアの性質の割合。
+    extra_door_ratio: float = 0.1
+    locked_ratio: float = 0.2
+    one_way_door_ratio: float = 0.2
+    # 1部屋あたりの探索マス数（背骨に隣接するマスから選ぶ）。
+    explore_tiles: int = 2
+    # True なら正規の鍵だけを先に置き、他のアイテムは探索時に `DEFAULT_LOOT_TABLE` から引く。
+    lazy_loot: bool = True
+
+    def validate(self) -> None:
+        if self.columns <= 0 or self.rows <= 0:
+            raise ValueError("columns and rows must be positive.")
+        if self.columns * self.rows < len(_ITEM_TEMPLATES):
+            raise ValueError(f"Need at least {len(_ITEM_TEMPLATES)} rooms to place all items.")
+        if self.room_width < 3 or self.room_height < 3:
+            raise ValueError("Rooms must be at least 3x3.")
+        for f in fields(self):
+            if f.name.endswith(("_ratio", "_density")):
+                value = getattr(self, f.name)
+                if not 0.0 <= value <= 1.0:
+                    raise ValueError(f"{f.name} must be between 0 and 1, got {value}.")
+        if not 1 <= self.explore_tiles <= len(_tile_classes(self.room_width, self.room_height)[0]):
+            raise ValueError(
+                f"explore_tiles out of range for a {self.room_width}x{self.room_height} room."
+            )
+
+
+def build_procedural_dungeon(
+    rng: Optional[random.Random] = None,
+    config: Optional[GeneratorConfig] = None,
+    **overrides: object,
+) -> DungeonSetup:
+    """`columns × rows` 個の部屋を格子状に並べた迷路を生成する。
+
+    部屋同士は Sidewinder 法の全域木でつなぐ。木のドアは常に双方向かつ施錠なしなので、
+    開始部屋（左上の `r0`）から出口部屋（右下）と全ての探索マスへ、鍵や道具なしで必ず到達できる。
+    施錠・一方通行になり得るのは木に加えた追加ドアだけ。部屋は1行ずつ組み立て、
+    作業用に保持するのは直前の行だけ。`overrides` は `config` のフィールドを上書きするため、
+    `DungeonCache.get_or_build(seed, params={...}, builder=build_procedural_dungeon)` からも使える。
+    """
+    rng = rng or random.Random()
+    config = replace(config or GeneratorConfig(), **overrides)  # type: ignore[arg-type]
+    config.validate()
+
+    width, height = config.room_width, config.room_height
+    spine_x, spine_y = width // 2, (height - 1) // 2
+    near, others, toward_spine = _tile_classes(width, height)
+    rooms: Dict[str, Room] = {}
+
+    previous: List[Room] = []
+    for row in range(config.rows):
+        current = [
+            _procedural_room(
+                f"r{row * config.columns + column}",
+                row,
+                column,
+                config,
+                rng,
+                near,
+                others,
+                toward_spine,
+            )
+            for column in range(config.columns)
+        ]
+        for room in current:
+            rooms[room.room_id] = room
+
+        # Sidewinder: 東へ通路を伸ばすか、区間を閉じてその中の1部屋から北へつなぐ。最上段は東へ一直線。
+        run_start = 0
+        for column in range(config.columns):
+            last = column == config.columns - 1
+            if row > 0 and (last or rng.random() < 0.5):
+                carved = rng.randrange(run_start, column + 1)
+                for candidate in range(run_start, column + 1):
+                    if candidate == carved:
+                        _link(previous[candidate], current[candidate], Direction.SOUTH)
+                    else:
+                        _maybe_extra_link(
+                            previous[candidate], current[candidate], Direction.SOUTH, config, rng
+                        )
+                run_start = column + 1
+                if not last:
+                    _maybe_extra_link(
+                        current[column], current[column + 1], Direction.EAST, config, rng
+                    )
+            elif not last:
+                _link(current[column], current[column + 1], Direction.EAST)
+        previous = current
+
+    start_room_id = "r0"
+    loot: Optional[LootTables] = None
+    if config.lazy_loot:
+        items = _place_master_key(rooms, rng)
+        loot = LootTables(seed=rng.getrandbits(32), default=DEFAULT_LOOT_TABLE)
+    else:
+        items = _generate_items(rooms, rng)
+    return DungeonSetup(
+        rooms=rooms,
+        items=items,
+        start_room_id=start_room_id,
+        start_position=(spine_x, spine_y),
+        exit_room_id=f"r{config.columns * config.rows - 1}",
+        exit_position=(spine_x, spine_y),
+        safe_rooms={start_room_id},
+        loot=loot,
+    )
+
+
+@lru_cache(maxsize=None)
+def _tile_classes(
+    width: int, height: int
+) -> Tuple[Tuple[Position, ...], Tuple[Position, ...], Dict[Position, Direction]]:
+    """背骨に隣接するマス・それ以外の背骨外マス・隣接マスから背骨へ向かう方向を返す。"""
+    spine_x, spine_y = width // 2, (height - 1) // 2
+    near: List[Position] = []
+    others: List[Position] = []
+    toward_spine: Dict[Position, Direction] = {}
+    for y in range(height):
+        for x in range(width):
+            if x == spine_x or y == spine_y:
+                continue
+            if abs(y - spine_y) == 1:
+                near.append((x, y))
+                toward_spine[(x, y)] = Direction.SOUTH if y < spine_y else Direction.NORTH
+            elif abs(x - spine_x) == 1:
+                near.append((x, y))
+                toward_spine[(x, y)] = Direction.EAST if x < spine_x else Direction.WEST
+            else:
+                others.append((x, y))
+    return tuple(near), tuple(others), toward_spine
+
+
+def _procedural_room(
+    room_id: str,
+    row: int,
+    column: int,
+    config: GeneratorConfig,
+    rng: random.Random,
+    near: Tuple[Position, ...],
+    others: Tuple[Position, ...],
+    toward_spine: Dict[Position, Direction],
+) -> Room:
+    random_ = rng.random
+    # `rng.sample` は1部屋ごとに呼ぶには重いため、数個を棄却法で選ぶ。
+    explore: Set[Position] = set()
+    while len(explore) < config.explore_tiles:
+        explore.add(near[int(random_() * len(near))])
+    walls: Set[Position] = set()
+    fragile: Set[Position] = set()
+    one_way: Dict[Position, Set[Direction]] = {}
+    for position in near:
+        if position in explore:
+            continue
+        if random_() < config.one_way_ratio:
+            # 背骨側にしか出られないので、踏んでも背骨へ戻れる。
+            one_way[position] = {toward_spine[position]}
+        elif random_() < config.wall_density:
+            walls.add(position)
+            if random_() < config.fragile_ratio:
+                fragile.add(position)
+    for position in others:
+        if random_() < config.wall_density:
+            walls.add(position)
+            if random_() < config.fragile_ratio:
+                fragile.add(position)
+    # 生成したマスは範囲内と分かっているため、`add_*` の検査は通さずに集合を直接渡す。
+    layout = RoomLayout(
+        room_id=room_id,
+        name=f"廃墟の区画 {row}-{column}",
+        width=config.room_width,
+        height=config.room_height,
+        walls=walls,
+        fragile_walls=fragile,
+        explore_positions=explore,
+        one_way_exits=one_way,
+    )
+    return Room(layout=layout)
+
+
+def _link(
+    first: Room,
+    second: Room,
+    direction: Direction,
+    *,
+    locked: bool = False,
+    one_way: bool = False,
+) -> None:
+    """`first` の `direction` 側にある `second` とドアでつなぐ。`one_way` なら戻りのドアは置かない。"""
+    position, target_position, back = _door_slots(first.width, first.height)[direction]
+    _add_door(first, direction, second.room_id, position, target_position, locked, one_way)
+    if not one_way:
+        _add_door(second, back, first.room_id, target_position, position, locked, one_way)
+
+
+@lru_cache(maxsize=None)
+def _door_slots(width: int, height: int) -> Dict[Direction, Tuple[Position, Position, Direction]]:
+    """方向 -> (ドアのマス, 行き先の部屋での到着マス, 戻りの方向)。ドアはすべて背骨の端に置く。"""
+    spine_x, spine_y = width // 2, (height - 1) // 2
+    positions = {
+        Direction.NORTH: (spine_x, 0),
+        Direction.SOUTH: (spine_x, height - 1),
+        Direction.WEST: (0, spine_y),
+        Direction.EAST: (width - 1, spine_y),
+    }
+    return {
+        direction: (position, positions[direction.opposite], direction.opposite)
+        for direction, position in positions.items()
+    }
+
+
+def _add_door(
+    room: Room,
+    direction: Direction,
+    target_room_id: str,
+    position: Position,
+    target_position: Position,
+    locked: bool,
+    one_way: bool,
+) -> None:
+    door = Door(
+        target_room_id=target_room_id,
+        position=position,
+        target_position=target_position,
+        direction=direction,
+        is_locked=locked,
+        requires_key=locked,
+        one_way=one_way,
+    )
+    room.layout.doors[direction] = door
+    room.layout.door_positions[position] = door
+
+
+def _maybe_extra_link(
+    first: Room, second: Room, direction: Direction, config: GeneratorConfig, rng: random.Random
+) -> None:
+    """全域木に含まれない隣接部屋の組に、確率 `extra_door_ratio` で追加ドアを置く。"""
+    if rng.random() >= config.extra_door_ratio:
+        return
+    locked = rng.random() < config.locked_ratio
+    one_way = rng.random() < config.one_way_door_ratio
+    if one_way and rng.random() < 0.5:
+        # 一方通行の向きは逆向き（西・北向き）も選ぶ。
+        _link(second, first, direction.opposite, locked=locked, one_way=True)
+    else:
+        _link(first, second, direction, locked=locked, one_way=one_way)
+
+
 # ---------------------------------------------------------------------------
 # アイテム配置
 # ---------------------------------------------------------------------------
 
 
-def _generate_items(rooms: Dict[str, Room], rng: random.Random) -> Dict[str, Item]:
-    item_templates: List[tuple[str, str, ItemType, dict]] = [
-        ("key_master", "裏口の鍵", ItemType.KEY, {"is_master": True}),
-        ("key_dummy_a", "錆びた鍵", ItemType.DUMMY_KEY, {"is_master": False}),
-        ("key_dummy_b", "折れた鍵", ItemType.DUMMY_KEY, {"is_master": False}),
-        ("freeze_a", "御札", ItemType.GHOST_FREEZE, {"duration": 3}),
-        ("freeze_b", "氷結スプレー", ItemType.GHOST_FREEZE, {"duration": 2}),
-        ("speed_a", "アドレナリン注射", ItemType.SPEED_BOOST, {"duration": 5}),
-        ("speed_b", "滑走シューズ", ItemType.SPEED_BOOST, {"duration": 4}),
-        ("breaker_a", "錆びたバール", ItemType.WALL_BREAKER, {"consumed_on_use": True}),
-        ("lore_a", "旧校長の日誌", ItemType.LORE, {}),
-    ]
+_ITEM_TEMPLATES: Tuple[Tuple[str, str, ItemType, dict], ...] = (
+    ("key_master", "裏口の鍵", ItemType.KEY, {"is_master": True}),
+    ("key_dummy_a", "錆びた鍵", ItemType.DUMMY_KEY, {"is_master": False}),
+    ("key_dummy_b", "折れた鍵", ItemType.DUMMY_KEY, {"is_master": False}),
+    ("freeze_a", "御札", ItemType.GHOST_FREEZE, {"duration": 3}),
+    ("freeze_b", "氷結スプレー", ItemType.GHOST_FREEZE, {"duration": 2}),
+    ("speed_a", "アドレナリン注射", ItemType.SPEED_BOOST, {"duration": 5}),
+    ("speed_b", "滑走シューズ", ItemType.SPEED_BOOST, {"duration": 4}),
+    ("breaker_a", "錆びたバール", ItemType.WALL_BREAKER, {"consumed_on_use": True}),
+    ("lore_a", "旧校長の日誌", ItemType.LORE, {}),
+)
+
+
+# 正規の鍵以外のテンプレートを同じ重みで並べる。探索マスの6割は空振りになる。
+DEFAULT_LOOT_TABLE = LootTable(
+    [
+        LootEntry(item_id, name, item_type, 1.0, metadata)
+        for item_id, name, item_type, metadata in _ITEM_TEMPLATES
+        if item_type != ItemType.KEY
+    ],
+    empty_weight=12.0,
+)
+
+
+def _place_master_key(rooms: Dict[str, Room], rng: random.Random) -> Dict[str, Item]:
+    """正規の鍵だけを、ランダムな部屋のランダムな探索マスへ置く。"""
+    item_id, name, item_type, metadata = _ITEM_TEMPLATES[0]
+    room_id = rng.choice(list(rooms))
+    position = rng.choice(sorted(rooms[room_id].explore_positions))
+    key = Item(
+        item_id=item_id,
+        name=name,
+        item_type=item_type,
+        room_id=room_id,
+        hidden=True,
+        position=position,
+        metadata=dict(metadata),
+    )
+    return {item_id: key}
 
+
+def _generate_items(rooms: Dict[str, Room], rng: random.Random) -> Dict[str, Item]:
+    item_templates = list(_ITEM_TEMPLATES)
     room_ids = list(rooms.keys())
     rng.shuffle(room_ids)
     if len(room_ids) < len(item_templates):
@@ -232,6 +553,6 @@ def _generate_items(rooms: Dict[str, Room], rng: random.Random) -> Dict[str, Ite
             room_id=room_id,
             hidden=True,
             position=position,
-            metadata=metadata,
+            metadata=dict(metadata),
         )
     return items
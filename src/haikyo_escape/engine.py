@@ -6,14 +6,26 @@
 from __future__ import annotations
 
 import random
-from typing import Callable, Optional
+import time
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Optional, Union
 
+from .actions import DIRECTIONS, Action, Opcode, parse_action
+from .balance import DEFAULT_FREEZE_TURNS, DEFAULT_SPEED_BOOST_TURNS, BalanceConfig
+from .connectivity import EscapeMonitor
 from .entities import Ghost, ItemType, Player
+from .events import EventBus
+from .metrics import TURN_SECONDS, MetricsRegistry, phase_metric
 from .state import ActionResult, GameState, TurnPhase
-from .types import Direction
+from .types import Direction, Position
 
+if TYPE_CHECKING:
+    from .telemetry import TelemetrySink
 
-ChoiceFunc = Callable[[GameState, Player], str]
+# 入力関数はテキストコマンドか、解析済みの `Action` を返す。
+ActionInput = Union[Action, str]
+ChoiceFunc = Callable[[GameState, Player], ActionInput]
+AsyncChoiceFunc = Callable[[GameState, Player], Awaitable[ActionInput]]
 RoomRevealFunc = Callable[[GameState], None]
 
 
@@ -26,26 +38,125 @@ class GameEngine:
         player_choice_fn: ChoiceFunc,
         reveal_callback: Optional[RoomRevealFunc] = None,
         rng: Optional[random.Random] = None,
+        telemetry: Optional["TelemetrySink"] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        speculation_executor: Optional[Executor] = None,
+        events: Optional[EventBus] = None,
+        detect_stuck: bool = False,
+        balance: Optional[BalanceConfig] = None,
     ) -> None:
         self.state = state
         self.player_choice_fn = player_choice_fn
         self.reveal_callback = reveal_callback
         self.rng = rng or random.Random(state.rng_seed)
-        self.next_first_spawn_threshold = 5
+        self.telemetry = telemetry
+        self.metrics = metrics
+        # 指定すると入力待ちの間に幽霊の追跡場を先読みする（複数エンジンで共有してよい）。
+        self.speculation_executor = speculation_executor
+        if metrics is not None and state.metrics is None:
+            state.metrics = metrics  # BFS やログなど状態側のカウンタも同じレジストリへ集める。
+        if events is not None:
+            state.events = events  # 複数のゲームを1つのバスでまとめて観察する場合に渡す。
+        # 有効にすると、出口へ辿り着けなくなった時点で winner="stuck" としてゲームを打ち切る。
+        self.escape_monitor: Optional[EscapeMonitor] = EscapeMonitor() if detect_stuck else None
+        self.balance = balance or BalanceConfig()
+        self.next_first_spawn_threshold = self.balance.first_spawn_interval
+        # 計測中のターンだけ使う作業領域。テレメトリ無効時は None のまま。
+        self._phase_marks: Optional[list[tuple[Optional[TurnPhase], float]]] = None
+        self._turn_events: Optional[list[dict[str, object]]] = None
 
     # ------------------------------------------------------------------
     # 公開API
     # ------------------------------------------------------------------
+    @property
+    def events(self) -> EventBus:
+        """このゲームのイベントバス（`state.events` と同じもの）。"""
+        return self.state.events
+
     def run_turn(self) -> None:
         """プレイヤー行動から幽霊処理まで1ターン分の流れを実行する。"""
-        if self.state.is_over:
+        if not self._begin_turn():
+            return
+        self._speculate()
+        raw_action = self.player_choice_fn(self.state, self.state.player)
+        self._complete_turn(raw_action)
+
+    def step(self, action: ActionInput) -> None:
+        """入力関数を呼ばず、与えられた行動で1ターン分を進める。"""
+        if not self._begin_turn():
             return
+        self._complete_turn(action)
+
+    def run_actions(self, actions: Iterable[ActionInput]) -> int:
+        """行動列を1ターンずつ順に適用し、進めたターン数を返す。
+
+        ゲームが終わった時点で残りの行動は捨てる。
+        """
+        played = 0
+        for action in actions:
+            if self.state.is_over:
+                break
+            self.step(action)
+            played += 1
+        return played
+
+    # ------------------------------------------------------------------
+    # ターン進行（同期・非同期エンジン共通）
+    # ------------------------------------------------------------------
+    def _begin_turn(self) -> bool:
+        """ターン開始処理を行い、入力を受け付けるべきなら True を返す。"""
+        if self.state.is_over:
+            return False
 
         self.state.turn_count += 1
         self.state.phase = TurnPhase.PLAYER_DECISION
         self.state.tick_start_of_turn()
+        return True
 
-        raw_action = self.player_choice_fn(self.state, self.state.player)
+    def _speculate(self) -> None:
+        """入力待ちの間に、プレイヤーの移動先候補ごとの追跡場を先に計算させる。"""
+        if self.speculation_executor is None:
+            return
+        if not any(True for _ in self.state.active_ghosts()):
+            return
+        self.state.pursuit_fields().prefetch(self._likely_player_tiles(), self.speculation_executor)
+
+    def _likely_player_tiles(self) -> list[tuple[str, Position]]:
+        """現在地・隣接マス・ドアの先など、このターン後にプレイヤーがいそうなマス。"""
+        state = self.state
+        room_id, position = state.player.room_id, state.player.position
+        room = state.rooms[room_id]
+        tiles = [(room_id, position)]
+        tiles.extend(state._neighbors(room_id, position, for_player=True))
+        for direction in Direction:
+            dx, dy = direction.delta
+            door = room.door_at((position[0] + dx, position[1] + dy))
+            if door and door.direction == direction:
+                tiles.append((door.target_room_id, door.target_position))
+        return list(dict.fromkeys(tiles))
+
+    def _complete_turn(self, raw_action: ActionInput) -> None:
+        """入力を受け取った後のフェーズをすべて解決する。"""
+        if self.telemetry is None and self.metrics is None:
+            self._resolve_turn(raw_action)
+            return
+
+        # 入力待ちの時間は含めず、行動の解決以降のフェーズだけを計測する。
+        self._phase_marks = [(TurnPhase.PLAYER_DECISION, time.perf_counter())]
+        if self.telemetry is not None:
+            self._turn_events = []
+        try:
+            self._resolve_turn(raw_action)
+        finally:
+            self._phase_marks.append((None, time.perf_counter()))
+            if self.metrics is not None:
+                self._observe_phases(self._phase_marks)
+            if self.telemetry is not None:
+                self.telemetry.emit(self._telemetry_record(raw_action))
+            self._phase_marks = None
+            self._turn_events = None
+
+    def _resolve_turn(self, raw_action: ActionInput) -> None:
         action_consumed = self._resolve_player_action(raw_action)
 
         if self.state.is_over:
@@ -59,69 +170,106 @@ class GameEngine:
         if self.state.is_over:
             return
 
-        self.state.phase = TurnPhase.GHOST_MOVEMENT
+        self._enter_phase(TurnPhase.GHOST_MOVEMENT)
         self._move_ghosts()
 
-        self.state.phase = TurnPhase.RESOLUTION
+        self._enter_phase(TurnPhase.RESOLUTION)
         self.state.check_victory()
+        if not self.state.is_over and self.escape_monitor is not None:
+            if not self.escape_monitor.can_escape(self.state):
+                self.state.end_game("stuck", "The player can no longer reach the exit.")
+
+    def _enter_phase(self, phase: TurnPhase) -> None:
+        self.state.phase = phase
+        if self._phase_marks is not None:
+            self._phase_marks.append((phase, time.perf_counter()))
+
+    def _observe_phases(self, marks: list[tuple[Optional[TurnPhase], float]]) -> None:
+        assert self.metrics is not None
+        for (phase, start), (_, end) in zip(marks, marks[1:]):
+            if phase is not None:
+                self.metrics.observe(phase_metric(phase.name.lower()), end - start)
+        self.metrics.observe(TURN_SECONDS, marks[-1][1] - marks[0][1])
+
+    def _note_event(self, event: dict[str, object]) -> None:
+        """テレメトリ有効時のみ、ターン中に起きた出来事を記録する。"""
+        if self._turn_events is not None:
+            self._turn_events.append(event)
+
+    def _telemetry_record(self, raw_action: ActionInput) -> dict[str, object]:
+        marks = self._phase_marks or []
+        timings = {
+            phase.name.lower(): (end - start) * 1000.0
+            for (phase, start), (_, end) in zip(marks, marks[1:])
+        }
+        player = self.state.player
+        return {
+            "seed": self.state.rng_seed,
+            "turn": self.state.turn_count,
+            "action": str(raw_action),
+            "timings_ms": timings,
+            "player": [player.room_id, *player.position],
+            "ghosts": [
+                [ghost.entity_id, ghost.room_id, *ghost.position]
+                for ghost in self.state.active_ghosts()
+            ],
+            "events": self._turn_events or [],
+            "is_over": self.state.is_over,
+            "winner": self.state.winner,
+        }
 
     # ------------------------------------------------------------------
     # プレイヤー行動
     # ------------------------------------------------------------------
-    def _resolve_player_action(self, raw_action: str) -> bool:
-        action = (raw_action or "").strip()
-        if not action:
-            self.state.record("No action specified.")
-            return False
-
-        tokens = action.split()
-        verb = tokens[0].lower()
-        args = tokens[1:]
-
-        if verb == "move":
-            return self._handle_move(args)
-        if verb == "search":
+    def _resolve_player_action(self, action: ActionInput) -> bool:
+        if not isinstance(action, Action):
+            parsed = parse_action(self.state, action)
+            if parsed is None:
+                return False
+            action = parsed
+
+        opcode = action.opcode
+        if opcode == Opcode.MOVE:
+            return self._handle_move(action)
+        if opcode == Opcode.SEARCH:
             self.state.reveal_items_at_player()
             return True
-        if verb == "take":
-            return self._handle_take(args)
-        if verb == "use":
-            return self._handle_use(args)
-        if verb == "wait":
+        if opcode == Opcode.TAKE:
+            return self._handle_take(action)
+        if opcode == Opcode.USE:
+            return self._handle_use(action)
+        if opcode == Opcode.WAIT:
             self.state.record("Player waits and listens to the silence...")
             return True
-        if verb == "quit":
-            self.state.is_over = True
-            self.state.winner = "quit"
-            self.state.record("Player chose to quit the expedition.")
+        if opcode == Opcode.QUIT:
+            self.state.end_game("quit", "Player chose to quit the expedition.")
             return False
 
-        self.state.record(f"Unknown action '{raw_action}'.")
+        self.state.record(f"Unknown action '{action}'.")
         return False
 
-    def _handle_move(self, args: list[str]) -> bool:
-        if not args:
+    def _handle_move(self, action: Action) -> bool:
+        codes = action.operands
+        if not codes:
             self.state.record("Specify at least one direction (north/east/south/west).")
             return False
 
         max_steps = self.state.player.current_speed
-        if len(args) > max_steps:
+        if len(codes) > max_steps:
             self.state.record(
                 f"Speed limit allows {max_steps} step(s); extra directions are ignored."
             )
-            args = args[:max_steps]
+            codes = codes[:max_steps]
 
         attempted = False
-        for token in args:
-            try:
-                direction = Direction.from_token(token)
-            except ValueError:
-                self.state.record(f"Unsupported direction '{token}'.")
+        for index, code in enumerate(codes):
+            if not 0 <= code < len(DIRECTIONS):
+                self.state.record(f"Unsupported direction '{action.operand_text(index)}'.")
                 continue
 
             attempted = True
             before_room = self.state.player.room_id
-            result = self.state.move_player_step(direction)
+            result = self.state.move_player_step(DIRECTIONS[code])
             if result == ActionResult.SUCCESS:
                 if self.reveal_callback and before_room != self.state.player.room_id:
                     self.reveal_callback(self.state)
@@ -132,7 +280,7 @@ class GameEngine:
 
         return attempted
 
-    def _handle_take(self, args: list[str]) -> bool:
+    def _handle_take(self, action: Action) -> bool:
         current_items = self.state.items_at_position(
             self.state.player.room_id, self.state.player.position, include_hidden=False
         )
@@ -140,61 +288,54 @@ class GameEngine:
             self.state.record("There is nothing here to pick up.")
             return False
 
-        if not args or args[0].lower() == "all":
+        if not action.operands:
             success = False
             for item in current_items:
                 success |= self.state.pickup_item(item.item_id)
             return success
 
-        target = args[0].lower()
-        for item in current_items:
-            if item.item_id.lower() == target or item.name.lower() == target:
-                return self.state.pickup_item(item.item_id)
-
-        if target.isdigit():
-            idx = int(target)
-            if 0 <= idx < len(current_items):
-                return self.state.pickup_item(current_items[idx].item_id)
+        index = action.operands[0]
+        if 0 <= index < len(current_items):
+            return self.state.pickup_item(current_items[index].item_id)
 
         self.state.record("Cannot find the specified item to pick up.")
         return False
 
-    def _handle_use(self, args: list[str]) -> bool:
-        if not args:
+    def _handle_use(self, action: Action) -> bool:
+        if not action.operands:
             self.state.record("Specify which item to use (id or name).")
             return False
 
-        query = args[0].lower()
+        index = action.operands[0]
         inventory = self.state.player.inventory
-
-        target_item = None
-        for item in inventory:
-            if item.item_id.lower() == query or item.name.lower() == query:
-                target_item = item
-                break
-
-        if target_item is None and query.isdigit():
-            index = int(query)
-            if 0 <= index < len(inventory):
-                target_item = inventory[index]
-
-        if target_item is None:
+        if not 0 <= index < len(inventory):
             self.state.record("No matching item in inventory.")
             return False
+        target_item = inventory[index]
 
         if target_item.item_type == ItemType.SPEED_BOOST:
-            duration = int(target_item.metadata.get("duration", 5))
-            self.state.player.apply_speed_boost(duration)
+            duration = self.balance.duration_for(target_item, DEFAULT_SPEED_BOOST_TURNS)
+            self.state.apply_speed_boost(duration)
             self.state.record(f"Speed boost activated for {duration} turn(s).")
             self.state.consume_item(target_item.item_id)
             return True
 
         if target_item.item_type == ItemType.GHOST_FREEZE:
-            duration = int(target_item.metadata.get("duration", 3))
+            duration = self.balance.duration_for(target_item, DEFAULT_FREEZE_TURNS)
             self.state.freeze_room(self.state.player.room_id, duration)
+            frozen = []
             for ghost in self.state.active_ghosts():
                 if ghost.room_id == self.state.player.room_id:
-                    ghost.apply_freeze(duration)
+                    self.state.freeze_ghost(ghost, duration)
+                    frozen.append(ghost.entity_id)
+            self._note_event(
+                {
+                    "type": "freeze",
+                    "room": self.state.player.room_id,
+                    "duration": duration,
+                    "ghosts": frozen,
+                }
+            )
             self.state.consume_item(target_item.item_id)
             return True
 
@@ -227,22 +368,34 @@ class GameEngine:
             and self.state.total_steps >= self.next_first_spawn_threshold
             and self.state.player.room_id not in self.state.safe_rooms
         ):
-            if self._roll_one_in_six():
+            if self._roll_spawn():
                 ghost = self._next_unspawned_ghost()
                 if ghost and self.state.spawn_ghost(ghost):
                     self.state.first_ghost_spawned = True
-            self.next_first_spawn_threshold += 5
+                    self._note_spawn(ghost)
+            self.next_first_spawn_threshold += self.balance.first_spawn_interval
 
-        # 2体目の幽霊は1体目出現後、各アクションごとに1/6で判定する。
+        # 2体目の幽霊は1体目出現後、各アクションごとに1/6（`spawn_one_in`）で判定する。
         if (
             self.state.first_ghost_spawned
             and not self.state.second_ghost_spawned
             and self.state.player.room_id not in self.state.safe_rooms
         ):
-            if self._roll_one_in_six():
+            if self._roll_spawn():
                 ghost = self._next_unspawned_ghost()
                 if ghost and self.state.spawn_ghost(ghost):
                     self.state.second_ghost_spawned = True
+                    self._note_spawn(ghost)
+
+    def _note_spawn(self, ghost: Ghost) -> None:
+        self._note_event(
+            {
+                "type": "spawn",
+                "ghost": ghost.entity_id,
+                "room": ghost.room_id,
+                "position": list(ghost.position),
+            }
+        )
 
     def _next_unspawned_ghost(self) -> Optional[Ghost]:
         for ghost in self.state.ghosts:
@@ -259,8 +412,59 @@ class GameEngine:
             self.state.move_ghost_towards_player(ghost, steps)
 
     def _roll_ghost_steps(self) -> int:
-        # 2/3 の確率で1マス、1/3 の確率で2マス移動する。
-        return 1 if self.rng.random() < (2 / 3) else 2
+        # 既定では 2/3 の確率で1マス、1/3 の確率で2マス移動する。
+        return 1 if self.rng.random() < self.balance.ghost_single_step_chance else 2
+
+    def _roll_spawn(self) -> bool:
+        return self.rng.randint(1, self.balance.spawn_one_in) == 1
+
+
+class AsyncGameEngine(GameEngine):
+    """入力関数を await するエンジン。
+
+    プレイヤーの入力待ちだけを非同期にし、幽霊処理と判定は `GameEngine` と同じ同期コードで
+    解決する。そのため同じシード・同じ入力列なら同期版と完全に同じ進行になる。
+    """
 
-    def _roll_one_in_six(self) -> bool:
-        return self.rng.randint(1, 6) == 1
+    def __init__(
+        self,
+        state: GameState,
+        player_choice_fn: AsyncChoiceFunc,
+        reveal_callback: Optional[RoomRevealFunc] = None,
+        rng: Optional[random.Random] = None,
+        telemetry: Optional["TelemetrySink"] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        speculation_executor: Optional[Executor] = None,
+        events: Optional[EventBus] = None,
+        detect_stuck: bool = False,
+        balance: Optional[BalanceConfig] = None,
+    ) -> None:
+        super().__init__(
+            state,
+            player_choice_fn,  # type: ignore[arg-type]
+            reveal_callback=reveal_callback,
+            rng=rng,
+            telemetry=telemetry,
+            metrics=metrics,
+            speculation_executor=speculation_executor,
+            events=events,
+            detect_stuck=detect_stuck,
+            balance=balance,
+        )
+        self.player_choice_fn: AsyncChoiceFunc = player_choice_fn  # type: ignore[assignment]
+
+    async def run_turn(self) -> None:  # type: ignore[override]
+        """入力を await してから1ターン分を解決する。"""
+        if not self._begin_turn():
+            return
+        self._speculate()
+        raw_action = await self.player_choice_fn(self.state, self.state.player)
+        self._complete_turn(raw_action)
+
+    async def play(self, max_turns: Optional[int] = None) -> Optional[str]:
+        """ゲーム終了（または `max_turns` 到達）までターンを進め、勝者を返す。"""
+        while not self.state.is_over:
+            if max_turns is not None and self.state.turn_count >= max_turns:
+                break
+            await self.run_turn()
+        return self.state.winner
@@ -63,6 +63,9 @@ class Player(Entity):
     """プレイヤーが操作する高校生キャラクター。"""
 
     inventory: list[Item] = field(default_factory=list)
+    # 加速中は付与時の残りターン数、切れていれば 0。効果の付与と期限切れは
+    # `GameState.apply_speed_boost` とタイマーホイールが受け持ち、毎ターンは減らさない。
+    # 正確な残りは `GameState.effect_remaining()` で得る。
     speed_turns_remaining: int = 0
     ghost_freeze_turns_remaining: int = 0
 
@@ -88,13 +91,6 @@ class Player(Entity):
                 return item
         return None
 
-    def apply_speed_boost(self, duration: int) -> None:
-        self.speed_turns_remaining = max(self.speed_turns_remaining, duration)
-
-    def tick_effects(self) -> None:
-        if self.speed_turns_remaining > 0:
-            self.speed_turns_remaining -= 1
-
     @property
     def current_speed(self) -> int:
         return 2 if self.speed_turns_remaining > 0 else 1
@@ -107,6 +103,7 @@ class Ghost(Entity):
     aggression: float = 0.5  # 0〜1のスケール。難易度調整時に調整する。
     cannot_repeat_room: bool = True
     last_room_id: Optional[str] = None
+    # 凍結中は付与時の残りターン数、解けていれば 0（`GameState.freeze_ghost` が管理する）。
     frozen_turns: int = 0
     is_spawned: bool = False
 
@@ -120,10 +117,3 @@ class Ghost(Entity):
     def commit_move(self, next_room_id: str) -> None:
         self.last_room_id = self.room_id
         self.move_to(next_room_id)
-
-    def apply_freeze(self, duration: int) -> None:
-        self.frozen_turns = max(self.frozen_turns, duration)
-
-    def tick_effects(self) -> None:
-        if self.frozen_turns > 0:
-            self.frozen_turns -= 1
@@ -0,0 +1,219 @@
+"""現在の状態から選べる行動それぞれの決定的な結果を、状態を変えずにまとめて求める。
+
+移動は `MoveTable` が部屋ごとに前計算した「各マスから4方向へ1歩動いた結果」（移動先・通るドア・
+壁や一方通行で止まる理由）を引くだけで、`GameState.move_player_step` と同じ判定になる。
+施錠ドアだけは鍵の有無で変わるため、表にはドアを持たせて評価時に確かめる。
+幽霊の出現や移動など乱数で決まる部分は含めない（`threat.forecast_threat` を参照）。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from . import actions
+from .actions import DIRECTIONS, Action
+from .balance import DEFAULT_FREEZE_TURNS, DEFAULT_SPEED_BOOST_TURNS, BalanceConfig
+from .entities import Item, ItemType
+from .room import Door, Room
+from .types import Position
+
+if TYPE_CHECKING:
+    from .state import GameState
+
+# 移動が止まる理由。
+BLOCKED_WALL = "wall"
+BLOCKED_ONE_WAY = "one_way"
+BLOCKED_LOCKED = "locked"
+
+
+@dataclass(frozen=True)
+class Step:
+    """1方向へ1歩動いた結果。`blocked` が None でなければその場に留まる。"""
+
+    room_id: str
+    position: Position
+    door: Optional[Door] = None
+    blocked: Optional[str] = None
+
+
+class MoveTable:
+    """部屋ごとに、全マスから `DIRECTIONS` の順に1歩動いた結果を前計算した表。壁が崩れたら作り直す。"""
+
+    def __init__(self, state: "GameState") -> None:
+        self.state = state
+        self._version = state.layout_version
+        self._rooms: Dict[str, Dict[Position, Tuple[Step, ...]]] = {}
+
+    def steps(self, room_id: str, position: Position) -> Tuple[Step, ...]:
+        if self._version != self.state.layout_version:
+            self._rooms.clear()
+            self._version = self.state.layout_version
+        table = self._rooms.get(room_id)
+        if table is None:
+            table = self._rooms[room_id] = _room_steps(self.state.rooms[room_id])
+        return table[position]
+
+    def mask(self, room_id: str, position: Position) -> int:
+        """壁と一方通行で止まらない方向のビット集合（ビット i = `DIRECTIONS[i]`）。施錠は考慮しない。"""
+        steps = self.steps(room_id, position)
+        return sum(1 << code for code, step in enumerate(steps) if step.blocked is None)
+
+
+def _room_steps(room: Room) -> Dict[Position, Tuple[Step, ...]]:
+    table: Dict[Position, Tuple[Step, ...]] = {}
+    room_id = room.room_id
+    for y in range(room.height):
+        for x in range(room.width):
+            position = (x, y)
+            steps = []
+            door_here = room.door_at(position)
+            for direction in DIRECTIONS:
+                if door_here and direction == door_here.direction:
+                    steps.append(
+                        Step(door_here.target_room_id, door_here.target_position, door_here)
+                    )
+                    continue
+                if not room.allows_exit_from(position, direction):
+                    steps.append(Step(room_id, position, blocked=BLOCKED_ONE_WAY))
+                    continue
+                dx, dy = direction.delta
+                candidate = (x + dx, y + dy)
+                door_ahead = room.door_at(candidate)
+                if door_ahead and direction == door_ahead.direction:
+                    # ドアのマスへドアの向きに踏み込むと、そのまま隣の部屋へ抜ける。
+                    steps.append(
+                        Step(door_ahead.target_room_id, door_ahead.target_position, door_ahead)
+                    )
+                elif not room.is_walkable(candidate):
+                    steps.append(Step(room_id, position, blocked=BLOCKED_WALL))
+                else:
+                    steps.append(Step(room_id, candidate))
+            table[position] = tuple(steps)
+    return table
+
+
+@dataclass(frozen=True)
+class ActionOutcome:
+    """1つの行動を今の状態で行った場合の決定的な結果。
+
+    - `room_id` / `position`: 行動後のプレイヤーのマス。`steps` は実際に進んだ歩数。
+    - `blocked`: 移動が途中で止まった理由（`BLOCKED_WALL` / `BLOCKED_ONE_WAY` / `BLOCKED_LOCKED`）。
+    - `revealed`: 調べて見つかるアイテム（探索マスで引くアイテムは状態に加えていない複製）。
+    - `tunnel`: 調べたときに破壊道具で崩れる脆い壁。
+    - `taken`: 拾うアイテム。`effect` / `duration`: 使うアイテムの効果（`ItemType` 名）と効果ターン数。
+    - `escapes` / `caught`: 幽霊が動く前の勝敗判定で脱出する・捕まるか。
+    """
+
+    action: Action
+    room_id: str
+    position: Position
+    steps: int = 0
+    blocked: Optional[str] = None
+    revealed: Tuple[Item, ...] = ()
+    tunnel: Optional[Position] = None
+    taken: Tuple[Item, ...] = ()
+    effect: Optional[str] = None
+    duration: int = 0
+    escapes: bool = False
+    caught: bool = False
+
+
+def evaluate_actions(
+    state: "GameState", balance: Optional[BalanceConfig] = None
+) -> List[ActionOutcome]:
+    """ターンを消費する行動（移動・調べる・拾う・使う）をすべて列挙し、それぞれの結果を返す。
+
+    移動は速度の範囲で方向の組み合わせをすべて試す（途中で止まった組み合わせの先は伸ばさない）。
+    効果がなくターンを消費しない行動（鍵を「使う」など）は含めない。状態は変更しない。
+    """
+    balance = balance or BalanceConfig()
+    player = state.player
+    here = (player.room_id, player.position)
+    has_key = state._player_has_valid_key()
+    table = state.move_table()
+    ghost_tiles = {(ghost.room_id, ghost.position) for ghost in state.active_ghosts()}
+
+    def outcome(
+        action: Action, tile: Tuple[str, Position], gains_key: bool = False, **fields: object
+    ) -> ActionOutcome:
+        return ActionOutcome(
+            action,
+            tile[0],
+            tile[1],
+            escapes=tile == (state.exit_room_id, state.exit_position) and (has_key or gains_key),
+            caught=tile in ghost_tiles,
+            **fields,  # type: ignore[arg-type]
+        )
+
+    results: List[ActionOutcome] = []
+
+    # 移動。既に止まった組み合わせは伸ばさず、途中の手も1つの行動として数える。
+    speed = player.current_speed
+    frontier: List[Tuple[Tuple[int, ...], Tuple[str, Position]]] = [((), here)]
+    while frontier:
+        codes, tile = frontier.pop(0)
+        for code, step in enumerate(table.steps(*tile)):
+            sequence = codes + (code,)
+            action = Action(actions.Opcode.MOVE, sequence)
+            blocked = step.blocked
+            if blocked is None and step.door is not None and step.door.is_locked and not has_key:
+                blocked = BLOCKED_LOCKED
+            if blocked is not None:
+                results.append(outcome(action, tile, steps=len(codes), blocked=blocked))
+                continue
+            reached = (step.room_id, step.position)
+            results.append(outcome(action, reached, steps=len(sequence)))
+            if len(sequence) < speed:
+                frontier.append((sequence, reached))
+
+    # 調べる・拾う。足元のアイテムは一度だけ走査する。
+    items_here = state.items_at_position(*here, include_hidden=True)
+    revealed = [item for item in items_here if item.hidden]
+    explore_tile = player.position in state.rooms[player.room_id].explore_positions
+    if state.loot is not None and explore_tile and here not in state._looted:
+        drawn = state.loot.draw(*here)  # マスごとのシードで引くので、実際に調べたときと同じアイテムになる。
+        if drawn is not None:
+            revealed.append(drawn)
+    results.append(
+        outcome(actions.SEARCH, here, revealed=tuple(revealed), tunnel=_tunnel_target(state))
+    )
+
+    visible = [item for item in items_here if not item.hidden]
+    if visible:
+        takes = [(actions.TAKE_ALL, visible)]
+        if len(visible) > 1:
+            takes.extend((Action.take(index), [item]) for index, item in enumerate(visible))
+        for action, taken in takes:
+            gains_key = any(
+                item.item_type == ItemType.KEY and item.metadata.get("is_master", False)
+                for item in taken
+            )
+            results.append(outcome(action, here, gains_key, taken=tuple(taken)))
+
+    # 使う。ターンを消費するのは加速と幽霊停止だけ。
+    for index, item in enumerate(player.inventory):
+        if item.item_type == ItemType.SPEED_BOOST:
+            duration = balance.duration_for(item, DEFAULT_SPEED_BOOST_TURNS)
+        elif item.item_type == ItemType.GHOST_FREEZE:
+            duration = balance.duration_for(item, DEFAULT_FREEZE_TURNS)
+        else:
+            continue
+        results.append(
+            outcome(Action.use(index), here, effect=item.item_type.name, duration=duration)
+        )
+    return results
+
+
+def _tunnel_target(state: "GameState") -> Optional[Position]:
+    """`GameState._try_create_tunnel` が崩す壁。破壊道具がなければ None。"""
+    player = state.player
+    if player.find_item_of_type(ItemType.WALL_BREAKER) is None:
+        return None
+    room = state.rooms[player.room_id]
+    for direction in DIRECTIONS:
+        dx, dy = direction.delta
+        candidate = (player.position[0] + dx, player.position[1] + dy)
+        if room.is_fragile_wall(candidate):
+            return candidate
+    return None
@@ -0,0 +1,145 @@
+"""ゲーム内の出来事を型付きイベントとして購読者へ配信するイベントバス。
+
+発行側は `bus.wants(EventType)` を確かめてからイベントを組み立てるため、購読者のいない種別は
+オブジェクトの生成すら行われない。UI やテレメトリ、ボットは `state.log` を解析したり
+状態をポーリングしたりせずに進行を観察できる。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Type, TypeVar
+
+from .types import Position
+
+
+@dataclass(frozen=True)
+class Event:
+    """全イベント共通の基底。`turn` は発生したターン番号。"""
+
+    turn: int
+
+
+@dataclass(frozen=True)
+class PlayerMoved(Event):
+    from_room_id: str
+    from_position: Position
+    room_id: str
+    position: Position
+
+
+@dataclass(frozen=True)
+class RoomEntered(Event):
+    room_id: str
+    previous_room_id: str
+
+
+@dataclass(frozen=True)
+class TileSearched(Event):
+    """プレイヤーが足元を調べた。何も見つからなかった場合も発行する。"""
+
+    room_id: str
+    position: Position
+
+
+@dataclass(frozen=True)
+class ItemRevealed(Event):
+    item_id: str
+    room_id: str
+    position: Optional[Position]
+
+
+@dataclass(frozen=True)
+class ItemPickedUp(Event):
+    item_id: str
+    room_id: str
+    position: Optional[Position]
+
+
+@dataclass(frozen=True)
+class GhostSpawned(Event):
+    ghost_id: str
+    room_id: str
+    position: Position
+
+
+@dataclass(frozen=True)
+class GhostMoved(Event):
+    ghost_id: str
+    from_room_id: str
+    from_position: Position
+    room_id: str
+    position: Position
+
+
+@dataclass(frozen=True)
+class FreezeApplied(Event):
+    """部屋（`target_kind="room"`）または幽霊（`"ghost"`）への凍結。`duration` は延長後の残りターン。"""
+
+    target_kind: str
+    target_id: str
+    duration: int
+
+
+@dataclass(frozen=True)
+class WallCollapsed(Event):
+    room_id: str
+    position: Position
+
+
+@dataclass(frozen=True)
+class GameOver(Event):
+    """ゲーム終了。`room_id` / `position` は終了時のプレイヤーの位置（捕まった場所など）。"""
+
+    winner: Optional[str]
+    room_id: Optional[str] = None
+    position: Optional[Position] = None
+
+
+E = TypeVar("E", bound=Event)
+
+
+class EventBus:
+    """イベントの型ごとに購読者を保持し、発行順に同期的に呼び出す。
+
+    購読は型の完全一致で判定する（基底クラス `Event` を購読しても全種別は届かない）。
+    """
+
+    def __init__(self) -> None:
+        # 購読者が1人以上いる型だけをキーに持つ。空になった型は取り除く。
+        self._handlers: Dict[type, List[Callable[[Event], None]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._handlers)
+
+    def subscribe(self, event_type: Type[E], handler: Callable[[E], None]) -> Callable[[], None]:
+        """`event_type` の購読を登録し、解除用の関数を返す。"""
+        self._handlers.setdefault(event_type, []).append(handler)  # type: ignore[arg-type]
+
+        def unsubscribe() -> None:
+            self.unsubscribe(event_type, handler)
+
+        return unsubscribe
+
+    def unsubscribe(self, event_type: Type[E], handler: Callable[[E], None]) -> None:
+        handlers = self._handlers.get(event_type)
+        if not handlers:
+            return
+        try:
+            handlers.remove(handler)  # type: ignore[arg-type]
+        except ValueError:
+            return
+        if not handlers:
+            del self._handlers[event_type]
+
+    def wants(self, event_type: type) -> bool:
+        """`event_type` に購読者がいるか。発行側はこれが真のときだけイベントを組み立てる。"""
+        return event_type in self._handlers
+
+    def publish(self, event: Event) -> None:
+        handlers = self._handlers.get(type(event))
+        if not handlers:
+            return
+        # 配信中の購読解除に備えて複製を回す。
+        for handler in list(handlers):
+            handler(event)
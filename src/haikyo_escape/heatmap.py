@@ -0,0 +1,313 @@
+"""多数のシミュレーションにわたるマス単位の集計（訪問・捕獲・探索・幽霊出現）と端末向けの描画。
+
+各チャンネルは `(部屋数, 高さ, 幅)` の行優先の整数配列（`array("Q")`）で、添字は `TileIndex` が決める。
+1ゲームごとのイベントは共有の `EventBus` から直接配列へ足し込むため、イベント列を保存・転送しない。
+ワーカーごとの部分集計は `Heatmap.merge` で要素ごとに足し合わせる。
+
+実行例: `PYTHONPATH=src python -m haikyo_escape.heatmap --games 10000
+--channel visits --channel catches`
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .balance import BalanceConfig
+from .events import EventBus, GameOver, GhostSpawned, PlayerMoved, TileSearched
+from .room import Room
+from .simulation import DEFAULT_MAX_TURNS, POLICIES, create_game_state, play_game
+from .tracing import install_from_env
+from .types import Position
+
+VISITS = "visits"
+CATCHES = "catches"
+SEARCHES = "searches"
+SPAWNS = "spawns"
+CHANNELS = (VISITS, CATCHES, SEARCHES, SPAWNS)
+
+# 描画に使う濃淡。左ほど少なく、0回のマスは空白にする。
+_SHADES = " .:-=+*%@"
+
+
+@dataclass(frozen=True)
+class TileIndex:
+    """`(部屋, 座標)` と配列の添字の対応。部屋の大きさが違う場合は最大の高さ・幅に揃える。"""
+
+    room_ids: Tuple[str, ...]
+    height: int
+    width: int
+    _rows: Dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        rows = {room_id: row for row, room_id in enumerate(self.room_ids)}
+        object.__setattr__(self, "_rows", rows)
+
+    @classmethod
+    def from_rooms(cls, rooms: Mapping[str, Room]) -> "TileIndex":
+        return cls(
+            room_ids=tuple(rooms),
+            height=max((room.height for room in rooms.values()), default=0),
+            width=max((room.width for room in rooms.values()), default=0),
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return (len(self.room_ids), self.height, self.width)
+
+    @property
+    def size(self) -> int:
+        return len(self.room_ids) * self.height * self.width
+
+    def offset(self, room_id: str, position: Position) -> int:
+        x, y = position
+        return (self._rows[room_id] * self.height + y) * self.width + x
+
+
+class Heatmap:
+    """チャンネルごとのマス単位カウンタ。`attach` したバスのイベントを数える。
+
+    - visits: プレイヤーが歩いて入ったマス（開始地点に立っているだけでは数えない）。
+    - catches: 幽霊に捕まったときのプレイヤーの位置。
+    - searches: 調べたマス（何も出なかった場合も含む）。
+    - spawns: 幽霊が出現したマス。
+    """
+
+    def __init__(self, index: TileIndex, counts: Optional[Mapping[str, array]] = None) -> None:
+        self.index = index
+        # 集計したゲーム数。`max_turns` で打ち切ったゲームも含むよう、イベントではなく収集側が数える。
+        self.games = 0
+        if counts is None:
+            counts = {channel: array("Q", bytes(8 * index.size)) for channel in CHANNELS}
+        self.counts: Dict[str, array] = dict(counts)
+
+    def add(self, channel: str, room_id: str, position: Position, amount: int = 1) -> None:
+        self.counts[channel][self.index.offset(room_id, position)] += amount
+
+    def count(self, channel: str, room_id: str, position: Position) -> int:
+        return self.counts[channel][self.index.offset(room_id, position)]
+
+    def total(self, channel: str) -> int:
+        return sum(self.counts[channel])
+
+    def room(self, channel: str, room_id: str) -> List[List[int]]:
+        """部屋1つ分を `[y][x]` の2次元リストで返す。"""
+        width = self.index.width
+        start = self.index.offset(room_id, (0, 0))
+        values = self.counts[channel][start:start + self.index.height * width]
+        return [values[y * width:(y + 1) * width].tolist() for y in range(self.index.height)]
+
+    def hottest(self, channel: str, limit: int = 5) -> List[Tuple[str, Position, int]]:
+        """カウントの多い順に `(部屋, 座標, 回数)` を返す。"""
+        values = self.counts[channel]
+        ranked = sorted(
+            (offset for offset in range(len(values)) if values[offset]), key=lambda o: -values[o]
+        )
+        per_room = self.index.height * self.index.width
+        result = []
+        for offset in ranked[:limit]:
+            row, rest = divmod(offset, per_room)
+            y, x = divmod(rest, self.index.width)
+            result.append((self.index.room_ids[row], (x, y), values[offset]))
+        return result
+
+    def merge(self, other: "Heatmap") -> None:
+        """`other` のカウントを要素ごとに足し込む。添字の対応が違う集計同士は足せない。"""
+        if other.index != self.index:
+            raise ValueError("Cannot merge heatmaps built for different tile layouts.")
+        for channel, values in other.counts.items():
+            mine = self.counts[channel]
+            self.counts[channel] = array("Q", map(int.__add__, mine, values))
+        self.games += other.games
+
+    def attach(self, bus: EventBus) -> Callable[[], None]:
+        """`bus` のイベントをこの集計へ足し込むよう購読し、解除用の関数を返す。"""
+        counts, offset = self.counts, self.index.offset
+
+        def on_move(event: PlayerMoved) -> None:
+            counts[VISITS][offset(event.room_id, event.position)] += 1
+
+        def on_search(event: TileSearched) -> None:
+            counts[SEARCHES][offset(event.room_id, event.position)] += 1
+
+        def on_spawn(event: GhostSpawned) -> None:
+            counts[SPAWNS][offset(event.room_id, event.position)] += 1
+
+        def on_game_over(event: GameOver) -> None:
+            caught = event.winner == "ghosts"
+            if caught and event.room_id is not None and event.position is not None:
+                counts[CATCHES][offset(event.room_id, event.position)] += 1
+
+        unsubscribers = [
+            bus.subscribe(PlayerMoved, on_move),
+            bus.subscribe(TileSearched, on_search),
+            bus.subscribe(GhostSpawned, on_spawn),
+            bus.subscribe(GameOver, on_game_over),
+        ]
+
+        def detach() -> None:
+            for unsubscribe in unsubscribers:
+                unsubscribe()
+
+        return detach
+
+
+# ---------------------------------------------------------------------------
+# 収集
+# ---------------------------------------------------------------------------
+
+
+def default_index() -> TileIndex:
+    """標準ダンジョンの添字。レイアウトはシードによらないので1つで足りる。"""
+    return TileIndex.from_rooms(create_game_state(0).rooms)
+
+
+def collect_heatmap(
+    seeds: Sequence[int],
+    *,
+    policy: str = "seeker",
+    max_turns: int = DEFAULT_MAX_TURNS,
+    detect_stuck: bool = False,
+    balance: Optional[Mapping[str, object]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+) -> Heatmap:
+    """`seeds` の各ゲームを回して集計する。`workers=0` ならこのプロセスで順に実行する。
+
+    `balance` は `BalanceConfig.from_params` に渡すパラメータ辞書。結果はワーカー数によらない。
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy '{policy}'.")
+    params = dict(balance or {})
+    BalanceConfig.from_params(params)
+    chunks = [
+        (tuple(seeds[start:start + chunk_size]), policy, max_turns, detect_stuck, params)
+        for start in range(0, len(seeds), chunk_size)
+    ]
+    heatmap = Heatmap(default_index())
+    if workers == 0:
+        for chunk in chunks:
+            heatmap.merge(heatmap_chunk(chunk))
+        return heatmap
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(heatmap_chunk, chunks):
+            heatmap.merge(partial)
+    return heatmap
+
+
+def heatmap_chunk(job: Tuple[Tuple[int, ...], str, int, bool, Dict[str, object]]) -> Heatmap:
+    """1チャンク分のゲームを1つのバスで観察して集計する。プロセスプールから呼ぶため最上位に置く。"""
+    seeds, policy, max_turns, detect_stuck, params = job
+    balance = BalanceConfig.from_params(params)
+    heatmap = Heatmap(default_index())
+    bus = EventBus()
+    heatmap.attach(bus)
+    for seed in seeds:
+        play_game(
+            seed,
+            POLICIES[policy],
+            max_turns=max_turns,
+            detect_stuck=detect_stuck,
+            balance=balance,
+            events=bus,
+        )
+    heatmap.games = len(seeds)
+    return heatmap
+
+
+# ---------------------------------------------------------------------------
+# 描画
+# ---------------------------------------------------------------------------
+
+
+def render_heatmap(
+    heatmap: Heatmap,
+    channel: str = VISITS,
+    *,
+    rooms: Optional[Mapping[str, Room]] = None,
+    columns: Optional[int] = None,
+) -> str:
+    """チャンネルを部屋ごとの枠付きグリッドとして描く。濃淡は最大値に対する対数尺度。
+
+    `rooms` を渡すと壁を `#` で描く。部屋は `columns` 個ずつ横に並べる（既定は部屋数の平方根）。
+    """
+    index = heatmap.index
+    values = heatmap.counts[channel]
+    peak = max(values, default=0)
+    scale = math.log1p(peak) or 1.0
+    if columns is None:
+        columns = max(1, math.isqrt(max(len(index.room_ids) - 1, 0)) + 1)
+
+    blocks: List[List[str]] = []
+    for room_id in index.room_ids:
+        room = rooms.get(room_id) if rooms is not None else None
+        lines = [f"{room_id:<{index.width + 2}}", "+" + "-" * index.width + "+"]
+        for y, row in enumerate(heatmap.room(channel, room_id)):
+            cells = []
+            for x, value in enumerate(row):
+                if room is not None and not room.is_walkable((x, y)):
+                    cells.append("#")
+                elif value == 0:
+                    cells.append(" ")
+                else:
+                    level = 1 + int(math.log1p(value) / scale * (len(_SHADES) - 2))
+                    cells.append(_SHADES[min(level, len(_SHADES) - 1)])
+            lines.append("|" + "".join(cells) + "|")
+        lines.append("+" + "-" * index.width + "+")
+        blocks.append(lines)
+
+    output = [
+        f"{channel}: {heatmap.total(channel)} over {heatmap.games} games (max {peak} per tile)"
+    ]
+    for start in range(0, len(blocks), columns):
+        group = blocks[start:start + columns]
+        for parts in zip(*group):
+            output.append(" ".join(parts).rstrip())
+    return "\n".join(output)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Aggregate per-tile heatmaps over seeded bot games."
+    )
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="seeker")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument("--detect-stuck", action="store_true")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="process count (0 runs in-process)"
+    )
+    parser.add_argument("--chunk-size", type=int, default=200, help="games per worker task")
+    parser.add_argument(
+        "--channel",
+        action="append",
+        choices=CHANNELS,
+        help="channel to draw (repeatable, default: all)",
+    )
+    parser.add_argument("--top", type=int, default=5, help="list the N busiest tiles per channel")
+    args = parser.parse_args(argv)
+    install_from_env()
+
+    heatmap = collect_heatmap(
+        range(args.seed, args.seed + args.games),
+        policy=args.policy,
+        max_turns=args.max_turns,
+        detect_stuck=args.detect_stuck,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+    )
+    rooms = create_game_state(0).rooms
+    for channel in args.channel or CHANNELS:
+        print(render_heatmap(heatmap, channel, rooms=rooms))
+        for room_id, position, value in heatmap.hottest(channel, args.top):
+            print(f"  {room_id} {position}: {value}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
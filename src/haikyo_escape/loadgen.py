@@ -0,0 +1,211 @@
+"""プロセス内の `AsyncGameEngine` を多数同時に動かす合成負荷ジェネレータ。
+
+各プレイヤーは対数正規分布の思考時間だけ待ってからボットの行動を返し、ゲームが終われば
+別シードで次のゲームを始める。外部サービスは使わず、1つのイベントループ上で完結する。
+フェーズごとの処理時間は `MetricsRegistry` のヒストグラムに集まり、思考時間の待ちが
+予定よりどれだけ遅れて戻ったか（イベントループの遅延）も併せて記録する。
+
+実行例: `PYTHONPATH=src python -m haikyo_escape.loadgen --players 1,100,10000 --duration 10`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .engine import ActionInput, AsyncGameEngine
+from .entities import Player
+from .metrics import TURN_SECONDS, MetricsRegistry
+from .simulation import DEFAULT_MAX_TURNS, POLICIES, PolicyFactory, SeekerPolicy, create_game_state
+from .state import GameState
+from .tracing import install_from_env
+
+LOOP_LAG = "loadgen.loop_lag.seconds"
+# ボットが行動を選ぶのにかかった時間。エンジン側のフェーズ時間には含まれない。
+POLICY_SECONDS = "loadgen.policy.seconds"
+GAMES_FINISHED = "loadgen.games_finished"
+GAMES_STARTED = "loadgen.games_started"
+
+
+@dataclass
+class ThinkTime:
+    """プレイヤーの思考時間（秒）の分布。中央値 `median` の対数正規分布を `maximum` で打ち切る。"""
+
+    median: float = 0.5
+    sigma: float = 0.8
+    maximum: float = 30.0
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        return min(rng.lognormvariate(math.log(self.median), self.sigma), self.maximum)
+
+
+@dataclass
+class LoadReport:
+    """1回の負荷実行の結果。"""
+
+    players: int
+    elapsed: float
+    metrics: MetricsRegistry = field(repr=False)
+
+    @property
+    def turns(self) -> int:
+        return self.metrics.histogram(TURN_SECONDS).count
+
+    @property
+    def turns_per_second(self) -> float:
+        return self.turns / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, object]:
+        snapshot = self.metrics.snapshot()
+        histograms = snapshot["histograms"]
+        assert isinstance(histograms, dict)
+        return {
+            "players": self.players,
+            "elapsed": self.elapsed,
+            "turns": self.turns,
+            "turns_per_second": self.turns_per_second,
+            "games_started": self.metrics.counter(GAMES_STARTED).value,
+            "games_finished": self.metrics.counter(GAMES_FINISHED).value,
+            "phases": {
+                name: histogram
+                for name, histogram in histograms.items()
+                if name.startswith("phase.") or name == TURN_SECONDS
+            },
+            "policy": histograms.get(POLICY_SECONDS),
+            "loop_lag": histograms.get(LOOP_LAG),
+        }
+
+
+async def run_load(
+    players: int,
+    *,
+    duration: float,
+    think_time: Optional[ThinkTime] = None,
+    policy: PolicyFactory = SeekerPolicy,
+    seed: int = 0,
+    max_turns: int = DEFAULT_MAX_TURNS,
+) -> LoadReport:
+    """`players` 人を `duration` 秒間同時に動かし、処理時間の分布をまとめて返す。
+
+    時間が来たら全プレイヤーを打ち切る。イベントループが過負荷なら `elapsed` は `duration` を超える。
+    """
+    if players <= 0:
+        raise ValueError("players must be positive.")
+    think_time = think_time or ThinkTime()
+    metrics = MetricsRegistry()
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_simulated_player(index, think_time, policy, seed, max_turns, metrics))
+        for index in range(players)
+    ]
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        # 思考中のプレイヤーは入力を返す前に止まるため、解決途中のターンは残らない。
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return LoadReport(players=players, elapsed=time.perf_counter() - started, metrics=metrics)
+
+
+async def _simulated_player(
+    index: int,
+    think_time: ThinkTime,
+    policy: PolicyFactory,
+    seed: int,
+    max_turns: int,
+    metrics: MetricsRegistry,
+) -> None:
+    loop = asyncio.get_running_loop()
+    rng = random.Random(f"load:{seed}:{index}")
+    # 全員が同時に1ターン目を打たないよう、最初の待ちで開始時刻をばらけさせる。
+    await asyncio.sleep(rng.uniform(0.0, think_time.median))
+
+    while True:
+        game_seed = rng.randrange(2**31)
+        state = create_game_state(game_seed)
+        choose = policy(random.Random(f"policy:{game_seed}"))
+
+        async def think_then_choose(state: GameState, player: Player) -> ActionInput:
+            delay = think_time.sample(rng)
+            before = loop.time()
+            await asyncio.sleep(delay)
+            metrics.observe(LOOP_LAG, max(loop.time() - before - delay, 0.0))
+            started = time.perf_counter()
+            action = choose(state, player)
+            metrics.observe(POLICY_SECONDS, time.perf_counter() - started)
+            return action
+
+        engine = AsyncGameEngine(state, think_then_choose, metrics=metrics)
+        metrics.inc(GAMES_STARTED)
+        while not state.is_over and state.turn_count < max_turns:
+            await engine.run_turn()
+        if state.is_over:
+            metrics.inc(GAMES_FINISHED)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Drive many simulated players against in-process engines."
+    )
+    parser.add_argument(
+        "--players",
+        default="1,10,100",
+        help="comma-separated concurrency levels to sweep (e.g. 1,100,10000,100000)",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="seconds per concurrency level"
+    )
+    parser.add_argument(
+        "--think-median", type=float, default=0.5, help="median think time in seconds"
+    )
+    parser.add_argument(
+        "--think-sigma", type=float, default=0.8, help="log-normal sigma of think time"
+    )
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="seeker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print one JSON summary per level")
+    args = parser.parse_args(argv)
+    install_from_env()
+
+    think_time = ThinkTime(median=args.think_median, sigma=args.think_sigma)
+    for players in (int(value) for value in args.players.split(",") if value.strip()):
+        report = asyncio.run(
+            run_load(
+                players,
+                duration=args.duration,
+                think_time=think_time,
+                policy=POLICIES[args.policy],
+                seed=args.seed,
+            )
+        )
+        summary = report.summary()
+        if args.json:
+            print(json.dumps(summary))
+            continue
+        turn = summary["phases"].get(TURN_SECONDS) or {}  # type: ignore[union-attr]
+        policy = summary["policy"] or {}
+        lag = summary["loop_lag"] or {}
+        print(
+            f"players={players:<7} turns/s={report.turns_per_second:10.1f} "
+            f"turn p50={_ms(turn.get('p50'))} p95={_ms(turn.get('p95'))} "
+            f"p99={_ms(turn.get('p99'))} "
+            f"policy p99={_ms(policy.get('p99'))} "  # type: ignore[union-attr]
+            f"loop lag p99={_ms(lag.get('p99'))}"  # type: ignore[union-attr]
+        )
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000.0:.3f}ms"
+
+
+if __name__ == "__main__":
+    main()
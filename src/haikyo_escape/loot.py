@@ -0,0 +1,115 @@
+"""探索マスを調べたときに引く、重み付きのアイテムテーブル。
+
+抽選は Walker のエイリアス法で 1 回あたり O(1)。アイテムは生成時には作らず、
+`GameState.reveal_items_at_player` がそのマスを初めて調べたときに引く。マスごとに
+(テーブルのシード, 部屋 ID, 座標) から乱数を派生させるため、調べる順番が変わっても
+各マスから出るアイテムは変わらない。
+"""
+
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .entities import Item, ItemType
+from .types import Position
+
+
+class AliasTable:
+    """重みに比例して添字を返す Walker のエイリアス表。構築は O(n)、抽選は O(1)。"""
+
+    __slots__ = ("probabilities", "aliases")
+
+    def __init__(self, weights: Sequence[float]) -> None:
+        total = float(sum(weights))
+        if not weights or total <= 0 or any(weight < 0 for weight in weights):
+            raise ValueError("weights must be non-negative with a positive total.")
+        count = len(weights)
+        scaled = [weight * count / total for weight in weights]
+        self.probabilities = [1.0] * count
+        self.aliases = list(range(count))
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probabilities[less] = scaled[less]
+            self.aliases[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # 残りは丸め誤差で 1.0 からわずかにずれただけなので、確率 1 のまま置く。
+
+    def __len__(self) -> int:
+        return len(self.probabilities)
+
+    def sample(self, rng: random.Random) -> int:
+        column = int(rng.random() * len(self.probabilities))
+        return column if rng.random() < self.probabilities[column] else self.aliases[column]
+
+
+@dataclass(frozen=True)
+class LootEntry:
+    """テーブルの1行。`key` は引いたアイテムの ID の接頭辞になる。"""
+
+    key: str
+    name: str
+    item_type: ItemType
+    weight: float
+    metadata: Mapping[str, object] = field(default_factory=dict)
+
+
+class LootTable:
+    """`entries` と「何も出ない」重み `empty_weight` から1つを引くテーブル。"""
+
+    def __init__(self, entries: Sequence[LootEntry], empty_weight: float = 0.0) -> None:
+        self.entries: Tuple[LootEntry, ...] = tuple(entries)
+        self.empty_weight = empty_weight
+        self._alias = AliasTable([entry.weight for entry in self.entries] + [empty_weight])
+
+    def draw(self, rng: random.Random) -> Optional[LootEntry]:
+        index = self._alias.sample(rng)
+        return self.entries[index] if index < len(self.entries) else None
+
+    def may_yield(self, item_type: ItemType) -> bool:
+        return any(entry.item_type == item_type and entry.weight > 0 for entry in self.entries)
+
+
+@dataclass
+class LootTables:
+    """部屋・マスごとのテーブル割り当て。マスの指定が部屋の指定より優先し、どちらもなければ `default`。"""
+
+    seed: int
+    default: Optional[LootTable] = None
+    rooms: Dict[str, LootTable] = field(default_factory=dict)
+    tiles: Dict[Tuple[str, Position], LootTable] = field(default_factory=dict)
+
+    def table_for(self, room_id: str, position: Position) -> Optional[LootTable]:
+        table = self.tiles.get((room_id, position))
+        if table is None:
+            table = self.rooms.get(room_id, self.default)
+        return table
+
+    def may_yield(self, item_type: ItemType) -> bool:
+        tables: List[LootTable] = [*self.rooms.values(), *self.tiles.values()]
+        if self.default is not None:
+            tables.append(self.default)
+        return any(table.may_yield(item_type) for table in tables)
+
+    def draw(self, room_id: str, position: Position) -> Optional[Item]:
+        """マス `(room_id, position)` の抽選結果を隠し状態のアイテムとして返す。何も出なければ None。"""
+        table = self.table_for(room_id, position)
+        if table is None:
+            return None
+        x, y = position
+        entry = table.draw(random.Random(f"loot:{self.seed}:{room_id}:{x}:{y}"))
+        if entry is None:
+            return None
+        return Item(
+            item_id=f"{entry.key}@{room_id}:{x},{y}",
+            name=entry.name,
+            item_type=entry.item_type,
+            room_id=room_id,
+            hidden=True,
+            position=position,
+            metadata=dict(entry.metadata),
+        )
@@ -0,0 +1,146 @@
+"""エンジンの処理時間と処理量を集計するメトリクスレジストリ。
+
+`GameEngine(metrics=...)` で接続すると、フェーズごとの処理時間（単調増加クロック、入力待ちは除外）
+をヒストグラムへ、BFS の呼び出し回数や展開ノード数、アイテム走査数、ログ件数をカウンタへ積む。
+`snapshot()` で現在値を辞書として取り出せる。
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Optional
+
+# GameState / GameEngine が更新するメトリクス名。
+BFS_CALLS = "bfs.calls"
+BFS_NODES = "bfs.nodes_expanded"
+ITEMS_SCANNED = "items.scanned"
+LOG_RECORDS = "log.records"
+TURN_SECONDS = "turn.seconds"
+
+
+def phase_metric(phase_name: str) -> str:
+    return f"phase.{phase_name}.seconds"
+
+
+class Counter:
+    """単調増加する整数カウンタ。"""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Histogram:
+    """対数バケットで値を数えるヒストグラム。
+
+    バケット幅は相対誤差 `relative_error` 以内に収まるよう決めるため、件数に関わらずメモリは
+    値域の桁数にしか比例しない。`minimum` 未満の値は最小バケットに丸める。
+    """
+
+    def __init__(self, relative_error: float = 0.01, minimum: float = 1e-7) -> None:
+        self.relative_error = relative_error
+        self.minimum = minimum
+        self._log_growth = math.log1p(2 * relative_error)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """`fraction`（0〜1）分位点の近似値を返す。"""
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def merge(self, other: "Histogram") -> None:
+        if other.relative_error != self.relative_error or other.minimum != self.minimum:
+            raise ValueError("Cannot merge histograms with different bucket layouts.")
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max if self.count else None,
+        }
+
+    def _index(self, value: float) -> int:
+        if value <= self.minimum:
+            return 0
+        return int(math.log(value / self.minimum) / self._log_growth) + 1
+
+    def _value(self, index: int) -> float:
+        # バケットの中央値（幾何平均）を代表値とする。
+        if index == 0:
+            return self.minimum
+        return self.minimum * math.exp((index - 0.5) * self._log_growth)
+
+
+class MetricsRegistry:
+    """名前付きのカウンタとヒストグラムを保持する。"""
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, Counter] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def counter(self, name: str) -> Counter:
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = Counter()
+        return counter
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        self.counter(name).inc(amount)
+
+    def observe(self, name: str, value: float) -> None:
+        self.histogram(name).observe(value)
+
+    def merge(self, other: "MetricsRegistry") -> None:
+        for name, counter in other.counters.items():
+            self.counter(name).inc(counter.value)
+        for name, histogram in other.histograms.items():
+            self.histogram(name).merge(histogram)
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {
+            "counters": {name: counter.value for name, counter in sorted(self.counters.items())},
+            "histograms": {
+                name: histogram.summary() for name, histogram in sorted(self.histograms.items())
+            },
+        }
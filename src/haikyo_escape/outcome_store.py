@@ -0,0 +1,317 @@
+"""シミュレーション結果を列ごとの型付き配列ファイルへ追記・集計する列指向ストア。
+
+1フィールド1ファイル（`<field>.col`）の生バイナリとして追記し、読み出しは `mmap` した
+`memoryview` を返すため、行数が億単位になってもファイル全体を Python オブジェクトへ展開しない。
+標準ライブラリのみで動くが、返す `memoryview` は `numpy.frombuffer` にもそのまま渡せる。
+`Selection` の絞り込みと集計はインタプリタ上で1行ずつ回す O(n) のループで、ベクトル化はしていない
+（1億行で数十秒かかる）。大規模な集計は `column()` のビューを NumPy などへ渡すこと。
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import operator
+import os
+from array import array
+from collections import Counter
+from itertools import compress, repeat
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .simulation import GameOutcome
+
+# (フィールド名, array の型コード)。列を増やすときは末尾に追加し、_SCHEMA_VERSION を上げる。
+FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("seed", "q"),
+    ("winner", "b"),
+    ("turn_count", "i"),
+    ("total_steps", "i"),
+    ("action_count", "i"),
+    ("first_spawn_turn", "i"),
+    ("second_spawn_turn", "i"),
+    ("items_used", "h"),
+    # 手続き生成マップは部屋数が 32767 を、部屋の一辺が 127 マスを超え得るので 32 ビットで持つ。
+    ("catch_room", "i"),
+    ("catch_x", "i"),
+    ("catch_y", "i"),
+)
+
+# 勝者や部屋 ID は辞書化して整数で保存する。該当なしは -1。
+WINNER_CODES: Tuple[Optional[str], ...] = (None, "player", "ghosts", "quit", "stuck")
+MISSING = -1
+
+_SCHEMA_VERSION = 2
+_SCHEMA_FILE = "schema.json"
+_SUFFIX = ".col"
+
+_OPERATORS: Dict[str, Callable[[int, int], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class OutcomeStore:
+    """`GameOutcome` を列ごとに追記保存し、mmap 経由で読み出す。"""
+
+    def __init__(self, directory: str | os.PathLike[str], buffer_rows: int = 65536) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.buffer_rows = buffer_rows
+        self._typecodes = dict(FIELDS)
+        self._itemsizes = {name: array(code).itemsize for name, code in FIELDS}
+        self._buffers: Dict[str, array] = {name: array(code) for name, code in FIELDS}
+        self._maps: Dict[str, Tuple[int, Optional[mmap.mmap], memoryview]] = {}
+        self._winner_codes: List[Optional[str]] = list(WINNER_CODES)
+        self._room_ids: List[str] = []
+        self._room_index: Dict[str, int] = {}
+        self._load_schema()
+        self._rows = self._recover_row_count()
+
+    # ------------------------------------------------------------------
+    # 書き込み
+    # ------------------------------------------------------------------
+    def append(self, outcome: GameOutcome) -> None:
+        """1行を追記する。列の型に収まらない値があれば、どの列にも書かずに ValueError を送出する。"""
+        x, y = outcome.catch_position or (MISSING, MISSING)
+        row = (
+            outcome.seed,
+            self._winner_code(outcome.winner),
+            outcome.turn_count,
+            outcome.total_steps,
+            outcome.action_count,
+            _or_missing(outcome.first_spawn_turn),
+            _or_missing(outcome.second_spawn_turn),
+            outcome.items_used,
+            self._room_code(outcome.catch_room_id),
+            x,
+            y,
+        )
+        buffers = [self._buffers[name] for name, _ in FIELDS]
+        for written, (buffer, value) in enumerate(zip(buffers, row)):
+            try:
+                buffer.append(value)
+            except OverflowError:
+                # 列ごとの行数がずれないよう、この行で追記した分を取り消す。
+                for appended in buffers[:written]:
+                    appended.pop()
+                name = FIELDS[written][0]
+                raise ValueError(
+                    f"{name}={value} does not fit the '{buffer.typecode}' column."
+                ) from None
+        if len(buffers[0]) >= self.buffer_rows:
+            self.flush()
+
+    def extend(self, outcomes: Iterable[GameOutcome]) -> None:
+        for outcome in outcomes:
+            self.append(outcome)
+
+    def flush(self) -> None:
+        """バッファ済みの行を各列ファイルの末尾へ書き出す。"""
+        pending = len(self._buffers["seed"])
+        if not pending:
+            return
+        self._write_schema()
+        for name, buffer in self._buffers.items():
+            with open(self._path(name), "ab") as handle:
+                buffer.tofile(handle)
+            del buffer[:]
+        self._rows += pending
+        self._release_maps()
+
+    def close(self) -> None:
+        self.flush()
+        self._release_maps()
+
+    def __enter__(self) -> "OutcomeStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # 読み出し
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        """ディスクへ書き出し済みの行数（未 flush 分は含まない）。"""
+        return self._rows
+
+    @property
+    def room_ids(self) -> Sequence[str]:
+        return tuple(self._room_ids)
+
+    def column(self, name: str) -> memoryview:
+        """列ファイルを mmap した読み取り専用ビューを返す。"""
+        if name not in self._typecodes:
+            raise KeyError(f"Unknown column: {name}")
+        size = self._rows * self._itemsizes[name]
+        cached = self._maps.get(name)
+        if cached is not None and cached[0] == size:
+            return cached[2]
+        if cached is not None:
+            self._release_map(name)
+
+        if size == 0:
+            view = memoryview(array(self._typecodes[name]))
+            self._maps[name] = (0, None, view)
+            return view
+        with open(self._path(name), "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), size, access=mmap.ACCESS_READ)
+        view = memoryview(mapped).cast(self._typecodes[name])
+        self._maps[name] = (size, mapped, view)
+        return view
+
+    def query(self) -> "Selection":
+        return Selection(self, None)
+
+    def encode(self, name: str, value: object) -> int:
+        """フィルタ用に、文字列や `None` の値を列に保存されている整数へ変換する。"""
+        if name == "winner":
+            return self._winner_codes.index(value) if value in self._winner_codes else -2
+        if name == "catch_room":
+            if value is None:
+                return MISSING
+            return self._room_index.get(value, -2)  # type: ignore[arg-type]
+        if value is None:
+            return MISSING
+        return int(value)  # type: ignore[arg-type]
+
+    def decode(self, name: str, code: int) -> object:
+        if name == "winner":
+            return self._winner_codes[code]
+        if name == "catch_room":
+            return None if code == MISSING else self._room_ids[code]
+        return code
+
+    # ------------------------------------------------------------------
+    # 内部処理
+    # ------------------------------------------------------------------
+    def _path(self, name: str) -> Path:
+        return self.directory / f"{name}{_SUFFIX}"
+
+    def _winner_code(self, winner: Optional[str]) -> int:
+        if winner not in self._winner_codes:
+            self._winner_codes.append(winner)
+        return self._winner_codes.index(winner)
+
+    def _room_code(self, room_id: Optional[str]) -> int:
+        if room_id is None:
+            return MISSING
+        code = self._room_index.get(room_id)
+        if code is None:
+            code = len(self._room_ids)
+            self._room_ids.append(room_id)
+            self._room_index[room_id] = code
+        return code
+
+    def _load_schema(self) -> None:
+        path = self.directory / _SCHEMA_FILE
+        if not path.exists():
+            return
+        schema = json.loads(path.read_text(encoding="utf-8"))
+        if schema.get("version") != _SCHEMA_VERSION:
+            raise ValueError(f"Unsupported outcome store schema: {schema.get('version')}")
+        if [tuple(field) for field in schema["fields"]] != list(FIELDS):
+            raise ValueError("Outcome store columns do not match this version.")
+        self._winner_codes = list(schema["winners"])
+        self._room_ids = list(schema["rooms"])
+        self._room_index = {room_id: code for code, room_id in enumerate(self._room_ids)}
+
+    def _write_schema(self) -> None:
+        schema = {
+            "version": _SCHEMA_VERSION,
+            "fields": [list(field) for field in FIELDS],
+            "winners": self._winner_codes,
+            "rooms": self._room_ids,
+        }
+        path = self.directory / _SCHEMA_FILE
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(schema, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _recover_row_count(self) -> int:
+        """列ごとの行数のうち最小値を採用し、書き込み途中で落ちた端数行を切り捨てる。"""
+        counts = []
+        for name, _ in FIELDS:
+            path = self._path(name)
+            size = path.stat().st_size if path.exists() else 0
+            counts.append(size // self._itemsizes[name])
+        rows = min(counts)
+        for name, _ in FIELDS:
+            path = self._path(name)
+            expected = rows * self._itemsizes[name]
+            if path.exists() and path.stat().st_size != expected:
+                with open(path, "r+b") as handle:
+                    handle.truncate(expected)
+        return rows
+
+    def _release_map(self, name: str) -> None:
+        _, mapped, view = self._maps.pop(name)
+        try:
+            view.release()
+            if mapped is not None:
+                mapped.close()
+        except BufferError:
+            pass  # 呼び出し側がまだビューを保持している。参照が切れた時点で GC が閉じる。
+
+    def _release_maps(self) -> None:
+        for name in list(self._maps):
+            self._release_map(name)
+
+
+class Selection:
+    """行マスクを持つ絞り込み結果。`where` を重ねると AND 条件になる。
+
+    マスクの作成も集計も Python の1行ずつのループ（O(n)）。
+    """
+
+    def __init__(self, store: OutcomeStore, mask: Optional[bytes]) -> None:
+        self.store = store
+        self.mask = mask
+
+    def where(self, name: str, op: str, value: object) -> "Selection":
+        compare = _OPERATORS[op]
+        column = self.store.column(name)
+        code = self.store.encode(name, value)
+        matches = bytes(map(compare, column, repeat(code)))
+        if self.mask is not None:
+            matches = bytes(map(operator.and_, self.mask, matches))
+        return Selection(self.store, matches)
+
+    def values(self, name: str) -> Iterable[int]:
+        column = self.store.column(name)
+        if self.mask is None:
+            return column
+        return compress(column, self.mask)
+
+    def count(self) -> int:
+        if self.mask is None:
+            return len(self.store)
+        return self.mask.count(1)
+
+    def sum(self, name: str) -> int:
+        return sum(self.values(name))
+
+    def mean(self, name: str) -> Optional[float]:
+        count = self.count()
+        if count == 0:
+            return None
+        return self.sum(name) / count
+
+    def min(self, name: str) -> Optional[int]:
+        return min(self.values(name), default=None)
+
+    def max(self, name: str) -> Optional[int]:
+        return max(self.values(name), default=None)
+
+    def value_counts(self, name: str) -> Dict[object, int]:
+        counts = Counter(self.values(name))
+        return {self.store.decode(name, code): count for code, count in sorted(counts.items())}
+
+
+def _or_missing(value: Optional[int]) -> int:
+    return MISSING if value is None else value
@@ -0,0 +1,250 @@
+"""幽霊の追跡に使う移動グラフと、目標マスまでの距離場（追跡場）のキャッシュ。
+
+幽霊は毎ステップ「プレイヤーのマスまでの最短経路の1歩目」へ進む。目標マスから逆向きに
+BFS した距離場があれば、どの幽霊のどのステップも「距離が1小さい最初の隣接マス」を
+選ぶだけで決まる。隣接マスを `GameState._neighbors` と同じ順で調べるため、
+`GameState._shortest_path` の経路の1歩目と同じマスが選ばれる。
+
+距離場はプレイヤーの位置だけで決まるので、入力待ちの間にバックグラウンドで
+候補マス分を先に計算しておける（`prefetch`）。
+
+移動グラフは部屋のレイアウトと安全部屋だけで決まるため、壁を崩していないゲーム同士では
+同じレイアウトの `GhostGraph` を1つ共有する（`shared_graph`）。距離場のキャッシュはゲームごとに持ち、
+件数ではなくおおよそのバイト数で上限を決める。距離場はマス番号で引く `array` に詰めるので、
+大きな生成マップでも1件あたりマス数×2バイト程度に収まる。
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .types import Position
+
+if TYPE_CHECKING:
+    from .state import GameState
+
+Tile = Tuple[str, Position]
+# マス番号（`GhostGraph.index`）ごとの目標までの歩数。届かないマスは `GhostGraph.unreached`。
+DistanceField = "array[int]"
+
+
+class GhostGraph:
+    """幽霊視点の移動グラフ（順方向と逆方向の隣接リスト）。壁が崩れたら作り直す。
+
+    距離場の計算用に、各マスへ 0 からの番号（`index`）を振り、逆方向の隣接も番号で持つ。
+    """
+
+    def __init__(self, state: "GameState") -> None:
+        self.forward: Dict[Tile, List[Tile]] = {}
+        for room_id, room in state.rooms.items():
+            for y in range(room.height):
+                for x in range(room.width):
+                    position = (x, y)
+                    if not room.is_walkable(position):
+                        continue
+                    self.forward[(room_id, position)] = state._neighbors(
+                        room_id, position, for_player=False
+                    )
+        self.reverse: Dict[Tile, List[Tile]] = {tile: [] for tile in self.forward}
+        for tile, neighbors in self.forward.items():
+            for neighbor in neighbors:
+                self.reverse.setdefault(neighbor, []).append(tile)
+        self.index: Dict[Tile, int] = {tile: number for number, tile in enumerate(self.reverse)}
+        self._reverse_ids: List[List[int]] = [
+            [self.index[previous] for previous in previous_tiles]
+            for previous_tiles in self.reverse.values()
+        ]
+        # 歩数はマス数未満なので、マス数が収まる最小の型を選ぶ（最大値を「届かない」に使う）。
+        self.typecode = "H" if len(self.index) < 0xFFFF else "I"
+        self.unreached = 0xFFFF if self.typecode == "H" else 0xFFFFFFFF
+
+    def distance_field(self, target: Tile) -> DistanceField:
+        """各マスから `target` までの最短歩数を逆向き BFS で求める。"""
+        distances = array(self.typecode, [self.unreached]) * len(self.index)
+        start = self.index.get(target)
+        if start is None:
+            return distances
+        distances[start] = 0
+        queue: Deque[int] = deque([start])
+        reverse_ids = self._reverse_ids
+        unreached = self.unreached
+        while queue:
+            number = queue.popleft()
+            next_distance = distances[number] + 1
+            for previous in reverse_ids[number]:
+                if distances[previous] == unreached:
+                    distances[previous] = next_distance
+                    queue.append(previous)
+        return distances
+
+    def reached(self, field: DistanceField) -> int:
+        """距離場で目標へ届くマスの数。"""
+        return len(field) - field.count(self.unreached)
+
+
+# 共有グラフ。キーはレイアウトの id の並びと安全部屋で、値にはレイアウト自体も持たせて
+# id が別のレイアウトに再利用されないようにする。手続き生成で毎回別のレイアウトになる場合に
+# 備えて、最近使った数件だけを残す。
+_SHARED_GRAPHS: "OrderedDict[Tuple[Any, ...], Tuple[Tuple[Any, ...], GhostGraph]]" = OrderedDict()
+_SHARED_GRAPHS_LOCK = threading.Lock()
+MAX_SHARED_GRAPHS = 8
+
+
+def shared_graph(state: "GameState") -> GhostGraph:
+    """`state` と同じレイアウト・安全部屋のゲームで共有する移動グラフ。壁を崩したゲームでは使わない。"""
+    layouts = tuple(room.layout for room in state.rooms.values())
+    key = (tuple(state.rooms), tuple(map(id, layouts)), frozenset(state.safe_rooms))
+    with _SHARED_GRAPHS_LOCK:
+        entry = _SHARED_GRAPHS.get(key)
+        if entry is not None:
+            _SHARED_GRAPHS.move_to_end(key)
+            return entry[1]
+    graph = GhostGraph(state)
+    with _SHARED_GRAPHS_LOCK:
+        # 同時に作られた場合は先に登録された方を使う。
+        entry = _SHARED_GRAPHS.setdefault(key, (layouts, graph))
+        _SHARED_GRAPHS.move_to_end(key)
+        while len(_SHARED_GRAPHS) > MAX_SHARED_GRAPHS:
+            _SHARED_GRAPHS.popitem(last=False)
+    return entry[1]
+
+
+def _field_bytes(field: DistanceField) -> int:
+    """距離場のサイズ。`array` は要素の領域も含めて数えられる。"""
+    return sys.getsizeof(field)
+
+
+class PursuitFields:
+    """目標マスごとの距離場を上限付きでキャッシュし、幽霊の次の一歩を返す。
+
+    キャッシュは `max_bytes` を超えたら古いものから捨てる。ただし直近の `prefetch` で
+    先読みした分は、次の先読みまで（幽霊の移動で使われるまで）上限を超えても残す。
+    複製や pickle ではキャッシュとロックを持ち越さず、空の状態から作り直す。
+    """
+
+    def __init__(self, state: "GameState", max_bytes: int = 64 * 1024) -> None:
+        self.state = state
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.speculative = 0
+        self._graph: Optional[GhostGraph] = None
+        self._graph_version = -1
+        # (グラフ版数, 目標マス) -> 距離場。キー側に版数を含め、古いグラフの結果を取り違えない。
+        self._fields: "OrderedDict[Tuple[int, Tile], DistanceField]" = OrderedDict()
+        self._bytes = 0
+        self._pending: Dict[Tuple[int, Tile], "Future[DistanceField]"] = {}
+        # 今のターンの先読み分。次の `prefetch` で入れ替わるまで追い出さない。
+        self._pinned: Set[Tuple[int, Tile]] = set()
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, object]:
+        return {"state": self.state, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__init__(state["state"], state["max_bytes"])  # type: ignore[misc, arg-type]
+
+    @property
+    def cached_bytes(self) -> int:
+        return self._bytes
+
+    def graph(self) -> GhostGraph:
+        version = self.state.layout_version
+        if self._graph is None or self._graph_version != version:
+            if any(room.broken_walls for room in self.state.rooms.values()):
+                self._graph = GhostGraph(self.state)
+            else:
+                self._graph = shared_graph(self.state)
+            self._graph_version = version
+            with self._lock:
+                self._fields.clear()
+                self._bytes = 0
+                self._pending.clear()
+                self._pinned.clear()
+        return self._graph
+
+    def field_for(self, target: Tile) -> DistanceField:
+        graph = self.graph()
+        key = (self._graph_version, target)
+        with self._lock:
+            field = self._fields.get(key)
+            if field is not None:
+                self._fields.move_to_end(key)
+                self.hits += 1
+                return field
+            pending = self._pending.get(key)
+        if pending is not None:
+            # 先読み中の結果を待つ（計算済みなら即座に返る）。
+            field = pending.result()
+            self.hits += 1
+            return field
+
+        self.misses += 1
+        field = graph.distance_field(target)
+        self.state._count_bfs(graph.reached(field))
+        self._store(key, field)
+        return field
+
+    def next_step(self, origin: Tile, target: Tile) -> Optional[Tile]:
+        """`origin` から `target` へ向かう最短経路の1歩目。到達不能または到着済みなら None。"""
+        field = self.field_for(target)
+        graph = self.graph()
+        number = graph.index.get(origin)
+        if number is None:
+            return None
+        distance = field[number]
+        if distance == 0 or distance == graph.unreached:
+            return None
+        wanted = distance - 1
+        for neighbor in graph.forward.get(origin, ()):
+            if field[graph.index[neighbor]] == wanted:
+                return neighbor
+        return None
+
+    def prefetch(self, targets: Iterable[Tile], executor: Executor) -> None:
+        """候補マスの距離場を `executor` 上で先に計算しておく。
+
+        前回の先読み分の固定は外し、今回の候補を次の先読みまで追い出されないよう固定する。
+        """
+        graph = self.graph()
+        version = self._graph_version
+        keys = [(version, target) for target in targets]
+        with self._lock:
+            self._pinned = set(keys)
+        for key in keys:
+            with self._lock:
+                if key in self._fields or key in self._pending:
+                    continue
+                future = executor.submit(graph.distance_field, key[1])
+                self._pending[key] = future
+            future.add_done_callback(lambda done, key=key: self._finish_prefetch(key, done))
+
+    def _finish_prefetch(self, key: Tuple[int, Tile], future: "Future[DistanceField]") -> None:
+        with self._lock:
+            if self._pending.pop(key, None) is None:
+                return  # グラフが作り直されて不要になった。
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.speculative += 1
+        self._store(key, future.result())
+
+    def _store(self, key: Tuple[int, Tile], field: DistanceField) -> None:
+        with self._lock:
+            previous = self._fields.pop(key, None)
+            if previous is not None:
+                self._bytes -= _field_bytes(previous)
+            self._fields[key] = field
+            self._bytes += _field_bytes(field)
+            # 直近の1件と先読みで固定した分は上限を超えても残す（次の一歩の計算にすぐ使うため）。
+            while self._bytes > self.max_bytes:
+                victim = next(
+                    (old for old in self._fields if old != key and old not in self._pinned), None
+                )
+                if victim is None:
+                    break
+                self._bytes -= _field_bytes(self._fields.pop(victim))
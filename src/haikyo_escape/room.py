@@ -2,12 +2,13 @@
 
 各部屋は 6×6（デフォルト）のグリッドで構成され、壁や探索マス、他部屋へ接続するドアを持つ。
 一方通行ドアや施錠ドアにも対応し、迷路のような体験を構築できる。
+配置情報は `RoomLayout` として全ゲームで共有し、ゲームごとの変化だけを `Room` が持つ。
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, Optional, Set
+from typing import AbstractSet, Dict, FrozenSet, Iterable, Optional, Set
 
 from .types import Direction, Position
 
@@ -26,8 +27,12 @@ class Door:
 
 
 @dataclass
-class Room:
-    """壁・探索マス・ドア定義を含む 6×6 の部屋グリッド。"""
+class RoomLayout:
+    """壁・探索マス・ドア定義を含む 6×6 の部屋グリッド（全ゲームで共有できる不変部分）。
+
+    `add_*` は組み立て時専用。同じレイアウトを複数ゲームの `Room` が共有するため、
+    ゲーム開始後の変化（脆い壁の崩落など）は `Room` 側の差分に記録する。
+    """
 
     room_id: str
     name: str
@@ -44,9 +49,6 @@ class Room:
         x, y = position
         return 0 <= x < self.width and 0 <= y < self.height
 
-    def is_walkable(self, position: Position) -> bool:
-        return self.is_within_bounds(position) and position not in self.walls
-
     def add_wall(self, position: Position) -> None:
         if not self.is_within_bounds(position):
             raise ValueError(f"Wall {position} is outside room bounds.")
@@ -62,10 +64,6 @@ class Room:
         self.add_wall(position)
         self.fragile_walls.add(position)
 
-    def remove_wall(self, position: Position) -> None:
-        self.walls.discard(position)
-        self.fragile_walls.discard(position)
-
     def add_one_way_exit(self, position: Position, allowed_directions: Iterable[Direction]) -> None:
         if not self.is_within_bounds(position):
             raise ValueError(f"One-way tile {position} is outside room bounds.")
@@ -79,15 +77,140 @@ class Room:
         self.doors[direction] = door
         self.door_positions[door.position] = door
 
+
+# 崩した壁がない部屋で共有する空集合。最初に壁を崩した時点で部屋専用の集合に置き換える。
+_NO_BROKEN_WALLS: FrozenSet[Position] = frozenset()
+
+
+class Room:
+    """共有の `RoomLayout` と、ゲームごとの差分（崩した脆い壁）を組み合わせた部屋。
+
+    判定系のメソッドはすべてレイアウトと差分の両方を参照する。`layout` を省略すると
+    この部屋専用のレイアウトを作るため、従来どおり `Room(room_id, name)` から組み立てられる。
+    """
+
+    __slots__ = ("layout", "broken_walls")
+
+    def __init__(
+        self,
+        room_id: str = "",
+        name: str = "",
+        width: int = 6,
+        height: int = 6,
+        *,
+        layout: Optional[RoomLayout] = None,
+    ) -> None:
+        self.layout = layout if layout is not None else RoomLayout(room_id, name, width, height)
+        self.broken_walls: AbstractSet[Position] = _NO_BROKEN_WALLS
+
+    def __repr__(self) -> str:
+        return (
+            f"Room(room_id={self.room_id!r}, name={self.name!r}, "
+            f"broken_walls={set(self.broken_walls)!r})"
+        )
+
+    # ------------------------------------------------------------------
+    # レイアウトの参照
+    # ------------------------------------------------------------------
+    @property
+    def room_id(self) -> str:
+        return self.layout.room_id
+
+    @property
+    def name(self) -> str:
+        return self.layout.name
+
+    @property
+    def width(self) -> int:
+        return self.layout.width
+
+    @property
+    def height(self) -> int:
+        return self.layout.height
+
+    @property
+    def doors(self) -> Dict[Direction, Door]:
+        return self.layout.doors
+
+    @property
+    def door_positions(self) -> Dict[Position, Door]:
+        return self.layout.door_positions
+
+    @property
+    def explore_positions(self) -> Set[Position]:
+        return self.layout.explore_positions
+
+    @property
+    def one_way_exits(self) -> Dict[Position, Set[Direction]]:
+        return self.layout.one_way_exits
+
+    @property
+    def walls(self) -> AbstractSet[Position]:
+        """現在残っている壁。崩した壁がなければレイアウトの集合をそのまま返す（読み取り専用）。"""
+        if not self.broken_walls:
+            return self.layout.walls
+        return self.layout.walls - self.broken_walls
+
+    @property
+    def fragile_walls(self) -> AbstractSet[Position]:
+        """まだ崩れていない脆い壁（読み取り専用）。"""
+        if not self.broken_walls:
+            return self.layout.fragile_walls
+        return self.layout.fragile_walls - self.broken_walls
+
+    # ------------------------------------------------------------------
+    # 判定
+    # ------------------------------------------------------------------
+    def is_within_bounds(self, position: Position) -> bool:
+        x, y = position
+        return 0 <= x < self.layout.width and 0 <= y < self.layout.height
+
+    def is_walkable(self, position: Position) -> bool:
+        return self.is_within_bounds(position) and (
+            position not in self.layout.walls or position in self.broken_walls
+        )
+
     def door_at(self, position: Position) -> Optional[Door]:
-        return self.door_positions.get(position)
+        return self.layout.door_positions.get(position)
 
     def allows_exit_from(self, position: Position, direction: Direction) -> bool:
-        allowed = self.one_way_exits.get(position)
+        allowed = self.layout.one_way_exits.get(position)
         return allowed is None or direction in allowed
 
     def is_fragile_wall(self, position: Position) -> bool:
-        return position in self.fragile_walls
+        return position in self.layout.fragile_walls and position not in self.broken_walls
+
+    def has_fragile_walls(self) -> bool:
+        if not self.broken_walls:
+            return bool(self.layout.fragile_walls)
+        return any(position not in self.broken_walls for position in self.layout.fragile_walls)
+
+    # ------------------------------------------------------------------
+    # 組み立て（レイアウトへ委譲）とゲーム中の変化（差分へ記録）
+    # ------------------------------------------------------------------
+    def add_wall(self, position: Position) -> None:
+        self.layout.add_wall(position)
+
+    def add_explore_position(self, position: Position) -> None:
+        self.layout.add_explore_position(position)
+
+    def add_fragile_wall(self, position: Position) -> None:
+        """後から破壊して通路化できる壁を登録する。"""
+        self.layout.add_fragile_wall(position)
+
+    def add_one_way_exit(self, position: Position, allowed_directions: Iterable[Direction]) -> None:
+        self.layout.add_one_way_exit(position, allowed_directions)
+
+    def add_door(self, direction: Direction, door: Door) -> None:
+        self.layout.add_door(direction, door)
+
+    def remove_wall(self, position: Position) -> None:
+        """壁を崩す。共有レイアウトは変えず、この部屋の差分にだけ記録する。"""
+        if position not in self.layout.walls or position in self.broken_walls:
+            return
+        if not self.broken_walls:
+            self.broken_walls = set()
+        self.broken_walls.add(position)  # type: ignore[union-attr]
 
     def available_directions(self) -> Iterable[str]:
         return (direction.name.lower() for direction in self.doors.keys())
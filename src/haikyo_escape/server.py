@@ -0,0 +1,309 @@
+"""多数のゲームを1プロセスで同時にホストするセッション管理と、ローカルソケット用の行プロトコル。
+
+プロトコルは1行1リクエストで、応答は1行の JSON。失敗したリクエストには `"ok": false` と
+`"error"` を返し、想定外の例外でも接続は切らない。
+
+- `new [seed]` – セッションを作成し ID を返す。
+- `<id> move|search|take|use|wait ...` – 既存のコマンド語彙で1ターン進める。
+- `<id> look` – 現在位置や所持品を返す（ターンは進まない）。
+- `<id> quit` – ゲームを終了してセッションを破棄する。
+- `stats` – セッション数などの統計。
+
+起動例: `python -m haikyo_escape.server --port 7878` または `--unix /tmp/haikyo.sock`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .cache import DungeonCache
+from .engine import GameEngine
+from .entities import Player
+from .simulation import create_game_state
+from .state import GameState
+from .tracing import install_from_env
+
+logger = logging.getLogger(__name__)
+
+# 既存 CLI と同じ行動コマンドのみ受け付ける。
+ACTION_VERBS = frozenset({"move", "search", "take", "use", "wait"})
+
+
+class SessionError(Exception):
+    """存在しないセッションや不正なコマンドを表す。"""
+
+
+class SessionLimitError(SessionError):
+    """同時セッション数の上限に達して新規作成できないことを表す。"""
+
+
+@dataclass
+class Session:
+    session_id: str
+    engine: GameEngine
+    created_at: float
+    last_active: float
+    turns: int = field(default=0)
+
+    @property
+    def state(self) -> GameState:
+        return self.engine.state
+
+
+def _no_interactive_input(state: GameState, player: Player) -> str:
+    raise RuntimeError("Hosted sessions are driven through SessionManager.step().")
+
+
+class SessionManager:
+    """セッション ID ごとに `GameEngine` を生成・参照・進行・破棄する。
+
+    メモリの上限はバイト数ではなく、同時セッション数（`max_sessions`）とセッションごとのログ件数
+    （`max_log_entries`）で間接的に決める。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_sessions: int = 10000,
+        idle_timeout: float = 600.0,
+        max_log_entries: int = 64,
+        dungeon_cache: Optional[DungeonCache] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_log_entries = max_log_entries
+        self.dungeon_cache = dungeon_cache
+        self.clock = clock
+        self.expired = 0
+        # 最終操作が古い順に並ぶ。参照のたびに末尾へ移すため、期限切れの掃除は先頭から見ればよい。
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def create(self, seed: Optional[int] = None) -> Session:
+        if len(self._sessions) >= self.max_sessions:
+            self.evict_idle()
+        if len(self._sessions) >= self.max_sessions:
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached.")
+
+        setup = self.dungeon_cache.get_or_build(seed) if self.dungeon_cache else None
+        state = create_game_state(seed, setup)
+        engine = GameEngine(state=state, player_choice_fn=_no_interactive_input)
+        now = self.clock()
+        session_id = secrets.token_hex(8)
+        while session_id in self._sessions:
+            session_id = secrets.token_hex(8)
+        session = Session(session_id=session_id, engine=engine, created_at=now, last_active=now)
+        self._sessions[session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionError(f"Unknown session '{session_id}'.")
+        session.last_active = self.clock()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def step(self, session_id: str, command: str) -> List[str]:
+        """1ターン進め、そのターンに追加されたログを返す。"""
+        session = self.get(session_id)
+        verb = command.split(maxsplit=1)[0].lower() if command.strip() else ""
+        if verb not in ACTION_VERBS:
+            raise SessionError(f"Unsupported command '{command}'.")
+
+        state = session.state
+        before = len(state.log)
+        session.engine.step(command)
+        session.turns += 1
+        new_entries = state.log[before:]
+        state.trim_log(self.max_log_entries)
+        return new_entries
+
+    def expire(self, session_id: str) -> bool:
+        if self._sessions.pop(session_id, None) is None:
+            return False
+        self.expired += 1
+        return True
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """`idle_timeout` 秒以上操作のないセッションを破棄し、件数を返す。"""
+        now = self.clock() if now is None else now
+        evicted = 0
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_active < self.idle_timeout:
+                break
+            del self._sessions[session_id]
+            evicted += 1
+        self.expired += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "expired": self.expired,
+        }
+
+
+# ---------------------------------------------------------------------------
+# 行プロトコル
+# ---------------------------------------------------------------------------
+
+
+def handle_line(manager: SessionManager, line: str) -> Dict[str, object]:
+    """1行分のリクエストを処理し、応答の辞書を返す。"""
+    parts = line.strip().split(maxsplit=1)
+    if not parts:
+        return {"ok": False, "error": "empty request"}
+
+    try:
+        head = parts[0]
+        if head == "new":
+            try:
+                seed = int(parts[1]) if len(parts) > 1 else None
+            except ValueError:
+                return {"ok": False, "error": "seed must be an integer"}
+            session = manager.create(seed)
+            return {"ok": True, "session": session.session_id}
+        if head == "stats":
+            return {"ok": True, **manager.stats()}
+
+        if len(parts) < 2:
+            return {"ok": False, "error": "missing command"}
+        session_id, command = parts
+        if command.strip().lower() == "quit":
+            session = manager.get(session_id)
+            session.engine.step("quit")
+            manager.expire(session_id)
+            return {"ok": True, "over": True, "winner": session.state.winner}
+        if command.strip().lower() == "look":
+            return {"ok": True, **_describe(manager.get(session_id).state)}
+
+        entries = manager.step(session_id, command)
+        state = manager.get(session_id).state
+        response: Dict[str, object] = {
+            "ok": True,
+            "turn": state.turn_count,
+            "log": entries,
+            "over": state.is_over,
+            "winner": state.winner,
+        }
+        if state.is_over:
+            manager.expire(session_id)
+        return response
+    except SessionError as exc:
+        return {"ok": False, "error": str(exc)}
+
+
+def _describe(state: GameState) -> Dict[str, object]:
+    player = state.player
+    return {
+        "turn": state.turn_count,
+        "room": player.room_id,
+        "position": list(player.position),
+        "speed": player.current_speed,
+        "inventory": [item.item_id for item in player.inventory],
+        "ghosts": [
+            [ghost.entity_id, ghost.room_id, *ghost.position] for ghost in state.active_ghosts()
+        ],
+    }
+
+
+async def _serve_client(
+    manager: SessionManager,
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+) -> None:
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            request = line.decode("utf-8", errors="replace")
+            try:
+                response = handle_line(manager, request)
+            except Exception:
+                # エンジン側の不具合でも接続は切らず、この行だけを失敗として返す。
+                logger.exception("Request %r failed.", request.strip())
+                response = {"ok": False, "error": "internal error"}
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _evict_periodically(manager: SessionManager, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        manager.evict_idle()
+
+
+async def serve(
+    manager: SessionManager,
+    *,
+    host: str = "127.0.0.1",
+    port: int = 7878,
+    unix_path: Optional[str] = None,
+    evict_interval: float = 5.0,
+) -> None:
+    """TCP（または Unix ソケット）で行プロトコルを待ち受ける。"""
+
+    async def client_connected(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await _serve_client(manager, reader, writer)
+
+    if unix_path:
+        server = await asyncio.start_unix_server(client_connected, path=unix_path)
+    else:
+        server = await asyncio.start_server(client_connected, host=host, port=port)
+    evictor = asyncio.create_task(_evict_periodically(manager, evict_interval))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        evictor.cancel()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Host many Haunted Ruin Escape sessions over a local socket."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", dest="unix_path", help="Unix socket path (overrides host/port)")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--idle-timeout", type=float, default=600.0)
+    parser.add_argument("--cache-dir", help="directory for the seeded dungeon cache")
+    args = parser.parse_args(argv)
+    install_from_env()
+
+    cache = DungeonCache(args.cache_dir) if args.cache_dir else None
+    manager = SessionManager(
+        max_sessions=args.max_sessions,
+        idle_timeout=args.idle_timeout,
+        dungeon_cache=cache,
+    )
+    try:
+        asyncio.run(serve(manager, host=args.host, port=args.port, unix_path=args.unix_path))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
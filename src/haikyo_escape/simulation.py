@@ -0,0 +1,367 @@
+"""CLI を介さずにゲームを自動進行させ、1ゲームごとの結果を集めるためのヘルパー。
+
+バランス調整や統計取りのため、ボット（行動方針）を差し替えながら多数のシードを回す用途を想定する。
+"""
+
+from __future__ import annotations
+
+import os
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, Mapping, Optional, Union
+
+from . import actions
+from .actions import Action
+from .balance import BalanceConfig
+from .cache import DungeonCache
+from .dungeon import (
+    PROCEDURAL_GENERATOR_VERSION,
+    DungeonSetup,
+    GeneratorConfig,
+    build_default_dungeon,
+    build_procedural_dungeon,
+)
+from .engine import ChoiceFunc, GameEngine
+from .entities import Ghost, ItemType, Player
+from .events import EventBus
+from .state import GameState
+from .stats import StreamingStats
+from .types import Direction, Position
+
+PolicyFactory = Callable[[random.Random], ChoiceFunc]
+# シードからそのゲームのダンジョンを返す関数。None なら標準ダンジョンを組み立てる。
+SetupFactory = Callable[[int], DungeonSetup]
+
+DEFAULT_MAX_TURNS = 500
+
+
+def create_game_state(
+    seed: Optional[int] = None, setup: Optional[DungeonSetup] = None
+) -> GameState:
+    """標準のプレイヤーと幽霊2体を配置した `GameState` を組み立てる。"""
+    if setup is None:
+        setup = build_default_dungeon(random.Random(seed))
+
+    player = Player(
+        entity_id="player",
+        name="高校生プレイヤー",
+        room_id=setup.start_room_id,
+        position=setup.start_position,
+    )
+
+    ghosts = [
+        Ghost(
+            entity_id="ghost_a",
+            name="白い影",
+            room_id=setup.start_room_id,
+            position=setup.start_position,
+        ),
+        Ghost(
+            entity_id="ghost_b",
+            name="黒い影",
+            room_id=setup.start_room_id,
+            position=setup.start_position,
+        ),
+    ]
+
+    state = GameState(
+        rooms=setup.rooms,
+        player=player,
+        ghosts=ghosts,
+        exit_room_id=setup.exit_room_id,
+        exit_position=setup.exit_position,
+        start_room_id=setup.start_room_id,
+        start_position=setup.start_position,
+        safe_rooms=setup.safe_rooms,
+        rng_seed=seed,
+        loot=setup.loot,
+    )
+    for item in setup.items.values():
+        state.add_item(item)
+    return state
+
+
+def procedural_setups(
+    params: Mapping[str, object], cache_dir: Optional[Union[str, os.PathLike[str]]] = None
+) -> SetupFactory:
+    """シードから手続き生成ダンジョン（`params` は `GeneratorConfig` の上書き）を返す関数を作る。
+
+    `cache_dir` を渡すと `DungeonCache` を通し、同じシードの2回目以降（スイープの別の格子点や
+    次回の実行）はディスクから復元する。標準ダンジョンは復元しても組み立てと同じくらい
+    時間がかかるため、キャッシュを通すのは生成に時間のかかる手続き生成だけにしている。
+    """
+    params = dict(params)
+    try:
+        GeneratorConfig(**params).validate()  # type: ignore[arg-type]
+    except TypeError as exc:
+        raise ValueError(f"Unknown dungeon parameter: {exc}") from None
+    if cache_dir is None:
+        return lambda seed: build_procedural_dungeon(random.Random(seed), **params)
+    cache = DungeonCache(cache_dir)
+    return lambda seed: cache.get_or_build(
+        seed, params=params, builder=build_procedural_dungeon, version=PROCEDURAL_GENERATOR_VERSION
+    )
+
+
+# ---------------------------------------------------------------------------
+# ボット（行動方針）
+# ---------------------------------------------------------------------------
+
+
+class RandomPolicy:
+    """合法かどうかを気にせずランダムに行動を選ぶ最も単純なボット。"""
+
+    COMMANDS = (
+        Action.move(Direction.NORTH),
+        Action.move(Direction.EAST),
+        Action.move(Direction.SOUTH),
+        Action.move(Direction.WEST),
+        actions.SEARCH,
+        actions.TAKE_ALL,
+        Action.use(0),
+        actions.WAIT,
+    )
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+
+    def __call__(self, state: GameState, player: Player) -> Action:
+        return self.rng.choice(self.COMMANDS)
+
+
+class SeekerPolicy:
+    """未探索の探索マスを近い順に調べ、正しい鍵を得たら出口へ向かうボット。"""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self.searched: set[tuple[str, Position]] = set()
+        self.goal: Optional[tuple[str, Position]] = None
+
+    def __call__(self, state: GameState, player: Player) -> Action:
+        here = (player.room_id, player.position)
+        if state.items_at_position(player.room_id, player.position):
+            return actions.TAKE_ALL
+
+        room = state.rooms[player.room_id]
+        if player.position in room.explore_positions and here not in self.searched:
+            self.searched.add(here)
+            return actions.SEARCH
+
+        for index, item in enumerate(player.inventory):
+            if item.item_type == ItemType.SPEED_BOOST and player.speed_turns_remaining == 0:
+                return Action.use(index)
+
+        goal = self._choose_goal(state, player)
+        if goal is None:
+            return actions.WAIT
+
+        path = state._shortest_path(here, goal, for_player=True)
+        directions = []
+        for current, nxt in zip(path, path[1:]):
+            if len(directions) >= player.current_speed:
+                break
+            direction = _step_direction(state, current, nxt)
+            if direction is None:
+                break
+            directions.append(direction)
+            if nxt[0] != current[0]:
+                break  # ドアを抜けた先の状況は次のターンで判断する。
+        if not directions:
+            return actions.WAIT
+        return Action.move(*directions)
+
+    def _choose_goal(self, state: GameState, player: Player) -> Optional[tuple[str, Position]]:
+        if state._player_has_valid_key() and state.exit_room_id and state.exit_position:
+            return (state.exit_room_id, state.exit_position)
+
+        # 目標の探索マスは調べ終えるまで保持し、距離マップの再計算を避ける。
+        if self.goal is not None and self.goal not in self.searched:
+            return self.goal
+
+        distances = state._distance_map(player.room_id, player.position, for_player=True)
+        best: Optional[tuple[int, tuple[str, Position]]] = None
+        for room_id, room in state.rooms.items():
+            for position in room.explore_positions:
+                tile = (room_id, position)
+                if tile in self.searched or tile not in distances:
+                    continue
+                if best is None or distances[tile] < best[0]:
+                    best = (distances[tile], tile)
+        self.goal = best[1] if best else None
+        return self.goal
+
+
+# CLI から名前で選べるボット。
+POLICIES: Dict[str, PolicyFactory] = {"seeker": SeekerPolicy, "random": RandomPolicy}
+
+
+def _step_direction(
+    state: GameState,
+    current: tuple[str, Position],
+    nxt: tuple[str, Position],
+) -> Optional[Direction]:
+    room_id, position = current
+    if nxt[0] != room_id:
+        door = state.rooms[room_id].door_at(position)
+        return door.direction if door else None
+    delta = (nxt[1][0] - position[0], nxt[1][1] - position[1])
+    for direction in Direction:
+        if direction.delta == delta:
+            return direction
+    return None
+
+
+# ---------------------------------------------------------------------------
+# バッチ実行
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class GameOutcome:
+    """1ゲーム分の結果。列指向ストアの1行に対応する。"""
+
+    seed: int
+    winner: Optional[str]
+    turn_count: int
+    total_steps: int
+    action_count: int
+    first_spawn_turn: Optional[int]
+    second_spawn_turn: Optional[int]
+    items_used: int
+    catch_room_id: Optional[str]
+    catch_position: Optional[Position]
+
+
+def outcome_from_state(seed: int, state: GameState) -> GameOutcome:
+    spawn_turns = state.ghost_spawn_turns
+    caught = state.winner == "ghosts"
+    return GameOutcome(
+        seed=seed,
+        winner=state.winner,
+        turn_count=state.turn_count,
+        total_steps=state.total_steps,
+        action_count=state.action_count,
+        first_spawn_turn=spawn_turns[0] if spawn_turns else None,
+        second_spawn_turn=spawn_turns[1] if len(spawn_turns) > 1 else None,
+        items_used=state.items_used,
+        catch_room_id=state.player.room_id if caught else None,
+        catch_position=state.player.position if caught else None,
+    )
+
+
+class OutcomeSummary:
+    """`GameOutcome` を保持せずに集計する。ワーカーごとの要約を `merge` で統合できる。
+
+    ターン数などの系列は `StreamingStats` に流すため、ゲーム数によらずメモリは一定に収まる。
+    - turns: 全ゲームの終了（または打ち切り）ターン
+    - escape_turns / catch_turns: 脱出・捕獲したゲームのターン
+    - first_spawn_turn: 1体目の幽霊が出たターン（出なかったゲームは含まない）
+    - steps / items_used: 総歩数と使用アイテム数
+    """
+
+    SERIES = ("turns", "escape_turns", "catch_turns", "first_spawn_turn", "steps", "items_used")
+
+    def __init__(self) -> None:
+        self.games = 0
+        self.winners: Dict[Optional[str], int] = {}
+        self.series: Dict[str, StreamingStats] = {name: StreamingStats() for name in self.SERIES}
+
+    def add(self, outcome: GameOutcome) -> None:
+        self.games += 1
+        self.winners[outcome.winner] = self.winners.get(outcome.winner, 0) + 1
+        series = self.series
+        series["turns"].observe(outcome.turn_count)
+        if outcome.winner == "player":
+            series["escape_turns"].observe(outcome.turn_count)
+        elif outcome.winner == "ghosts":
+            series["catch_turns"].observe(outcome.turn_count)
+        if outcome.first_spawn_turn is not None:
+            series["first_spawn_turn"].observe(outcome.first_spawn_turn)
+        series["steps"].observe(outcome.total_steps)
+        series["items_used"].observe(outcome.items_used)
+
+    def merge(self, other: "OutcomeSummary") -> None:
+        self.games += other.games
+        for winner, count in other.winners.items():
+            self.winners[winner] = self.winners.get(winner, 0) + count
+        for name, stats in other.series.items():
+            self.series[name].merge(stats)
+
+    def to_state(self) -> Dict[str, object]:
+        return {
+            "games": self.games,
+            "winners": [[winner, count] for winner, count in self.winners.items()],
+            "series": {name: stats.to_state() for name, stats in self.series.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, object]) -> "OutcomeSummary":
+        summary = cls()
+        summary.games = state["games"]  # type: ignore[assignment]
+        winners = state["winners"]
+        summary.winners = {winner: count for winner, count in winners}  # type: ignore[union-attr]
+        for name, stats in state["series"].items():  # type: ignore[union-attr]
+            summary.series[name] = StreamingStats.from_state(stats)
+        return summary
+
+    def rate(self, winner: Optional[str]) -> float:
+        return self.winners.get(winner, 0) / self.games if self.games else 0.0
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "games": self.games,
+            "win_rate": self.rate("player"),
+            "catch_rate": self.rate("ghosts"),
+            "stuck_rate": self.rate("stuck"),
+            **{name: stats.summary() for name, stats in self.series.items()},
+        }
+
+
+def play_game(
+    seed: int,
+    policy: PolicyFactory = SeekerPolicy,
+    *,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    detect_stuck: bool = False,
+    balance: Optional[BalanceConfig] = None,
+    events: Optional[EventBus] = None,
+    setups: Optional[SetupFactory] = None,
+) -> GameOutcome:
+    """シード固定で1ゲームを最後まで（または `max_turns` まで）進める。
+
+    `detect_stuck` なら、出口へ辿り着けなくなった時点で winner="stuck" として打ち切る。
+    `events` を渡すと、複数ゲームのイベントを同じバスで購読できる。
+    `setups` を渡すと標準ダンジョンの代わりに `setups(seed)` のダンジョンで遊ぶ。
+    """
+    state = create_game_state(seed, setups(seed) if setups is not None else None)
+    # ボット側の乱数はエンジンの乱数列と独立させ、方針を変えても幽霊の挙動がずれないようにする。
+    engine = GameEngine(
+        state=state,
+        player_choice_fn=policy(random.Random(f"policy:{seed}")),
+        detect_stuck=detect_stuck,
+        balance=balance,
+        events=events,
+    )
+    while not state.is_over and state.turn_count < max_turns:
+        engine.run_turn()
+    return outcome_from_state(seed, state)
+
+
+def simulate(
+    seeds: Iterable[int],
+    policy: PolicyFactory = SeekerPolicy,
+    *,
+    max_turns: int = DEFAULT_MAX_TURNS,
+    detect_stuck: bool = False,
+    balance: Optional[BalanceConfig] = None,
+    setups: Optional[SetupFactory] = None,
+) -> Iterator[GameOutcome]:
+    for seed in seeds:
+        yield play_game(
+            seed,
+            policy,
+            max_turns=max_turns,
+            detect_stuck=detect_stuck,
+            balance=balance,
+            setups=setups,
+        )
@@ -8,12 +8,43 @@ from __future__ import annotations
 from collections import deque
 from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
 
+from . import delta
+from .balance import BalanceConfig
+from .delta import Change, StateDelta, build_delta
 from .entities import Ghost, Item, ItemType, Player
+from .events import (
+    EventBus,
+    FreezeApplied,
+    GameOver,
+    GhostMoved,
+    GhostSpawned,
+    ItemPickedUp,
+    ItemRevealed,
+    PlayerMoved,
+    RoomEntered,
+    TileSearched,
+    WallCollapsed,
+)
+from .evaluation import ActionOutcome, MoveTable, evaluate_actions
+from .loot import LootTables
+from .metrics import BFS_CALLS, BFS_NODES, ITEMS_SCANNED, LOG_RECORDS, MetricsRegistry
+from .pursuit import PursuitFields
 from .room import Door, Room
+from .timers import TimerWheel
 from .types import Direction, Position
 
+# 時限効果の種別。(種別, 対象 ID) をキーにタイマーホイールへ期限を登録する。
+SPEED_BOOST_EFFECT = "speed_boost"
+GHOST_FREEZE_EFFECT = "ghost_freeze"
+ROOM_FREEZE_EFFECT = "room_freeze"
+
+EffectKey = Tuple[str, str]
+
+# 変更ジャーナルの上限。超えたら古い半分を捨て、それより前の版数からの差分は全体を返す。
+_JOURNAL_LIMIT = 4096
+
 
 class TurnPhase(Enum):
     """ターンの進行段階を明示するための列挙体。"""
@@ -57,19 +88,104 @@ class GameState:
     first_ghost_spawned: bool = False
     second_ghost_spawned: bool = False
     room_freeze_turns: Dict[str, int] = field(default_factory=dict)
+    ghost_spawn_turns: List[int] = field(default_factory=list)
+    items_used: int = 0
+    metrics: Optional[MetricsRegistry] = field(default=None, repr=False, compare=False)
+    # 型付きイベントの配信先。購読者のいない種別はイベント自体を生成しない。
+    events: EventBus = field(default_factory=EventBus, repr=False, compare=False)
+    # 壁の崩落など移動グラフが変わるたびに増える版数。経路キャッシュの無効化に使う。
+    layout_version: int = 0
+    # 探索マスを初めて調べたときに引くアイテムテーブル。None なら配置済みのアイテムだけを公開する。
+    loot: Optional[LootTables] = field(default=None, repr=False, compare=False)
+    _looted: Set[Tuple[str, Position]] = field(
+        default_factory=set, init=False, repr=False, compare=False
+    )
+    _pursuit: Optional[PursuitFields] = field(default=None, init=False, repr=False, compare=False)
+    _moves: Optional[MoveTable] = field(default=None, init=False, repr=False, compare=False)
+    # 時限効果の期限（効果が切れるターン）。ホイールには期限ごとの発火予定だけを積む。
+    _effect_deadlines: Dict[EffectKey, int] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _timers: TimerWheel = field(default_factory=TimerWheel, init=False, repr=False, compare=False)
+    # `trim_log` で削ったログの件数。ログの通し番号は `log_offset + 添字`。
+    log_offset: int = field(default=0, init=False, repr=False, compare=False)
+    # 差分用の変更ジャーナル。初めて `diff_since` が呼ばれるまでは None で、記録のコストを払わない。
+    _journal: Optional[List[Change]] = field(default=None, init=False, repr=False, compare=False)
+    _journal_base: int = field(default=0, init=False, repr=False, compare=False)
+    _deltas: Dict[int, StateDelta] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     def __post_init__(self) -> None:
         if self.start_room_id:
             self.player.move_to(self.start_room_id)
         self.player.set_position(self.start_position)
-        self.player.tick_effects()  # 残りターン系のカウンタが負数にならないよう初期化する。
+        self._schedule_initial_effects()
 
     # ------------------------------------------------------------------
     # ログ記録
     # ------------------------------------------------------------------
     def record(self, message: str) -> None:
         """セッションログへメッセージを追記する。"""
+        if self._journal is not None:
+            self._touch(delta.LOG, self.log_offset + len(self.log))
         self.log.append(message)
+        if self.metrics is not None:
+            self.metrics.inc(LOG_RECORDS)
+
+    def trim_log(self, keep: int) -> None:
+        """長時間のセッションでメモリを抑えるため、直近 `keep` 件だけを残す。"""
+        if len(self.log) > keep:
+            removed = len(self.log) - keep
+            del self.log[:removed]
+            self.log_offset += removed
+
+    # ------------------------------------------------------------------
+    # 差分（観戦者・リモート UI 向け）
+    # ------------------------------------------------------------------
+    @property
+    def version(self) -> int:
+        """状態の版数。追跡中の変更があるたびに増える。"""
+        return self._journal_base + len(self._journal or ())
+
+    def diff_since(self, since: int) -> StateDelta:
+        """版数 `since` 以降の変化をまとめた差分を返す。
+
+        追跡開始前やジャーナルから消えた古い版数を渡した場合は全体のスナップショット
+        （`full=True`）を返す。返した差分の `version` を次回の `since` に使う。
+        同じ版数のまま同じ `since` で呼ばれた場合は、前回と同じオブジェクトを返す。
+        """
+        if self._journal is None:
+            # 初回の呼び出しから追跡を始める。版数を1つ進め、それ以前はすべて全体扱いにする。
+            self._journal = []
+            self._journal_base += 1
+        version = self.version
+        if since > version:
+            raise ValueError(f"Version {since} is newer than the current state version {version}.")
+
+        cached = self._deltas.get(since)
+        if cached is not None and cached.version == version:
+            return cached
+        if self._deltas and next(iter(self._deltas.values())).version != version:
+            self._deltas.clear()
+
+        if since < self._journal_base:
+            result = build_delta(self, since, None)
+        else:
+            result = build_delta(self, since, self._journal[since - self._journal_base :])
+        self._deltas[since] = result
+        return result
+
+    def _touch(self, kind: str, key: object) -> None:
+        """差分の追跡中なら、`(kind, key)` が変わったことをジャーナルに残す。"""
+        journal = self._journal
+        if journal is None:
+            return
+        journal.append((kind, key))
+        if len(journal) > _JOURNAL_LIMIT:
+            dropped = len(journal) // 2
+            del journal[:dropped]
+            self._journal_base += dropped
 
     # ------------------------------------------------------------------
     # アイテム管理
@@ -82,11 +198,15 @@ class GameState:
         self.items[item.item_id] = item
 
     def items_in_room(self, room_id: str, include_hidden: bool = False) -> Iterable[Item]:
+        if self.metrics is not None:
+            self.metrics.inc(ITEMS_SCANNED, len(self.items))
         for item in self.items.values():
             if item.room_id == room_id and (include_hidden or not item.hidden):
                 yield item
 
     def items_at_position(self, room_id: str, position: Position, include_hidden: bool = False) -> list[Item]:
+        if self.metrics is not None:
+            self.metrics.inc(ITEMS_SCANNED, len(self.items))
         return [
             item
             for item in self.items.values()
@@ -96,12 +216,28 @@ class GameState:
         ]
 
     def reveal_items_at_player(self) -> list[Item]:
-        """プレイヤーの足元にある隠しアイテムをすべて公開する。"""
+        """プレイヤーの足元にある隠しアイテムをすべて公開する。
+
+        `loot` があり、足元が未抽選の探索マスなら、先にそのマスのテーブルから1回引いて置く。
+        """
+        if self.loot is not None:
+            self._draw_loot(self.player.room_id, self.player.position)
+        if self.events.wants(TileSearched):
+            self.events.publish(
+                TileSearched(self.turn_count, self.player.room_id, self.player.position)
+            )
         visible = []
         for item in self.items_at_position(self.player.room_id, self.player.position, include_hidden=True):
             if item.hidden:
                 item.hidden = False
                 visible.append(item)
+        for item in visible:
+            self._touch(delta.ITEM, item.item_id)
+        if visible and self.events.wants(ItemRevealed):
+            for item in visible:
+                self.events.publish(
+                    ItemRevealed(self.turn_count, item.item_id, item.room_id, item.position)
+                )
         if visible:
             self.record(
                 "Revealed items: " + ", ".join(item.name for item in visible)
@@ -111,16 +247,30 @@ class GameState:
         self._try_create_tunnel()
         return visible
 
+    def _draw_loot(self, room_id: str, position: Position) -> None:
+        tile = (room_id, position)
+        if tile in self._looted or position not in self.rooms[room_id].explore_positions:
+            return
+        self._looted.add(tile)
+        item = self.loot.draw(room_id, position)  # type: ignore[union-attr]
+        if item is not None:
+            self.items[item.item_id] = item
+
     def pickup_item(self, item_id: str) -> bool:
         item = self.items.get(item_id)
         if not item or item.hidden:
             return False
         if item.room_id != self.player.room_id or item.position != self.player.position:
             return False
+        if self.events.wants(ItemPickedUp):
+            self.events.publish(
+                ItemPickedUp(self.turn_count, item.item_id, item.room_id, item.position)
+            )
         self.player.take_item(item)
         item.room_id = "inventory"
         item.position = None
         item.hidden = False
+        self._touch(delta.ITEM, item.item_id)
         self.record(f"Picked up {item.name}.")
         return True
 
@@ -130,6 +280,8 @@ class GameState:
         if consumed:
             consumed.room_id = "consumed"
             consumed.position = None
+            self.items_used += 1
+            self._touch(delta.ITEM, item_id)
 
     # ------------------------------------------------------------------
     # 移動系処理
@@ -167,7 +319,12 @@ class GameState:
 
         self.player.set_position(candidate)
         self.total_steps += 1
+        self._touch(delta.PLAYER, self.player.entity_id)
         self.record(f"Player moved to {self.player.position} in {room.room_id}.")
+        if self.events.wants(PlayerMoved):
+            self.events.publish(
+                PlayerMoved(self.turn_count, room.room_id, current_pos, room.room_id, candidate)
+            )
         return ActionResult.SUCCESS
 
     def _move_player_through_door(self, door: Door) -> ActionResult:
@@ -176,12 +333,26 @@ class GameState:
             self.record("Door is locked. Need the correct key.")
             return ActionResult.BLOCKED
 
+        previous_room_id, previous_position = self.player.room_id, self.player.position
         self.player.move_to(door.target_room_id)
         self.player.set_position(door.target_position)
         self.total_steps += 1
+        self._touch(delta.PLAYER, self.player.entity_id)
         self.record(
             f"Player moved through door to {door.target_room_id} @ {door.target_position}."
         )
+        if self.events.wants(PlayerMoved):
+            self.events.publish(
+                PlayerMoved(
+                    self.turn_count,
+                    previous_room_id,
+                    previous_position,
+                    door.target_room_id,
+                    door.target_position,
+                )
+            )
+        if self.events.wants(RoomEntered) and door.target_room_id != previous_room_id:
+            self.events.publish(RoomEntered(self.turn_count, door.target_room_id, previous_room_id))
         return ActionResult.SUCCESS
 
     def _player_has_valid_key(self) -> bool:
@@ -194,20 +365,78 @@ class GameState:
     # ターン開始時の更新
     # ------------------------------------------------------------------
     def tick_start_of_turn(self) -> None:
-        """ターン開始時に効果ターンを減衰させる。"""
-        self.player.tick_effects()
-        expired_rooms = []
-        for room_id, remaining in self.room_freeze_turns.items():
-            if remaining <= 1:
-                expired_rooms.append(room_id)
-            else:
-                self.room_freeze_turns[room_id] = remaining - 1
-        for room_id in expired_rooms:
-            del self.room_freeze_turns[room_id]
-            self.record(f"The ghost-freeze effect in {room_id} wears off.")
+        """ターン開始時に、期限を迎えた時限効果だけを解除する。
+
+        残りターン系のカウンタ（`speed_turns_remaining` など）は毎ターン減らさず、付与時の値のまま
+        期限のターンに 0 へ戻す。正確な残りターン数は `effect_remaining()` で得る。
+        効果は `apply_speed_boost` / `freeze_ghost` / `freeze_room` からだけ付与する。
+        """
+        turn = self.turn_count
+        for key in self._timers.advance(turn):
+            deadline = self._effect_deadlines.get(key)
+            if deadline is None or deadline > turn:
+                continue  # 延長済み、または解除済みの古い登録。
+            del self._effect_deadlines[key]
+            self._touch(delta.EFFECT, key)
+            kind, target = key
+            if kind == SPEED_BOOST_EFFECT:
+                self.player.speed_turns_remaining = 0
+            elif kind == GHOST_FREEZE_EFFECT:
+                for ghost in self.ghosts:
+                    if ghost.entity_id == target:
+                        ghost.frozen_turns = 0
+            elif kind == ROOM_FREEZE_EFFECT:
+                self.room_freeze_turns.pop(target, None)
+                self.record(f"The ghost-freeze effect in {target} wears off.")
+
+    # ------------------------------------------------------------------
+    # 時限効果
+    # ------------------------------------------------------------------
+    def apply_speed_boost(self, duration: int) -> None:
+        self.player.speed_turns_remaining = self._extend_effect(
+            (SPEED_BOOST_EFFECT, self.player.entity_id), duration
+        )
 
+    def freeze_ghost(self, ghost: Ghost, duration: int) -> None:
+        ghost.frozen_turns = self._extend_effect((GHOST_FREEZE_EFFECT, ghost.entity_id), duration)
+        if self.events.wants(FreezeApplied):
+            self.events.publish(
+                FreezeApplied(self.turn_count, "ghost", ghost.entity_id, ghost.frozen_turns)
+            )
+
+    def active_effects(self) -> list[EffectKey]:
+        """効果中の (種別, 対象 ID) の一覧。"""
+        return list(self._effect_deadlines)
+
+    def effect_remaining(self, kind: str, target: str) -> int:
+        """効果 `(kind, target)` の残りターン数。効いていなければ 0。"""
+        deadline = self._effect_deadlines.get((kind, target))
+        return max(deadline - self.turn_count, 0) if deadline is not None else 0
+
+    def _extend_effect(self, key: EffectKey, duration: int) -> int:
+        """効果の期限を今から `duration` ターン後まで延ばし（短くはしない）、残りターン数を返す。"""
+        remaining = max(self.effect_remaining(*key), duration)
+        deadline = self.turn_count + remaining
+        if self._effect_deadlines.get(key) != deadline:
+            self._effect_deadlines[key] = deadline
+            self._timers.schedule(deadline, key)
+            self._touch(delta.EFFECT, key)
+        return remaining
+
+    def _schedule_initial_effects(self) -> None:
+        """生成時点で残っている効果カウンタを期限としてホイールへ登録する。"""
+        self._timers.clear(self.turn_count)
+        self._effect_deadlines.clear()
+        player = self.player
+        if player.speed_turns_remaining > 0:
+            self._extend_effect(
+                (SPEED_BOOST_EFFECT, player.entity_id), player.speed_turns_remaining
+            )
         for ghost in self.ghosts:
-            ghost.tick_effects()
+            if ghost.frozen_turns > 0:
+                self._extend_effect((GHOST_FREEZE_EFFECT, ghost.entity_id), ghost.frozen_turns)
+        for room_id, remaining in self.room_freeze_turns.items():
+            self._extend_effect((ROOM_FREEZE_EFFECT, room_id), remaining)
 
     def increment_action_count(self) -> None:
         self.action_count += 1
@@ -235,7 +464,13 @@ class GameState:
         ghost.move_to(spawn_room_id)
         ghost.set_position(spawn_position)
         ghost.last_room_id = spawn_room_id
+        self._touch(delta.GHOST, ghost.entity_id)
+        self.ghost_spawn_turns.append(self.turn_count)
         self.record(f"{ghost.name} materialises at {spawn_position} in {spawn_room_id}.")
+        if self.events.wants(GhostSpawned):
+            self.events.publish(
+                GhostSpawned(self.turn_count, ghost.entity_id, spawn_room_id, spawn_position)
+            )
         return True
 
     def _farthest_door_position(self, room: Room, origin: Position) -> Optional[Position]:
@@ -264,24 +499,40 @@ class GameState:
         if ghost.room_id in self.safe_rooms:
             self.record(f"{ghost.name} hesitates at the edge of a safe room.")
             return
+        fields = self.pursuit_fields()
+        target = (self.player.room_id, self.player.position)
         for _ in range(steps):
-            path = self._shortest_path(
-                (ghost.room_id, ghost.position),
-                (self.player.room_id, self.player.position),
-                for_player=False,
-            )
-            if len(path) <= 1:
+            next_tile = fields.next_step((ghost.room_id, ghost.position), target)
+            if next_tile is None:
                 return
-            next_room_id, next_pos = path[1]
+            next_room_id, next_pos = next_tile
             self.record(
                 f"{ghost.name} moves from {(ghost.room_id, ghost.position)} to {(next_room_id, next_pos)}."
             )
+            if self.events.wants(GhostMoved):
+                self.events.publish(
+                    GhostMoved(
+                        self.turn_count,
+                        ghost.entity_id,
+                        ghost.room_id,
+                        ghost.position,
+                        next_room_id,
+                        next_pos,
+                    )
+                )
             ghost.move_to(next_room_id)
             ghost.set_position(next_pos)
+            self._touch(delta.GHOST, ghost.entity_id)
 
     def freeze_room(self, room_id: str, duration: int) -> None:
-        self.room_freeze_turns[room_id] = max(self.room_freeze_turns.get(room_id, 0), duration)
+        self.room_freeze_turns[room_id] = self._extend_effect(
+            (ROOM_FREEZE_EFFECT, room_id), duration
+        )
         self.record(f"Room {room_id} is engulfed in a chilling aura for {duration} turns.")
+        if self.events.wants(FreezeApplied):
+            self.events.publish(
+                FreezeApplied(self.turn_count, "room", room_id, self.room_freeze_turns[room_id])
+            )
 
     def is_room_frozen(self, room_id: str) -> bool:
         return self.room_freeze_turns.get(room_id, 0) > 0
@@ -289,7 +540,7 @@ class GameState:
     def _try_create_tunnel(self) -> bool:
         """破壊アイテムを所持している場合、隣接する脆い壁を崩して通路を開く。"""
         room = self.rooms[self.player.room_id]
-        if not room.fragile_walls:
+        if not room.has_fragile_walls():
             return False
 
         adjacent_fragile: list[Position] = []
@@ -308,15 +559,35 @@ class GameState:
 
         target = adjacent_fragile[0]
         room.remove_wall(target)
+        self.layout_version += 1
+        self._touch(delta.WALL, (room.room_id, target))
         self.consume_item(breaker.item_id)
         self.record(
             f"A brittle wall at {target} collapses, revealing a rough passage."
         )
+        if self.events.wants(WallCollapsed):
+            self.events.publish(WallCollapsed(self.turn_count, room.room_id, target))
         return True
 
     # ------------------------------------------------------------------
     # 経路探索用ヘルパー
     # ------------------------------------------------------------------
+    def pursuit_fields(self) -> PursuitFields:
+        """幽霊の追跡に使う距離場キャッシュ。部屋を直接書き換えた場合は `layout_version` を進めること。"""
+        if self._pursuit is None:
+            self._pursuit = PursuitFields(self)
+        return self._pursuit
+
+    def move_table(self) -> MoveTable:
+        """プレイヤーの1歩ごとの移動結果を前計算した表。`layout_version` が進むと作り直す。"""
+        if self._moves is None:
+            self._moves = MoveTable(self)
+        return self._moves
+
+    def evaluate_actions(self, balance: Optional[BalanceConfig] = None) -> List[ActionOutcome]:
+        """今選べる行動それぞれの決定的な結果を、状態を変えずに返す（`evaluation.evaluate_actions`）。"""
+        return evaluate_actions(self, balance)
+
     def _neighbors(
         self,
         room_id: str,
@@ -365,6 +636,7 @@ class GameState:
                     continue
                 visited[neighbor] = distance + 1
                 queue.append(neighbor)
+        self._count_bfs(len(visited))
         return visited
 
     def _shortest_path(
@@ -378,15 +650,18 @@ class GameState:
         queue.append(origin)
         came_from: Dict[tuple[str, Position], Optional[tuple[str, Position]]] = {origin: None}
 
+        expanded = 0
         while queue:
             current = queue.popleft()
             if current == destination:
                 break
+            expanded += 1
             for neighbor in self._neighbors(current[0], current[1], for_player=for_player):
                 if neighbor in came_from:
                     continue
                 came_from[neighbor] = current
                 queue.append(neighbor)
+        self._count_bfs(expanded)
 
         if destination not in came_from:
             return [origin]
@@ -399,6 +674,11 @@ class GameState:
         path.reverse()
         return path
 
+    def _count_bfs(self, expanded: int) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(BFS_CALLS)
+            self.metrics.inc(BFS_NODES, expanded)
+
     # ------------------------------------------------------------------
     # 勝敗判定
     # ------------------------------------------------------------------
@@ -408,17 +688,23 @@ class GameState:
 
         if self.player.room_id == self.exit_room_id and self.player.position == self.exit_position:
             if self._player_has_valid_key():
-                self.is_over = True
-                self.winner = "player"
-                self.record("Player escapes through the back door!")
+                self.end_game("player", "Player escapes through the back door!")
             else:
                 self.record("The exit is locked tight. Need the correct key.")
 
         for ghost in self.active_ghosts():
             if ghost.room_id == self.player.room_id and ghost.position == self.player.position:
-                self.is_over = True
-                self.winner = "ghosts"
-                self.record(f"{ghost.name} catches the player!")
+                self.end_game("ghosts", f"{ghost.name} catches the player!")
+
+    def end_game(self, winner: str, message: str) -> None:
+        """勝者を確定してゲームを終了し、理由をログに残す。"""
+        self.is_over = True
+        self.winner = winner
+        self.record(message)
+        if self.events.wants(GameOver):
+            self.events.publish(
+                GameOver(self.turn_count, winner, self.player.room_id, self.player.position)
+            )
 
     def reset(self) -> None:
         self.turn_count = 0
@@ -431,3 +717,13 @@ class GameState:
         self.first_ghost_spawned = False
         self.second_ghost_spawned = False
         self.room_freeze_turns.clear()
+        self.ghost_spawn_turns.clear()
+        self.items_used = 0
+        self._timers.clear()
+        self._effect_deadlines.clear()
+        self.log_offset = 0
+        if self._journal is not None:
+            # 版数は戻さず、リセット前の版数からの差分はすべて全体扱いにする。
+            self._journal_base = self.version + 1
+            self._journal = []
+            self._deltas.clear()
@@ -0,0 +1,236 @@
+"""値を保持せずに平均・分散・分位点を求める、プロセス間で統合できるストリーミング統計。
+
+`RunningMoments` は Welford 法で件数・平均・分散・最小・最大を更新し、Chan らの式で統合する。
+`KLLSketch` は KLL 型の分位点スケッチで、件数 n に対してメモリは O(k + log(n/k)) に収まる。
+どちらも乱数を使わないため、同じ値を同じ順に入れて同じ順に統合すれば結果も一致する。
+`to_state` / `from_state` で JSON に書ける形と相互に変換でき、途中経過を保存して再開できる。
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Mapping, Optional, Tuple
+
+
+class RunningMoments:
+    """件数・平均・分散・最小・最大の逐次計算。"""
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # 平均からの偏差の二乗和。
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "RunningMoments") -> None:
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_state(self) -> List[float]:
+        """JSON に書ける形。浮動小数点数は `repr` で往復するため、復元後も同じ値になる。"""
+        return [self.count, self.mean, self.m2, self.min, self.max]
+
+    @classmethod
+    def from_state(cls, state: List[float]) -> "RunningMoments":
+        moments = cls()
+        count, moments.mean, moments.m2, moments.min, moments.max = state
+        moments.count = int(count)
+        return moments
+
+    @property
+    def variance(self) -> Optional[float]:
+        """標本分散（n-1 で割る）。2件未満なら None。"""
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    @property
+    def stdev(self) -> Optional[float]:
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+
+class KLLSketch:
+    """KLL 型の分位点スケッチ。
+
+    段 h の要素は 2**h 件分の値を代表する。段が容量に達したら整列して1つおきに上の段へ送り、
+    残りは捨てる。容量は最上段が `k` で、下の段ほど `c` 倍ずつ小さくなる。
+    """
+
+    def __init__(self, k: int = 200, c: float = 2 / 3) -> None:
+        if k < 2:
+            raise ValueError("k must be at least 2.")
+        if not 0.5 <= c < 1.0:
+            raise ValueError("c must be in [0.5, 1).")
+        self.k = k
+        self.c = c
+        self.count = 0
+        self.compactors: List[List[float]] = []
+        self._parity: List[int] = []
+        self._size = 0
+        self._max_size = 0
+        self._grow()
+
+    def __len__(self) -> int:
+        """保持している要素数（件数ではない）。"""
+        return self._size
+
+    def observe(self, value: float) -> None:
+        self.compactors[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        if (other.k, other.c) != (self.k, self.c):
+            raise ValueError("Cannot merge sketches with different parameters.")
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.count += other.count
+        self._size = sum(len(items) for items in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+
+    def to_state(self) -> Dict[str, object]:
+        return {
+            "k": self.k,
+            "c": self.c,
+            "count": self.count,
+            "compactors": [list(items) for items in self.compactors],
+            "parity": list(self._parity),
+        }
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, object]) -> "KLLSketch":
+        sketch = cls(state["k"], state["c"])  # type: ignore[arg-type]
+        sketch.count = state["count"]  # type: ignore[assignment]
+        while len(sketch.compactors) < len(state["compactors"]):  # type: ignore[arg-type]
+            sketch._grow()
+        compactors = state["compactors"]
+        sketch.compactors = [list(items) for items in compactors]  # type: ignore[union-attr]
+        sketch._parity = list(state["parity"])  # type: ignore[call-overload]
+        sketch._size = sum(len(items) for items in sketch.compactors)
+        return sketch
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """`fraction`（0〜1）分位点の近似値。順位の誤差は件数のおよそ 1.7/k 以内。"""
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(fraction * self.count))
+        weighted = self._weighted()
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= rank:
+                return value
+        return weighted[-1][0]
+
+    def rank(self, value: float) -> int:
+        """`value` 以下の値のおおよその件数。"""
+        return sum(weight for item, weight in self._weighted() if item <= value)
+
+    def _weighted(self) -> List[Tuple[float, int]]:
+        return sorted(
+            (item, 1 << level) for level, items in enumerate(self.compactors) for item in items
+        )
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.c ** depth * self.k)) + 1
+
+    def _grow(self) -> None:
+        self.compactors.append([])
+        self._parity.append(0)
+        self._max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _compress(self) -> None:
+        for level, items in enumerate(self.compactors):
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self._grow()
+            items.sort()
+            # 奇数個なら最大の1件をこの段に残し、残りの偶数個を半分に間引く。
+            keep = [items.pop()] if len(items) % 2 else []
+            # 元の KLL は送る側（偶数番目か奇数番目か）を乱数で選ぶ。ここでは段ごとに交互に切り替え、
+            # 偏りを打ち消しつつ結果を再現可能にする。
+            offset = self._parity[level]
+            self._parity[level] ^= 1
+            self.compactors[level + 1].extend(items[offset::2])
+            self.compactors[level] = keep
+            self._size = sum(len(items) for items in self.compactors)
+            return
+
+
+class StreamingStats:
+    """`RunningMoments` と `KLLSketch` をまとめた1系列分の要約。`metrics.Histogram` と同じ使い方をする。"""
+
+    def __init__(self, k: int = 200) -> None:
+        self.moments = RunningMoments()
+        self.sketch = KLLSketch(k)
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+    def observe(self, value: float) -> None:
+        self.moments.observe(value)
+        self.sketch.observe(value)
+
+    def merge(self, other: "StreamingStats") -> None:
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        return self.sketch.percentile(fraction)
+
+    def to_state(self) -> Dict[str, object]:
+        return {"moments": self.moments.to_state(), "sketch": self.sketch.to_state()}
+
+    @classmethod
+    def from_state(cls, state: Mapping[str, object]) -> "StreamingStats":
+        stats = cls()
+        stats.moments = RunningMoments.from_state(state["moments"])  # type: ignore[arg-type]
+        stats.sketch = KLLSketch.from_state(state["sketch"])  # type: ignore[arg-type]
+        return stats
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        moments = self.moments
+        empty = moments.count == 0
+        return {
+            "count": moments.count,
+            "mean": None if empty else moments.mean,
+            "stdev": moments.stdev,
+            "min": None if empty else moments.min,
+            "p10": self.percentile(0.10),
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": None if empty else moments.max,
+        }
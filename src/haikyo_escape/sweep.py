@@ -0,0 +1,361 @@
+"""難易度パラメータの格子を総当たりし、格子点ごとの勝率・ターン数分布・捕獲率を集計するツール。
+
+各格子点で同じシード列（`seed` から `games` 個）のゲームを回すため、点同士の差はパラメータの
+違いだけから生じる。ゲームはチャンクに分けてプロセスプールへ配り、格子点のチャンクが揃うたびに
+結果を1行の JSON として書き出す。途中で止めても書き出し済みの行はそのまま使え、`--checkpoint` を
+付ければ終わったチャンクを飛ばして再開できる。
+ゲームごとの結果は保持せず `OutcomeSummary` に流すため、ゲーム数を増やしてもメモリは増えない。
+`--dungeon` で手続き生成ダンジョンを使う場合は、`--cache-dir` を付けるとシードごとのダンジョンを
+ディスクに残し、別の格子点や次回の実行では生成を省いて復元する。
+
+実行例: `PYTHONPATH=src python -m haikyo_escape.sweep --param spawn_one_in=4,6,8
+--param duration.GHOST_FREEZE=2,3 --games 500 --output sweep.jsonl`
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, TextIO, Tuple, Union
+
+from .balance import BalanceConfig
+from .simulation import DEFAULT_MAX_TURNS, POLICIES, OutcomeSummary, play_game, procedural_setups
+from .tracing import install_from_env
+
+# (格子点番号, パラメータ, 開始シード, 終了シード, ボット名, 最大ターン数, 詰み検出,
+#  手続き生成のパラメータ, ダンジョンキャッシュのディレクトリ)
+Chunk = Tuple[
+    int, Dict[str, object], int, int, str, int, bool, Optional[Dict[str, object]], Optional[str]
+]
+
+
+def expand_grid(grid: Mapping[str, Sequence[object]]) -> List[Dict[str, object]]:
+    """`{名前: 値の列}` の直積を、最後のパラメータが最も速く変わる順に並べる。"""
+    names = list(grid)
+    combinations = itertools.product(*(grid[name] for name in names))
+    return [dict(zip(names, values)) for values in combinations]
+
+
+@dataclass
+class PointResult:
+    """1つの格子点の集計。チャンクごとの結果を `merge` で足し合わせる。"""
+
+    index: int
+    params: Dict[str, object]
+    summary: OutcomeSummary = field(default_factory=OutcomeSummary)
+
+    def merge(self, other: "PointResult") -> None:
+        self.summary.merge(other.summary)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"point": self.index, "params": self.params, **self.summary.summary()}
+
+
+def run_sweep(
+    grid: Mapping[str, Sequence[object]],
+    *,
+    games: int,
+    seed: int = 0,
+    policy: str = "seeker",
+    max_turns: int = DEFAULT_MAX_TURNS,
+    detect_stuck: bool = False,
+    workers: Optional[int] = None,
+    chunk_size: int = 50,
+    output: Optional[TextIO] = None,
+    checkpoint: Optional[Union[str, Path]] = None,
+    checkpoint_interval: float = 60.0,
+    dungeon: Optional[Mapping[str, object]] = None,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> List[PointResult]:
+    """格子の各点で `games` ゲームずつ回し、格子点の順に結果を返す。
+
+    `output` を渡すと、格子点が揃った順（格子の順とは限らない）に JSON 行を書いて flush する。
+    `workers=0` ならプロセスプールを使わずにこのプロセスで順に実行する。
+
+    `checkpoint` を渡すと、終わったチャンクの集計を `checkpoint_interval` 秒ごと・格子点が揃うたび・
+    中断時にそのファイルへ保存し、次回は残りのチャンクだけを回す。各格子点はチャンクを
+    開始シードの順に統合するため、中断の有無やワーカー数によらず結果は一致する。
+
+    `dungeon` を渡すと標準ダンジョンの代わりに、そのパラメータの手続き生成ダンジョンで遊ぶ。
+    `cache_dir` はそのダンジョンを保存する `DungeonCache` のディレクトリ（結果には影響しない）。
+    """
+    if games <= 0:
+        raise ValueError("games must be positive.")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive.")
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy '{policy}'.")
+    points = expand_grid(grid)
+    for params in points:
+        BalanceConfig.from_params(params)  # ワーカーへ配る前に不正な値を弾く。
+    dungeon = dict(dungeon) if dungeon else None
+    if dungeon is not None:
+        procedural_setups(dungeon)
+    cache = str(cache_dir) if cache_dir is not None and dungeon is not None else None
+
+    progress: Optional[SweepCheckpoint] = None
+    if checkpoint is not None:
+        config = {
+            "points": points,
+            "games": games,
+            "seed": seed,
+            "policy": policy,
+            "max_turns": max_turns,
+            "detect_stuck": detect_stuck,
+            "chunk_size": chunk_size,
+        }
+        if dungeon is not None:
+            config["dungeon"] = dungeon
+        progress = SweepCheckpoint.open(checkpoint, config, interval=checkpoint_interval)
+
+    starts = range(seed, seed + games, chunk_size)
+    results = [PointResult(index, params) for index, params in enumerate(points)]
+    partials: List[Dict[int, OutcomeSummary]] = [{} for _ in points]
+    chunks: List[Chunk] = []
+    for index, params in enumerate(points):
+        if progress is not None and index in progress.points:
+            results[index].summary = progress.points[index]
+            continue
+        for start in starts:
+            done = progress.chunks.get((index, start)) if progress is not None else None
+            if done is not None:
+                partials[index][start] = done
+                continue
+            stop = min(start + chunk_size, seed + games)
+            chunks.append(
+                (index, params, start, stop, policy, max_turns, detect_stuck, dungeon, cache)
+            )
+
+    def collect(chunk: Chunk, partial: PointResult) -> None:
+        index, start = chunk[0], chunk[2]
+        partials[index][start] = partial.summary
+        if progress is not None:
+            progress.chunks[(index, start)] = partial.summary
+        if len(partials[index]) < len(starts):
+            if progress is not None:
+                progress.maybe_save()
+            return
+        summary = OutcomeSummary()
+        for start in starts:
+            summary.merge(partials[index][start])
+        results[index].summary = summary
+        partials[index].clear()
+        if output is not None:
+            output.write(json.dumps(results[index].to_dict(), ensure_ascii=False) + "\n")
+            output.flush()
+        if progress is not None:
+            progress.finish_point(index, summary)
+
+    try:
+        if workers == 0:
+            for chunk in chunks:
+                collect(chunk, run_chunk(chunk))
+            return results
+
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures: Dict[Future[PointResult], Chunk] = {
+                pool.submit(run_chunk, chunk): chunk for chunk in chunks
+            }
+            for future in as_completed(futures):
+                collect(futures[future], future.result())
+        finally:
+            pool.shutdown(cancel_futures=True)
+        return results
+    finally:
+        if progress is not None:
+            progress.save()
+
+
+def run_chunk(chunk: Chunk) -> PointResult:
+    """1チャンク分のゲームを回す。プロセスプールから呼ぶため最上位に置く。"""
+    index, params, start, stop, policy, max_turns, detect_stuck, dungeon, cache_dir = chunk
+    balance = BalanceConfig.from_params(params)
+    setups = procedural_setups(dungeon, cache_dir) if dungeon is not None else None
+    result = PointResult(index, params)
+    for seed in range(start, stop):
+        outcome = play_game(
+            seed,
+            POLICIES[policy],
+            max_turns=max_turns,
+            detect_stuck=detect_stuck,
+            balance=balance,
+            setups=setups,
+        )
+        result.summary.add(outcome)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# チェックポイント
+# ---------------------------------------------------------------------------
+
+_CHECKPOINT_VERSION = 1
+
+
+class SweepCheckpoint:
+    """スイープの途中経過（終わったチャンクと格子点の集計）を JSON ファイルに保存する。
+
+    各ゲームの乱数はシードだけから決まるため、乱数列の位置はチャンクの開始シードで表せる。
+    保存は一時ファイルへ書いてから置き換えるので、書き込み中に落ちても前回の内容が残る。
+    格子点の JSON 行を書いてから保存するまでの間に落ちると、再開時にその行をもう一度書く。
+    """
+
+    def __init__(
+        self, path: Union[str, Path], config: Mapping[str, object], *, interval: float = 60.0
+    ) -> None:
+        self.path = Path(path)
+        # JSON を経由した形で持ち、保存済みの設定と比べられるようにする。
+        self.config = json.loads(json.dumps(config))
+        self.interval = interval
+        self.chunks: Dict[Tuple[int, int], OutcomeSummary] = {}
+        self.points: Dict[int, OutcomeSummary] = {}
+        self._saved_at = time.monotonic()
+
+    @classmethod
+    def open(
+        cls, path: Union[str, Path], config: Mapping[str, object], *, interval: float = 60.0
+    ) -> "SweepCheckpoint":
+        """`path` があれば読み込み、同じスイープの途中経過かを確かめる。なければ空で始める。"""
+        checkpoint = cls(path, config, interval=interval)
+        if not checkpoint.path.exists():
+            return checkpoint
+        data = json.loads(checkpoint.path.read_text(encoding="utf-8"))
+        if data.get("version") != _CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported sweep checkpoint version: {data.get('version')}")
+        if data["config"] != checkpoint.config:
+            raise ValueError(f"Checkpoint {checkpoint.path} was written for a different sweep.")
+        for index, start, state in data["chunks"]:
+            checkpoint.chunks[(index, start)] = OutcomeSummary.from_state(state)
+        for index, state in data["points"]:
+            checkpoint.points[index] = OutcomeSummary.from_state(state)
+        return checkpoint
+
+    def finish_point(self, index: int, summary: OutcomeSummary) -> None:
+        """格子点が揃ったらチャンクごとの集計を統合結果に置き換えて保存する。"""
+        self.points[index] = summary
+        for key in [key for key in self.chunks if key[0] == index]:
+            del self.chunks[key]
+        self.save()
+
+    def maybe_save(self) -> None:
+        if time.monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+    def save(self) -> None:
+        data = {
+            "version": _CHECKPOINT_VERSION,
+            "config": self.config,
+            "chunks": [
+                [index, start, summary.to_state()]
+                for (index, start), summary in sorted(self.chunks.items())
+            ],
+            "points": [
+                [index, summary.to_state()] for index, summary in sorted(self.points.items())
+            ],
+        }
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+
+
+def _parse_param(text: str) -> Tuple[str, List[object]]:
+    name, _, raw = text.partition("=")
+    if not name or not raw:
+        raise argparse.ArgumentTypeError(f"expected NAME=v1,v2,... but got '{text}'")
+    values: List[object] = []
+    for token in raw.split(","):
+        token = token.strip()
+        try:
+            values.append(int(token))
+        except ValueError:
+            values.append(float(token))
+    return name.strip(), values
+
+
+def _parse_dungeon(text: str) -> Dict[str, object]:
+    """`columns=20,rows=20,wall_density=0.3` の形の手続き生成パラメータ。"""
+    params: Dict[str, object] = {}
+    for pair in text.split(","):
+        name, values = _parse_param(pair)
+        params[name] = values[0]
+    return params
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Sweep balance parameters over seeded bot games.")
+    parser.add_argument(
+        "--param",
+        action="append",
+        type=_parse_param,
+        default=[],
+        metavar="NAME=V1,V2",
+        help="balance parameter values (first_spawn_interval, spawn_one_in, "
+        "ghost_single_step_chance, duration.<item id or ItemType>); repeat for a grid",
+    )
+    parser.add_argument("--games", type=int, default=200, help="games per grid point")
+    parser.add_argument(
+        "--seed", type=int, default=0, help="first seed; every point plays the same seeds"
+    )
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="seeker")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS)
+    parser.add_argument(
+        "--detect-stuck", action="store_true", help="end games once the exit is unreachable"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="process count (0 runs in-process)"
+    )
+    parser.add_argument("--chunk-size", type=int, default=50, help="games per worker task")
+    parser.add_argument("--output", help="JSONL file to append results to (default: stdout)")
+    parser.add_argument(
+        "--checkpoint", help="progress file; an interrupted sweep resumes from it when rerun"
+    )
+    parser.add_argument(
+        "--checkpoint-interval", type=float, default=60.0, help="seconds between checkpoint saves"
+    )
+    parser.add_argument(
+        "--dungeon",
+        type=_parse_dungeon,
+        metavar="NAME=V,...",
+        help="play procedural dungeons with these generator settings (e.g. columns=20,rows=20)",
+    )
+    parser.add_argument(
+        "--cache-dir", help="keep generated --dungeon maps here and reuse them across runs"
+    )
+    args = parser.parse_args(argv)
+    install_from_env()
+
+    # 退避を求めるプリエンプティブ環境の SIGTERM でも、チェックポイントを保存してから終わる。
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    grid = dict(args.param)
+    options = dict(
+        games=args.games,
+        seed=args.seed,
+        policy=args.policy,
+        max_turns=args.max_turns,
+        detect_stuck=args.detect_stuck,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint=args.checkpoint,
+        checkpoint_interval=args.checkpoint_interval,
+        dungeon=args.dungeon,
+        cache_dir=args.cache_dir,
+    )
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as output:
+            run_sweep(grid, output=output, **options)  # type: ignore[arg-type]
+    else:
+        run_sweep(grid, output=sys.stdout, **options)  # type: ignore[arg-type]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""ターンごとの記録を JSONL へ書き出す任意利用のテレメトリ出力。
+
+`GameEngine(telemetry=...)` で接続すると、エンジンは1ターンにつき1件の辞書を `emit` する。
+記録は上限付きキューに積むだけで、直列化とディスク書き込みはバックグラウンドスレッドが
+まとめて行う。キューが溢れた場合はゲームループを止めずに記録を捨て、件数を数える。
+ライタースレッドで起きた例外（出力先を開けないなど）は `error` に残し、`close` で呼び出し側へ送出する。
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import IO, Optional
+
+TelemetryRecord = dict[str, object]
+
+_STOP = object()
+
+
+class TelemetrySink:
+    """上限付きキューとライタースレッドで JSONL（必要なら gzip）を書き出す。"""
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        compress: Optional[bool] = None,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+        autostart: bool = True,
+    ) -> None:
+        self.path = Path(path)
+        # 明示しなければ拡張子 .gz で圧縮の有無を決める。
+        self.compress = self.path.suffix == ".gz" if compress is None else compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.error: Optional[BaseException] = None
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        if autostart:
+            self.start()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="haikyo-telemetry", daemon=True)
+        self._thread.start()
+
+    def emit(self, record: TelemetryRecord) -> bool:
+        """記録をキューへ積む。満杯なら待たずに破棄して False を返す。"""
+        if self._closed:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """残りの記録を書き切ってからライタースレッドを止める。
+
+        ライタースレッドが例外で止まっていた場合は、書けなかった記録を `dropped` に数えてから
+        その例外を送出する。キューが満杯でもスレッドが止まっていれば待ち続けない。
+        """
+        if self._closed:
+            return
+        self._closed = True
+        thread = self._thread
+        if thread is None:
+            return
+        while True:
+            try:
+                self._queue.put(_STOP, timeout=self.flush_interval)
+                break
+            except queue.Full:
+                if not thread.is_alive():
+                    self._discard_pending()
+        thread.join(timeout)
+        if not thread.is_alive():
+            self._discard_pending()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> "TelemetrySink":
+        return self
+
+    def __exit__(self, exc_type: object, *exc_info: object) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        # 処理中の例外を書き込みエラーで隠さない。
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _discard_pending(self) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                self.dropped += 1
+
+    # ------------------------------------------------------------------
+    # ライタースレッド
+    # ------------------------------------------------------------------
+    def _open(self) -> IO[bytes]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.compress:
+            return gzip.open(self.path, "ab")
+        return open(self.path, "ab")
+
+    def _run(self) -> None:
+        try:
+            self._write_batches()
+        except BaseException as exc:
+            self.error = exc  # close() で呼び出し側へ送出する。
+
+    def _write_batches(self) -> None:
+        with self._open() as handle:
+            stopping = False
+            while not stopping:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = []
+                item = first
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    lines = "".join(
+                        json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+                        for record in batch
+                    )
+                    handle.write(lines.encode("utf-8"))
+                    handle.flush()
+                    self.written += len(batch)
@@ -0,0 +1,192 @@
+"""プレイヤーの予定経路に対する、幽霊の位置分布と捕獲確率の数ターン先までの予測。
+
+幽霊は毎ターン `ghost_single_step_chance` で1マス、残りで2マス、追跡場の最短経路に沿って
+プレイヤーへ近づく。したがって1ターン分の遷移は「各マスから1歩先と2歩先へ確率を分ける」疎な
+行列で、予測は位置分布（質量のあるマスだけを持つ辞書）にこれを繰り返し掛けるだけで済む。
+1歩先は `GameState.pursuit_fields()` の距離場から引くので、エンジンと同じマスが選ばれる。
+
+近似している点:
+- 未出現の幽霊は、プレイヤーが安全地帯の外にいる毎ターン 1/`spawn_one_in` で出現するとみなす
+  （1体目の歩数しきい値は考慮しないため、序盤の危険度はやや高めに出る）。
+- 幽霊同士の位置は独立とみなし、生存確率は幽霊ごとの非捕獲確率の積で求める。
+"""
+
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from .balance import BalanceConfig
+from .heatmap import TileIndex
+from .pursuit import Tile
+from .state import GHOST_FREEZE_EFFECT, ROOM_FREEZE_EFFECT
+
+if TYPE_CHECKING:
+    from .state import GameState
+
+# マス -> その幽霊がそこにいる確率。質量のあるマスだけを持つ。
+Distribution = Dict[Tile, float]
+
+
+@dataclass
+class ThreatForecast:
+    """`forecast_threat` の結果。`turn` は 1 始まり（1 = このターンの解決後）。"""
+
+    index: TileIndex
+    # ターンごとの、全幽霊の存在確率の和（マスの「危険度」）。
+    occupancy: List[Distribution] = field(default_factory=list)
+    # ターンごとの、そのターンに捕まる確率。
+    catch: List[float] = field(default_factory=list)
+
+    @property
+    def turns(self) -> int:
+        return len(self.catch)
+
+    @property
+    def risk(self) -> float:
+        """予測した全ターンのうちに捕まる確率。"""
+        return sum(self.catch)
+
+    def probability(self, turn: int, room_id: str, position: Tuple[int, int]) -> float:
+        return self.occupancy[turn - 1].get((room_id, position), 0.0)
+
+    def danger(self, turn: int) -> array:
+        """ターン `turn` の危険度を `(部屋数, 高さ, 幅)` の行優先配列（`array("d")`）で返す。"""
+        values = array("d", bytes(8 * self.index.size))
+        offset = self.index.offset
+        for (room_id, position), mass in self.occupancy[turn - 1].items():
+            values[offset(room_id, position)] = mass
+        return values
+
+
+def forecast_threat(
+    state: "GameState",
+    path: Sequence[Tile],
+    *,
+    turns: Optional[int] = None,
+    balance: Optional[BalanceConfig] = None,
+) -> ThreatForecast:
+    """プレイヤーが `path[t]`（ターン t+1 の行動後のマス）を辿るとしたときの脅威を予測する。
+
+    入力待ちの時点（`state.turn_count` が今のターン）で呼ぶ。`turns` が経路より長ければ、
+    残りのターンは経路の最後のマスに留まるものとする。状態は変更しない。
+    """
+    balance = balance or BalanceConfig()
+    turns = len(path) if turns is None else turns
+    if turns > 0 and not path:
+        raise ValueError("path must contain at least one tile to forecast ahead.")
+
+    single = balance.ghost_single_step_chance
+    spawn_chance = 1.0 / balance.spawn_one_in
+    fields = state.pursuit_fields()
+    safe_rooms = state.safe_rooms
+    room_freeze = {
+        room_id: state.effect_remaining(ROOM_FREEZE_EFFECT, room_id)
+        for room_id in state.room_freeze_turns
+    }
+
+    ghosts = [ghost for ghost in state.ghosts if ghost.is_active]
+    spawned = [ghost for ghost in ghosts if ghost.is_spawned]
+    distributions: List[Distribution] = [
+        {(ghost.room_id, ghost.position): 1.0} for ghost in spawned
+    ]
+    frozen = [state.effect_remaining(GHOST_FREEZE_EFFECT, ghost.entity_id) for ghost in spawned]
+    caught = [0.0] * len(spawned)
+
+    # 出現待ちの幽霊。エンジンと同じく1体目と2体目だけが出現し得る。
+    remaining_spawns = 2 - state.first_ghost_spawned - state.second_ghost_spawned
+    pending = [ghost for ghost in ghosts if not ghost.is_spawned][:remaining_spawns]
+    first_pending = not state.first_ghost_spawned
+    # stages[i] = i 体が出現済みである確率。
+    stages = [1.0] + [0.0] * len(pending)
+    pending_slots = []
+    for ghost in pending:
+        pending_slots.append(len(distributions))
+        distributions.append({})
+        frozen.append(0)
+        caught.append(0.0)
+
+    forecast = ThreatForecast(TileIndex.from_rooms(state.rooms))
+    survival = 1.0
+    for turn in range(1, turns + 1):
+        target = path[min(turn, len(path)) - 1]
+
+        # 出現判定（安全地帯では行わない）。出現したての幽霊もこのターンから動く。
+        if pending and target[0] not in safe_rooms:
+            spawn_tile = _spawn_tile(state, target)
+            arrivals = _advance_spawns(stages, spawn_chance, first_pending)
+            for slot, mass in zip(pending_slots, arrivals):
+                if mass:
+                    distribution = distributions[slot]
+                    distribution[spawn_tile] = distribution.get(spawn_tile, 0.0) + mass
+
+        steps: Dict[Tile, Tile] = {}
+
+        def step(tile: Tile) -> Tile:
+            nxt = steps.get(tile)
+            if nxt is None:
+                nxt = steps[tile] = fields.next_step(tile, target) or tile
+            return nxt
+
+        occupancy: Distribution = {}
+        for slot, distribution in enumerate(distributions):
+            # プレイヤーが幽霊のマスへ入った、または出現した幽霊と重なった。
+            caught[slot] += distribution.pop(target, 0.0)
+            if frozen[slot] < turn:
+                moved: Distribution = {}
+                for tile, mass in distribution.items():
+                    if tile[0] in safe_rooms or room_freeze.get(tile[0], 0) >= turn:
+                        moved[tile] = moved.get(tile, 0.0) + mass
+                        continue
+                    one = step(tile)
+                    two = step(one)
+                    if single:
+                        moved[one] = moved.get(one, 0.0) + mass * single
+                    if single < 1.0:
+                        moved[two] = moved.get(two, 0.0) + mass * (1.0 - single)
+                distribution = distributions[slot] = moved
+            caught[slot] += distribution.pop(target, 0.0)
+            for tile, mass in distribution.items():
+                occupancy[tile] = occupancy.get(tile, 0.0) + mass
+
+        alive = 1.0
+        for probability in caught:
+            alive *= 1.0 - probability
+        forecast.catch.append(survival - alive)
+        forecast.occupancy.append(occupancy)
+        survival = alive
+    return forecast
+
+
+def _advance_spawns(stages: List[float], chance: float, first_pending: bool) -> List[float]:
+    """出現段階の確率を1ターン進め、このターンに各幽霊が出現する確率を返す。
+
+    1体目の出現に成功したターンは、同じターンのうちに2体目の判定も行われる（エンジンと同じ順）。
+    """
+    arrivals = [0.0] * (len(stages) - 1)
+    if not arrivals:
+        return arrivals
+    if first_pending:
+        first = stages[0] * chance
+        stages[0] -= first
+        arrivals[0] = first
+        if len(arrivals) > 1:
+            second = (first + stages[1]) * chance
+            stages[1] += first - second
+            stages[2] += second
+            arrivals[1] = second
+        else:
+            stages[1] += first
+    else:
+        second = stages[0] * chance
+        stages[0] -= second
+        stages[1] += second
+        arrivals[0] = second
+    return arrivals
+
+
+def _spawn_tile(state: "GameState", player_tile: Tile) -> Tile:
+    room_id, position = player_tile
+    spawn = state._farthest_door_position(state.rooms[room_id], position)
+    return (room_id, spawn if spawn is not None else position)
@@ -0,0 +1,70 @@
+"""ターン番号で期限を管理するハッシュ化タイマーホイール。
+
+期限ターンを `slots` で割った余りのバケットに登録し、ターンを進めるときは該当バケットだけを
+調べる。1ターンあたりの処理量は期限を迎えた件数（と同じバケットに入った周回遅れの件数）に
+比例し、登録中の効果の総数には依存しない。
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Hashable, List, Tuple
+
+
+class TimerWheel:
+    """期限ターンとキーの組を保持し、`advance` で期限を迎えたキーを返す。
+
+    取り消しは提供しない。期限を延ばした場合は新しい期限で登録し直し、古い登録は
+    呼び出し側が発火時に読み捨てる（遅延削除）。
+    """
+
+    def __init__(self, slots: int = 64, now: int = 0) -> None:
+        if slots <= 0:
+            raise ValueError("slots must be positive.")
+        self.slots = slots
+        self.now = now
+        # スロット番号 -> 登録。ゲームごとに作るため、空のスロットは持たない。
+        self._buckets: Dict[int, List[Tuple[int, Hashable]]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, due: int, key: Hashable) -> None:
+        """`due` ターン目に発火するよう登録する。過去の期限は次の `advance` で発火する。"""
+        due = max(due, self.now + 1)
+        self._buckets.setdefault(due % self.slots, []).append((due, key))
+        self._size += 1
+
+    def advance(self, now: int) -> List[Hashable]:
+        """`now` ターン目まで進め、その間に期限を迎えたキーを期限順に返す。"""
+        if now <= self.now:
+            return []
+        if self._size == 0:
+            self.now = now
+            return []
+
+        if now - self.now >= self.slots:
+            indices = range(self.slots)
+        else:
+            indices = (turn % self.slots for turn in range(self.now + 1, now + 1))
+        fired: List[Tuple[int, Hashable]] = []
+        for index in indices:
+            bucket = self._buckets.get(index)
+            if not bucket:
+                continue
+            pending = [entry for entry in bucket if entry[0] > now]
+            if len(pending) != len(bucket):
+                fired.extend(entry for entry in bucket if entry[0] <= now)
+                if pending:
+                    self._buckets[index] = pending
+                else:
+                    del self._buckets[index]
+        self.now = now
+        self._size -= len(fired)
+        fired.sort(key=lambda entry: entry[0])
+        return [key for _, key in fired]
+
+    def clear(self, now: int = 0) -> None:
+        self._buckets.clear()
+        self._size = 0
+        self.now = now
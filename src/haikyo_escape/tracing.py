@@ -0,0 +1,207 @@
+"""`chrome://tracing` / Perfetto で読める trace-event JSON を出力するトレーサ。
+
+`install()` の間だけエンジンと状態クラスの該当メソッドを計測用ラッパーに差し替える。
+無効時は元のメソッドがそのまま使われるため、呼び出しごとのオーバーヘッドは発生しない。
+パッケージの読み込みでは何も差し替えない。CLI の入口（`src/main.py`、`sweep`・`heatmap`・
+`loadgen`・`server`）は `install_from_env()` を呼ぶので、環境変数 `HAIKYO_TRACE=<出力パス>` を
+設定して起動すると計測を有効化し、プロセス終了時にファイルへ書き出す。
+
+先読み用のスレッドからも計測対象のメソッドが呼ばれるため、イベント列とカウンタは
+`Tracer` のロックの下で更新する。
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from .engine import AsyncGameEngine, GameEngine
+from .pursuit import GhostGraph
+from .state import GameState
+
+TRACE_ENV_VAR = "HAIKYO_TRACE"
+
+# (クラス, メソッド名, 表示名)。ここに並べたメソッドを区間（"X" イベント）として記録する。
+TRACED_METHODS: tuple[tuple[type, str, str], ...] = (
+    (GameEngine, "run_turn", "run_turn"),
+    (AsyncGameEngine, "run_turn", "run_turn"),
+    (GameEngine, "_resolve_player_action", "resolve_player_action"),
+    (GameEngine, "_maybe_spawn_ghosts", "maybe_spawn_ghosts"),
+    (GameEngine, "_move_ghosts", "move_ghosts"),
+    (GameState, "_shortest_path", "shortest_path"),
+    (GameState, "_distance_map", "distance_map"),
+    (GameState, "check_victory", "check_victory"),
+    (GhostGraph, "distance_field", "pursuit_field"),
+)
+
+# BFS の各区間が終わるたびに、展開済みノード数のカウンタ（"C" イベント）を出す。
+_BFS_SPANS = frozenset({"shortest_path", "distance_map", "pursuit_field"})
+
+
+class Tracer:
+    """trace-event 形式のイベントをメモリ上に蓄積する。"""
+
+    def __init__(self, max_events: int = 1_000_000) -> None:
+        self.max_events = max_events
+        self.events: list[dict[str, Any]] = []
+        self.dropped = 0
+        self.nodes_expanded = 0
+        self._pid = os.getpid()
+        self._origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def count_nodes(self, count: int) -> None:
+        with self._lock:
+            self.nodes_expanded += count
+
+    def complete(self, name: str, start_ns: int, end_ns: int) -> None:
+        with self._lock:
+            self._complete(name, start_ns, end_ns)
+
+    def _complete(self, name: str, start_ns: int, end_ns: int) -> None:
+        self._append(
+            {
+                "name": name,
+                "cat": "engine",
+                "ph": "X",
+                "ts": (start_ns - self._origin_ns) / 1000.0,
+                "dur": (end_ns - start_ns) / 1000.0,
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+            }
+        )
+        if name in _BFS_SPANS:
+            self._append(
+                {
+                    "name": "bfs",
+                    "ph": "C",
+                    "ts": (end_ns - self._origin_ns) / 1000.0,
+                    "pid": self._pid,
+                    "args": {"nodes_expanded": self.nodes_expanded},
+                }
+            )
+
+    def to_json(self) -> dict[str, Any]:
+        with self._lock:
+            events = list(self.events)
+            dropped = self.dropped
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"dropped_events": dropped},
+        }
+
+    def write(self, path: str | os.PathLike[str]) -> None:
+        Path(path).write_text(json.dumps(self.to_json()), encoding="utf-8")
+
+    def _append(self, event: dict[str, Any]) -> None:
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+
+_active: Optional[Tracer] = None
+_originals: list[tuple[type, str, Callable[..., Any]]] = []
+
+
+def active_tracer() -> Optional[Tracer]:
+    return _active
+
+
+def install(tracer: Optional[Tracer] = None) -> Tracer:
+    """計測用ラッパーを差し込み、以後の全エンジンを計測対象にする。"""
+    global _active
+    if _active is not None:
+        raise RuntimeError("A tracer is already installed.")
+    tracer = tracer or Tracer()
+    for owner, method_name, span_name in TRACED_METHODS:
+        original = owner.__dict__[method_name]
+        _originals.append((owner, method_name, original))
+        setattr(owner, method_name, _span_wrapper(tracer, original, span_name))
+
+    original_neighbors = GameState.__dict__["_neighbors"]
+    _originals.append((GameState, "_neighbors", original_neighbors))
+
+    @functools.wraps(original_neighbors)
+    def counted_neighbors(*args: Any, **kwargs: Any) -> Any:
+        tracer.count_nodes(1)
+        return original_neighbors(*args, **kwargs)
+
+    GameState._neighbors = counted_neighbors  # type: ignore[method-assign]
+    _active = tracer
+    return tracer
+
+
+def uninstall() -> Optional[Tracer]:
+    """差し込んだラッパーを外し、元のメソッドへ戻す。"""
+    global _active
+    while _originals:
+        owner, method_name, original = _originals.pop()
+        setattr(owner, method_name, original)
+    tracer, _active = _active, None
+    return tracer
+
+
+@contextmanager
+def tracing(path: Optional[str | os.PathLike[str]] = None) -> Iterator[Tracer]:
+    """`with` ブロックの間だけ計測し、終了時に `path` へ書き出す。"""
+    tracer = install()
+    try:
+        yield tracer
+    finally:
+        uninstall()
+        if path is not None:
+            tracer.write(path)
+
+
+def install_from_env() -> Optional[Tracer]:
+    """`HAIKYO_TRACE` が設定されていれば計測を開始し、終了時に書き出す。"""
+    path = os.environ.get(TRACE_ENV_VAR)
+    if not path or _active is not None:
+        return None
+    tracer = install()
+    atexit.register(tracer.write, path)
+    return tracer
+
+
+def _span_wrapper(
+    tracer: Tracer, original: Callable[..., Any], span_name: str
+) -> Callable[..., Any]:
+    clock = time.perf_counter_ns
+    # 追跡場は `_neighbors` を通らないため、距離場で届いたマスの数を展開ノード数に加える。
+    counts_result = span_name == "pursuit_field"
+
+    if inspect.iscoroutinefunction(original):
+
+        @functools.wraps(original)
+        async def traced_async(*args: Any, **kwargs: Any) -> Any:
+            start = clock()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                tracer.complete(span_name, start, clock())
+
+        return traced_async
+
+    @functools.wraps(original)
+    def traced(*args: Any, **kwargs: Any) -> Any:
+        start = clock()
+        result = None
+        try:
+            result = original(*args, **kwargs)
+            return result
+        finally:
+            if counts_result and result is not None:
+                tracer.count_nodes(args[0].reached(result))
+            tracer.complete(span_name, start, clock())
+
+    return traced
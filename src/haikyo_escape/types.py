@@ -33,21 +33,24 @@ class Direction(Enum):
 
     @classmethod
     def from_token(cls, token: str) -> "Direction":
-        token = token.lower()
-        aliases = {
-            "n": cls.NORTH,
-            "north": cls.NORTH,
-            "s": cls.SOUTH,
-            "south": cls.SOUTH,
-            "e": cls.EAST,
-            "east": cls.EAST,
-            "w": cls.WEST,
-            "west": cls.WEST,
-        }
-        if token not in aliases:
-            raise ValueError(f"Unsupported direction token: {token}")
-        return aliases[token]
+        direction = _TOKEN_ALIASES.get(token.lower())
+        if direction is None:
+            raise ValueError(f"Unsupported direction token: {token.lower()}")
+        return direction
 
     @classmethod
     def tokens(cls) -> tuple[str, ...]:
         return ("north", "east", "south", "west")
+
+
+# 入力トークン（小文字）-> 方向。呼び出しごとに辞書を作らないようモジュールで1つだけ持つ。
+_TOKEN_ALIASES = {
+    "n": Direction.NORTH,
+    "north": Direction.NORTH,
+    "s": Direction.SOUTH,
+    "south": Direction.SOUTH,
+    "e": Direction.EAST,
+    "east": Direction.EAST,
+    "w": Direction.WEST,
+    "west": Direction.WEST,
+}
@@ -2,53 +2,28 @@
 
 from __future__ import annotations
 
-import random
+import argparse
+import contextlib
+import json
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, List, Optional, TextIO
 
 # `python src/main.py` で実行した際にも `src/` ディレクトリをインポート可能にする。
 PACKAGE_ROOT = Path(__file__).resolve().parent
 if str(PACKAGE_ROOT) not in sys.path:
     sys.path.insert(0, str(PACKAGE_ROOT))
 
-from haikyo_escape.dungeon import build_default_dungeon
 from haikyo_escape.engine import GameEngine
-from haikyo_escape.entities import Ghost, Player
+from haikyo_escape.entities import Player
+from haikyo_escape.simulation import create_game_state
 from haikyo_escape.state import GameState
+from haikyo_escape.tracing import install_from_env
 from haikyo_escape.types import Direction
 
 
 def build_game_state(seed: Optional[int] = None) -> GameState:
-    rng = random.Random(seed)
-    setup = build_default_dungeon(rng)
-
-    player = Player(
-        entity_id="player",
-        name="高校生プレイヤー",
-        room_id=setup.start_room_id,
-        position=setup.start_position,
-    )
-
-    ghosts = [
-        Ghost(entity_id="ghost_a", name="白い影", room_id=setup.start_room_id, position=setup.start_position),
-        Ghost(entity_id="ghost_b", name="黒い影", room_id=setup.start_room_id, position=setup.start_position),
-    ]
-
-    state = GameState(
-        rooms=setup.rooms,
-        player=player,
-        ghosts=ghosts,
-        exit_room_id=setup.exit_room_id,
-        exit_position=setup.exit_position,
-        start_room_id=setup.start_room_id,
-        start_position=setup.start_position,
-        safe_rooms=setup.safe_rooms,
-        rng_seed=seed,
-    )
-    for item in setup.items.values():
-        state.add_item(item)
-    return state
+    return create_game_state(seed)
 
 
 def print_welcome(seed: Optional[int]) -> None:
@@ -141,63 +116,146 @@ def reveal_room(state: GameState) -> None:
     print(f"\n> You step into {room.name}.")
 
 
+def handle_utility_command(state: GameState, lowered: str) -> bool:
+    """ターンを消費しない表示系コマンドなら処理して True を返す。"""
+    if lowered in {"help", "h", "?"}:
+        print_help()
+        return True
+    if lowered in {"look", "l"}:
+        describe_room(state)
+        return True
+    if lowered in {"inventory", "inv", "i"}:
+        list_inventory(state)
+        return True
+    if lowered in {"items", "floor"}:
+        list_floor_items(state)
+        return True
+    if lowered == "log":
+        print("[Log]")
+        for entry in state.log[-10:]:
+            print(" ", entry)
+        return True
+    return False
+
+
 def cli_player_choice(state: GameState, player: Player) -> str:
     describe_room(state)
     list_floor_items(state)
+    return quiet_player_choice(state, player)
+
 
+def quiet_player_choice(state: GameState, player: Player) -> str:
+    """`--quiet` 用の入力関数。部屋表示を省き、`look` などで求められたときだけ表示する。"""
     while True:
         raw = input("\nCommand > ").strip()
         if not raw:
             continue
 
         lowered = raw.lower()
-        if lowered in {"help", "h", "?"}:
-            print_help()
-            continue
-        if lowered in {"look", "l"}:
-            describe_room(state)
-            continue
-        if lowered in {"inventory", "inv", "i"}:
-            list_inventory(state)
-            continue
-        if lowered in {"items", "floor"}:
-            list_floor_items(state)
-            continue
-        if lowered == "log":
-            print("[Log]")
-            for entry in state.log[-10:]:
-                print(" ", entry)
+        if handle_utility_command(state, lowered):
             continue
 
         # 行動コマンドの処理はゲームエンジンに委譲する。
         return lowered
 
 
-def main(seed: Optional[int] = None) -> None:
+def play_script(engine: GameEngine, lines: Iterable[str], quiet: bool = False) -> None:
+    """コマンド列を1行ずつ流し込み、ゲーム終了か入力の終端まで進める。
+
+    空行と `#` で始まる行は読み飛ばす。`quiet` では毎ターンの部屋表示を省き、
+    `help` などの表示系コマンドの出力は標準エラーへ回す（標準出力は JSON サマリだけにする）。
+    """
+    state = engine.state
+    if not quiet:
+        describe_room(state)
+        list_floor_items(state)
+
+    for line in lines:
+        if state.is_over:
+            break
+        raw = line.strip()
+        if not raw or raw.startswith("#"):
+            continue
+
+        lowered = raw.lower()
+        with contextlib.redirect_stdout(sys.stderr) if quiet else contextlib.nullcontext():
+            handled = handle_utility_command(state, lowered)
+        if handled:
+            continue
+        if not quiet:
+            print(f"\nCommand > {raw}")
+        engine.step(lowered)
+        if not quiet and not state.is_over:
+            describe_room(state)
+            list_floor_items(state)
+
+
+def game_summary(state: GameState, seed: Optional[int]) -> dict[str, object]:
+    """終了時に出力する機械可読なサマリ。"""
+    player = state.player
+    return {
+        "seed": seed,
+        "is_over": state.is_over,
+        "winner": state.winner,
+        "turns": state.turn_count,
+        "steps": state.total_steps,
+        "actions": state.action_count,
+        "items_used": state.items_used,
+        "player": [player.room_id, *player.position],
+        "inventory": [item.item_id for item in player.inventory],
+        "log_entries": len(state.log),
+    }
+
+
+def main(seed: Optional[int] = None, script: Optional[TextIO] = None, quiet: bool = False) -> None:
     state = build_game_state(seed)
-    print_welcome(seed)
+    if not quiet:
+        print_welcome(seed)
     engine = GameEngine(
         state=state,
-        player_choice_fn=cli_player_choice,
-        reveal_callback=reveal_room,
+        player_choice_fn=quiet_player_choice if quiet else cli_player_choice,
+        reveal_callback=None if quiet else reveal_room,
     )
 
-    while not state.is_over:
-        engine.run_turn()
-
-    print("\n=== Game Over ===")
-    print(f"Winner: {state.winner}")
-    print("Final log:")
-    for entry in state.log:
-        print("-", entry)
+    if script is not None:
+        play_script(engine, script, quiet=quiet)
+    else:
+        while not state.is_over:
+            engine.run_turn()
+
+    if not quiet:
+        print("\n=== Game Over ===" if state.is_over else "\n=== Script finished ===")
+        print(f"Winner: {state.winner}")
+        print("Final log:")
+        for entry in state.log:
+            print("-", entry)
+    if script is not None:
+        print(json.dumps(game_summary(state, seed), ensure_ascii=False))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Haunted Ruin Escape (Text Prototype)")
+    parser.add_argument("seed", nargs="?", type=int, help="random seed for a reproducible game")
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help="read commands from FILE ('-' for stdin) instead of prompting; prints a JSON summary",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="suppress room descriptions and the final log",
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    cli_seed: Optional[int] = None
-    if len(sys.argv) > 1:
-        try:
-            cli_seed = int(sys.argv[1])
-        except ValueError:
-            print("Seed must be an integer.", file=sys.stderr)
-            sys.exit(1)
-    main(cli_seed)
+    cli_args = parse_args()
+    install_from_env()
+    if cli_args.script is None:
+        main(cli_args.seed, quiet=cli_args.quiet)
+    elif cli_args.script == "-":
+        main(cli_args.seed, sys.stdin, quiet=cli_args.quiet)
+    else:
+        with open(cli_args.script, encoding="utf-8") as script_file:
+            main(cli_args.seed, script_file, quiet=cli_args.quiet)
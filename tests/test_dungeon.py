@@ -0,0 +1,301 @@
+"""ダンジョン生成と生成物キャッシュのユニットテスト。"""
+
+import random
+import tempfile
+import time
+import unittest
+from collections import deque
+
+from haikyo_escape.cache import DungeonCache, dump_setup, load_setup
+from haikyo_escape.connectivity import DoorGraph, can_escape, validate_seeds, validate_setup
+from haikyo_escape.dungeon import (
+    PROCEDURAL_GENERATOR_VERSION,
+    DungeonSetup,
+    GeneratorConfig,
+    build_default_dungeon,
+    build_procedural_dungeon,
+)
+from haikyo_escape.entities import Item, ItemType
+from haikyo_escape.room import Door, Room
+from haikyo_escape.simulation import create_game_state
+from haikyo_escape.types import Direction
+
+
+def room_signature(setup):
+    return {
+        room_id: (
+            room.walls,
+            room.fragile_walls,
+            room.explore_positions,
+            room.one_way_exits,
+            room.doors,
+        )
+        for room_id, room in setup.rooms.items()
+    }
+
+
+def reachable_tiles(setup):
+    """開始地点から鍵も道具も使わずに歩ける (部屋ID, 座標) の集合。"""
+    start = (setup.start_room_id, setup.start_position)
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        room_id, position = queue.popleft()
+        room = setup.rooms[room_id]
+        door = room.door_at(position)
+        for direction in Direction:
+            if not room.allows_exit_from(position, direction):
+                continue
+            if door is not None and door.direction == direction:
+                if door.is_locked:
+                    continue
+                nxt = (door.target_room_id, door.target_position)
+            else:
+                dx, dy = direction.delta
+                step = (position[0] + dx, position[1] + dy)
+                if not room.is_walkable(step):
+                    continue
+                nxt = (room_id, step)
+            if nxt not in seen:
+                seen.add(nxt)
+                queue.append(nxt)
+    return seen
+
+
+class DungeonCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def test_round_trip_matches_regeneration(self) -> None:
+        original = build_default_dungeon(random.Random(11))
+        restored = load_setup(dump_setup(original))
+        self.assertEqual(room_signature(restored), room_signature(original))
+        self.assertEqual(restored.items, original.items)
+        self.assertEqual(restored.safe_rooms, original.safe_rooms)
+        self.assertEqual(restored.exit_position, original.exit_position)
+
+    def test_second_lookup_is_a_hit_with_fresh_objects(self) -> None:
+        cache = DungeonCache(self._tmp.name)
+        first = cache.get_or_build(5)
+        second = cache.get_or_build(5)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(second.items, first.items)
+        self.assertIsNot(second.rooms["r0"], first.rooms["r0"])
+
+        # 再起動したキャッシュでもディスク上のエントリを再利用できる。
+        reopened = DungeonCache(self._tmp.name)
+        reopened.get_or_build(5)
+        self.assertEqual(reopened.hits, 1)
+
+    def test_evicts_least_recently_used_when_over_budget(self) -> None:
+        size = len(dump_setup(build_default_dungeon(random.Random(0))))
+        cache = DungeonCache(self._tmp.name, max_bytes=size * 2 + size // 2)
+        cache.get_or_build(1)
+        cache.get_or_build(2)
+        cache.get_or_build(1)  # seed 1 を最近参照したことにする。
+        cache.get_or_build(3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+        hits = cache.hits
+        cache.get_or_build(1)
+        self.assertEqual(cache.hits, hits + 1)
+        cache.get_or_build(2)
+        self.assertEqual(cache.misses, 4)
+
+
+class ProceduralDungeonTest(unittest.TestCase):
+    def test_exit_and_items_are_reachable_without_keys(self) -> None:
+        config = GeneratorConfig(
+            columns=7, rows=5, wall_density=0.6, one_way_ratio=0.3, extra_door_ratio=0.5
+        )
+        for seed in range(5):
+            setup = build_procedural_dungeon(random.Random(seed), config)
+            self.assertEqual(len(setup.rooms), 35)
+            reachable = reachable_tiles(setup)
+            self.assertIn((setup.exit_room_id, setup.exit_position), reachable)
+            for item in setup.items.values():
+                self.assertIn((item.room_id, item.position), reachable)
+
+    def test_same_seed_and_overrides_reproduce_the_layout(self) -> None:
+        first = build_procedural_dungeon(random.Random(3), columns=4, rows=4, wall_density=0.5)
+        config = GeneratorConfig(columns=4, rows=4, wall_density=0.5)
+        second = build_procedural_dungeon(random.Random(3), config)
+        self.assertEqual(room_signature(first), room_signature(second))
+        self.assertEqual(first.items, second.items)
+
+    def test_only_extra_doors_are_locked_or_one_way(self) -> None:
+        setup = build_procedural_dungeon(
+            random.Random(8),
+            columns=6,
+            rows=6,
+            extra_door_ratio=1.0,
+            locked_ratio=0.5,
+            one_way_door_ratio=0.5,
+        )
+        two_way_unlocked = set()
+        special = 0
+        for room in setup.rooms.values():
+            for door in room.doors.values():
+                if door.is_locked or door.one_way:
+                    special += 1
+                else:
+                    two_way_unlocked.add(frozenset((room.room_id, door.target_room_id)))
+        self.assertGreater(special, 0)
+        # 全域木の辺（部屋数 - 1）は必ず双方向・施錠なしで残る。
+        self.assertGreaterEqual(len(two_way_unlocked), len(setup.rooms) - 1)
+
+    def test_rejects_invalid_config(self) -> None:
+        with self.assertRaises(ValueError):
+            build_procedural_dungeon(random.Random(0), columns=2, rows=2)
+        with self.assertRaises(ValueError):
+            build_procedural_dungeon(random.Random(0), wall_density=1.5)
+
+    def test_ten_thousand_rooms_build_quickly(self) -> None:
+        started = time.perf_counter()
+        setup = build_procedural_dungeon(random.Random(1), columns=100, rows=100)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(len(setup.rooms), 10_000)
+        self.assertIn("r9999", setup.rooms)
+        self.assertLess(elapsed, 1.0)
+
+    def test_cache_round_trip(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DungeonCache(directory)
+            params = {"columns": 5, "rows": 4}
+            built = cache.get_or_build(
+                2,
+                params=params,
+                builder=build_procedural_dungeon,
+                version=PROCEDURAL_GENERATOR_VERSION,
+            )
+            loaded = cache.get_or_build(
+                2,
+                params=params,
+                builder=build_procedural_dungeon,
+                version=PROCEDURAL_GENERATOR_VERSION,
+            )
+            self.assertEqual(cache.hits, 1)
+            self.assertEqual(room_signature(loaded), room_signature(built))
+            self.assertEqual(loaded.items, built.items)
+            self.assertEqual(loaded.loot.seed, built.loot.seed)
+            self.assertEqual(loaded.loot.draw("r3", (2, 1)), built.loot.draw("r3", (2, 1)))
+
+    def test_cache_hit_is_faster_than_rebuilding(self) -> None:
+        params = {"columns": 10, "rows": 10}
+
+        def best_of(build, repeat=5):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                build()
+                timings.append(time.perf_counter() - started)
+            return min(timings)
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DungeonCache(directory)
+            options = dict(
+                params=params,
+                builder=build_procedural_dungeon,
+                version=PROCEDURAL_GENERATOR_VERSION,
+            )
+            cache.get_or_build(4, **options)
+            load = best_of(lambda: cache.get_or_build(4, **options))
+            build = best_of(lambda: build_procedural_dungeon(random.Random(4), **params))
+        self.assertEqual(cache.hits, 5)
+        # 100部屋では復元が生成の数分の1で済む（手元の計測で約 0.5ms 対 2.2ms）。
+        self.assertLess(load, build)
+
+    def test_only_the_master_key_is_placed_up_front(self) -> None:
+        setup = build_procedural_dungeon(random.Random(6), columns=30, rows=30)
+        self.assertEqual(list(setup.items), ["key_master"])
+        self.assertIsNotNone(setup.loot)
+        eager = build_procedural_dungeon(random.Random(6), columns=3, rows=3, lazy_loot=False)
+        self.assertIsNone(eager.loot)
+        self.assertEqual(len(eager.items), 9)
+
+
+def corridor_setup(*, locked=False, one_way=False, fragile=False):
+    """r0 と r1 を東西のドアでつないだ最小の配置。鍵は r1、出口は r0 に置く。"""
+    rooms = {"r0": Room("r0", "west"), "r1": Room("r1", "east")}
+    rooms["r0"].add_door(
+        Direction.EAST,
+        Door("r1", (5, 2), (0, 2), Direction.EAST, is_locked=locked, one_way=one_way),
+    )
+    if not one_way:
+        door = Door("r0", (0, 2), (5, 2), Direction.WEST, is_locked=locked)
+        rooms["r1"].add_door(Direction.WEST, door)
+    if fragile:
+        # r0 の開始地点 (0, 0) を脆い壁で囲う。
+        rooms["r0"].add_fragile_wall((1, 0))
+        rooms["r0"].add_wall((0, 1))
+    key = Item(
+        "key_master", "key", ItemType.KEY, "r1", position=(3, 3), metadata={"is_master": True}
+    )
+    breaker = Item("breaker_a", "bar", ItemType.WALL_BREAKER, "r1", position=(4, 4))
+    return DungeonSetup(
+        rooms=rooms,
+        items={key.item_id: key, breaker.item_id: breaker},
+        start_room_id="r0",
+        start_position=(0, 0) if fragile else (2, 2),
+        exit_room_id="r0",
+        exit_position=(3, 3),
+        safe_rooms=set(),
+    )
+
+
+class ConnectivityTest(unittest.TestCase):
+    def test_default_and_procedural_layouts_validate(self) -> None:
+        for seed in range(10):
+            self.assertEqual(validate_setup(build_default_dungeon(random.Random(seed))), [])
+        problems = validate_seeds(range(4), builder=build_procedural_dungeon, max_workers=0)
+        self.assertEqual(problems, {})
+
+    def test_one_way_door_is_reported_as_trap(self) -> None:
+        setup = corridor_setup(one_way=True)
+        problems = validate_setup(setup)
+        self.assertEqual(len(problems), 1)
+        self.assertIn("exit", problems[0])
+
+        graph = DoorGraph(setup.rooms, points=[("r0", (3, 3)), ("r1", (3, 3))])
+        self.assertTrue(graph.can_reach(("r0", (2, 2)), ("r1", (3, 3))))
+        self.assertFalse(graph.can_reach(("r1", (3, 3)), ("r0", (3, 3))))
+        traps = graph.traps(("r0", (2, 2)), ("r0", (3, 3)))
+        self.assertEqual(traps, [[("r1", (0, 2)), ("r1", (3, 3))]])
+
+    def test_locked_door_needs_the_key(self) -> None:
+        setup = corridor_setup(locked=True)
+        points = [("r1", (3, 3))]
+        self.assertFalse(DoorGraph(setup.rooms, points=points).can_reach(("r0", (2, 2)), points[0]))
+        with_key = DoorGraph(setup.rooms, has_key=True, points=points)
+        self.assertTrue(with_key.can_reach(("r0", (2, 2)), points[0]))
+        self.assertEqual(len(validate_setup(setup)), 1)
+
+    def test_components_group_two_way_rooms(self) -> None:
+        graph = DoorGraph(corridor_setup().rooms)
+        self.assertEqual(len(graph.components()), 1)
+        graph = DoorGraph(corridor_setup(one_way=True).rooms)
+        self.assertEqual(len(graph.components()), 2)
+
+    def test_can_escape_tracks_inventory_and_breakers(self) -> None:
+        state = create_game_state(setup=corridor_setup(fragile=True))
+        # 脆い壁の奥に閉じ込められていても、破壊道具が残っていれば脱出の見込みはある。
+        self.assertTrue(can_escape(state))
+        state.items["breaker_a"].room_id = "consumed"
+        self.assertFalse(can_escape(state))
+
+        # 鍵が一方通行ドアの先にあると、拾った時点で出口へ戻れない。
+        state = create_game_state(setup=corridor_setup(one_way=True))
+        self.assertFalse(can_escape(state))
+        state.items["key_master"].room_id = "r0"
+        self.assertTrue(can_escape(state))
+        state.player.move_to("r1")
+        self.assertFalse(can_escape(state))
+
+    def test_validate_seeds_in_a_process_pool(self) -> None:
+        self.assertEqual(validate_seeds(range(3), max_workers=2), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
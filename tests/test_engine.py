@@ -0,0 +1,603 @@
+"""GameEngine のターン進行と付帯機能のユニットテスト。"""
+
+import asyncio
+import copy
+import gzip
+import importlib
+import json
+import os
+import pickle
+import random
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+import haikyo_escape
+from haikyo_escape import actions
+from haikyo_escape.actions import Action, Opcode
+from haikyo_escape.engine import AsyncGameEngine, GameEngine
+from haikyo_escape.entities import Item, ItemType
+from haikyo_escape.evaluation import BLOCKED_LOCKED, BLOCKED_ONE_WAY, BLOCKED_WALL
+from haikyo_escape.events import EventBus, GameOver, GhostMoved, PlayerMoved, RoomEntered
+from haikyo_escape.simulation import RandomPolicy, create_game_state
+from haikyo_escape import tracing
+from haikyo_escape.metrics import Histogram, MetricsRegistry
+from haikyo_escape.telemetry import TelemetrySink
+from haikyo_escape.balance import BalanceConfig
+from haikyo_escape.dungeon import build_procedural_dungeon
+from haikyo_escape.threat import forecast_threat
+from haikyo_escape.types import Direction
+
+from .test_dungeon import corridor_setup
+
+
+def scripted(commands):
+    """コマンド列を順に返し、尽きたら wait を返す入力関数。"""
+    remaining = list(commands)
+
+    def choose(state, player):
+        return remaining.pop(0) if remaining else "wait"
+
+    return choose
+
+
+class ActionTest(unittest.TestCase):
+    def test_typed_actions_match_text_commands(self) -> None:
+        text = ["search", "take all", "move east", "move south", "use 0", "wait", "take 5"]
+        typed = [
+            actions.SEARCH,
+            actions.TAKE_ALL,
+            Action.move(Direction.EAST),
+            Action.move(Direction.SOUTH),
+            Action.use(0),
+            actions.WAIT,
+            Action.take(5),
+        ]
+        text_state = create_game_state(2)
+        GameEngine(text_state, scripted([])).run_actions(text)
+        typed_state = create_game_state(2)
+        GameEngine(typed_state, scripted([])).run_actions(typed)
+
+        self.assertEqual(typed_state.log, text_state.log)
+        self.assertEqual(typed_state.action_count, text_state.action_count)
+
+    def test_text_front_end_records_parse_errors(self) -> None:
+        state = create_game_state(2)
+        engine = GameEngine(state, scripted([]))
+
+        engine.step("dance")
+        self.assertEqual(state.log[-1], "Unknown action 'dance'.")
+        engine.step("move sideways")
+        self.assertEqual(state.log[-1], "Unsupported direction 'sideways'.")
+        engine.step("use lantern")
+        self.assertEqual(state.log[-1], "No matching item in inventory.")
+        self.assertEqual(state.action_count, 0)
+
+    def test_run_actions_stops_when_game_ends(self) -> None:
+        state = create_game_state(2)
+        engine = GameEngine(state, scripted([]))
+
+        played = engine.run_actions([actions.WAIT, actions.QUIT, actions.WAIT, actions.WAIT])
+
+        self.assertEqual(played, 2)
+        self.assertEqual(state.winner, "quit")
+        self.assertEqual(state.turn_count, 2)
+
+    def test_action_renders_as_text_command(self) -> None:
+        self.assertEqual(str(Action.move(Direction.NORTH, Direction.WEST)), "move north west")
+        self.assertEqual(str(actions.TAKE_ALL), "take all")
+        self.assertEqual(str(Action(Opcode.USE, (1,), source="use lantern")), "use lantern")
+
+
+class EventBusTest(unittest.TestCase):
+    def test_subscribers_observe_moves_and_game_over(self) -> None:
+        state = create_game_state(5)
+        engine = GameEngine(state, RandomPolicy(random.Random(5)))
+        moves, rooms, endings = [], [], []
+        engine.events.subscribe(PlayerMoved, moves.append)
+        engine.events.subscribe(RoomEntered, rooms.append)
+        engine.events.subscribe(GameOver, endings.append)
+
+        while not state.is_over and state.turn_count < 300:
+            engine.run_turn()
+        if not state.is_over:
+            engine.step(actions.QUIT)
+
+        self.assertEqual(len(moves), state.total_steps)
+        self.assertTrue(all(event.room_id != event.previous_room_id for event in rooms))
+        self.assertEqual([event.winner for event in endings], [state.winner])
+
+    def test_events_are_not_built_without_subscribers(self) -> None:
+        state = create_game_state(5)
+        engine = GameEngine(state, RandomPolicy(random.Random(5)))
+        engine.events.subscribe(GhostMoved, lambda event: None)
+        with mock.patch("haikyo_escape.state.PlayerMoved", side_effect=AssertionError):
+            for _ in range(50):
+                engine.run_turn()
+        self.assertGreater(state.total_steps, 0)
+
+    def test_unsubscribe_removes_handler(self) -> None:
+        bus = EventBus()
+        received = []
+        unsubscribe = bus.subscribe(GameOver, received.append)
+        bus.publish(GameOver(1, "quit"))
+        unsubscribe()
+        bus.publish(GameOver(2, "quit"))
+        self.assertEqual(len(received), 1)
+        self.assertFalse(bus.wants(GameOver))
+
+
+class StuckDetectionTest(unittest.TestCase):
+    def test_game_ends_once_the_exit_is_out_of_reach(self) -> None:
+        state = create_game_state(setup=corridor_setup(one_way=True))
+        state.items["key_master"].room_id = "r0"  # 鍵は一方通行ドアの手前にある。
+        engine = GameEngine(state, scripted([]), detect_stuck=True)
+        engine.step("wait")
+        self.assertFalse(state.is_over)
+
+        engine.run_actions([Action.move(Direction.EAST)] * 4)
+        self.assertEqual(state.player.room_id, "r1")
+        self.assertEqual(state.winner, "stuck")
+        self.assertEqual(state.turn_count, 4)
+
+    def test_reachability_is_rebuilt_only_when_inventory_matters(self) -> None:
+        state = create_game_state(7)
+        engine = GameEngine(state, RandomPolicy(random.Random(7)), detect_stuck=True)
+        for _ in range(60):
+            engine.run_turn()
+        monitor = engine.escape_monitor
+        assert monitor is not None
+        self.assertLessEqual(monitor.rebuilds, 1 + state.items_used + len(state.player.inventory))
+        self.assertNotEqual(state.winner, "stuck")
+
+    def test_disabled_by_default(self) -> None:
+        state = create_game_state(setup=corridor_setup(one_way=True))
+        engine = GameEngine(state, scripted([]))
+        engine.step("wait")
+        self.assertIsNone(engine.escape_monitor)
+        self.assertFalse(state.is_over)
+
+
+def haunted_state(seed: int = 1):
+    """r5 に幽霊が1体出現済みで、プレイヤーが r4 にいる状態（入力待ちの時点）。"""
+    state = create_game_state(seed)
+    state.player.room_id, state.player.position = "r4", (1, 1)
+    ghost = state.ghosts[0]
+    ghost.is_spawned = True
+    ghost.room_id, ghost.position = "r5", (4, 4)
+    state.first_ghost_spawned = True
+    return state
+
+
+class ThreatForecastTest(unittest.TestCase):
+    def test_deterministic_ghost_matches_the_engine(self) -> None:
+        balance = BalanceConfig(ghost_single_step_chance=1.0)
+        state = haunted_state()
+        state.second_ghost_spawned = True
+        state.turn_count = 1
+        forecast = forecast_threat(state, [("r4", (1, 1))], turns=14, balance=balance)
+        self.assertEqual(state.ghosts[0].position, (4, 4))  # 予測は状態を変えない。
+
+        state.turn_count = 0
+        engine = GameEngine(state, scripted([]), balance=balance)
+        for turn in range(1, 15):
+            engine.step(actions.WAIT)
+            if state.is_over:
+                self.assertEqual(forecast.catch[turn - 1], 1.0)
+                break
+            ghost = state.ghosts[0]
+            self.assertEqual(forecast.occupancy[turn - 1], {(ghost.room_id, ghost.position): 1.0})
+        self.assertEqual(state.winner, "ghosts")
+        self.assertAlmostEqual(forecast.risk, 1.0)
+
+    def test_catch_probabilities_agree_with_simulation(self) -> None:
+        state = haunted_state()
+        state.turn_count = 1
+        forecast = forecast_threat(state, [("r4", (1, 1))], turns=8)
+
+        games, caught = 500, 0
+        for seed in range(games):
+            state = haunted_state()
+            engine = GameEngine(state, scripted([]), rng=random.Random(seed))
+            engine.run_actions([actions.WAIT] * 8)
+            caught += state.winner == "ghosts"
+        self.assertAlmostEqual(forecast.risk, caught / games, delta=0.07)
+
+    def test_safe_room_blocks_spawns(self) -> None:
+        state = create_game_state(2)
+        state.turn_count = 1
+        here = (state.player.room_id, state.player.position)
+        forecast = forecast_threat(state, [here], turns=5)
+        self.assertEqual(forecast.risk, 0.0)
+        self.assertEqual(forecast.occupancy, [{}] * 5)
+
+        danger = forecast_threat(state, [here, ("r3", (3, 0))], turns=3).danger(3)
+        self.assertEqual(len(danger), 9 * 6 * 6)
+        self.assertGreater(sum(danger), 0.0)
+        self.assertLess(sum(danger), 2.0)
+
+
+def placed_state(room_id: str, position, *, speed: bool = False):
+    """プレイヤーを `room_id` の `position` に置いた状態。`speed` なら加速中にする。"""
+    state = create_game_state(1)
+    state.player.room_id, state.player.position = room_id, position
+    if speed:
+        state.apply_speed_boost(3)
+    return state
+
+
+class ActionEvaluationTest(unittest.TestCase):
+    def test_moves_match_the_engine(self) -> None:
+        for room_id in ("r3", "r4", "r6"):
+            room = create_game_state(1).rooms[room_id]
+            tiles = [
+                (x, y)
+                for y in range(room.height)
+                for x in range(room.width)
+                if room.is_walkable((x, y))
+            ]
+            for position in tiles:
+                outcomes = placed_state(room_id, position, speed=True).evaluate_actions()
+                for outcome in outcomes:
+                    if outcome.action.opcode != Opcode.MOVE:
+                        continue
+                    state = placed_state(room_id, position, speed=True)
+                    GameEngine(state, scripted([])).step(outcome.action)
+                    with self.subTest(room=room_id, position=position, action=str(outcome.action)):
+                        reached = (state.player.room_id, state.player.position)
+                        self.assertEqual(reached, (outcome.room_id, outcome.position))
+
+    def test_blocked_reasons(self) -> None:
+        # r4 の (0, 5) は東へしか出られない一方通行のマス。
+        outcomes = {o.action: o for o in placed_state("r4", (0, 5)).evaluate_actions()}
+        self.assertEqual(outcomes[Action.move(Direction.NORTH)].blocked, BLOCKED_ONE_WAY)
+        self.assertIsNone(outcomes[Action.move(Direction.EAST)].blocked)
+
+        state = placed_state("r0", (0, 0))
+        outcome = {o.action: o for o in state.evaluate_actions()}[Action.move(Direction.NORTH)]
+        self.assertEqual(outcome.blocked, BLOCKED_WALL)
+
+        # 既定レイアウトのドアは全ゲームで共有されるため、施錠はこのテストの間だけに留める。
+        door = state.rooms["r0"].doors[Direction.EAST]
+        state.player.position = door.position
+        with mock.patch.object(door, "is_locked", True):
+            outcomes = {o.action: o for o in state.evaluate_actions()}
+        outcome = outcomes[Action.move(Direction.EAST)]
+        self.assertEqual(
+            (outcome.blocked, outcome.position, outcome.steps), (BLOCKED_LOCKED, door.position, 0)
+        )
+
+    def test_speed_adds_two_step_moves(self) -> None:
+        slow = placed_state("r4", (2, 2)).evaluate_actions()
+        fast = placed_state("r4", (2, 2), speed=True).evaluate_actions()
+        slow_moves = [o for o in slow if o.action.opcode == Opcode.MOVE]
+        self.assertEqual(max(len(o.action.operands) for o in slow_moves), 1)
+        fast_moves = [o for o in fast if o.action.opcode == Opcode.MOVE]
+        two_steps = [o for o in fast_moves if len(o.action.operands) == 2]
+        # 止まらずに1歩進めた方向ごとに、2歩目の4方向が続く。
+        open_directions = sum(o.blocked is None for o in slow if o.action.opcode == Opcode.MOVE)
+        self.assertEqual(len(two_steps), 4 * open_directions)
+        self.assertIn(("r4", (2, 0)), [(o.room_id, o.position) for o in two_steps])
+
+    def test_search_take_and_use_do_not_mutate_state(self) -> None:
+        state = create_game_state(1)
+        tile = next(
+            (room_id, position)
+            for room_id, room in state.rooms.items()
+            for position in sorted(room.explore_positions)
+            if room_id not in state.safe_rooms
+        )
+        state.player.room_id, state.player.position = tile
+        boost = Item("boost", "加速", ItemType.SPEED_BOOST, tile[0], hidden=False)
+        state.player.inventory.append(boost)
+        log_length = len(state.log)
+        items = list(state.items_at_position(*tile, include_hidden=True))
+
+        outcomes = state.evaluate_actions()
+        self.assertEqual(len(state.log), log_length)
+        self.assertEqual(state.items_at_position(*tile, include_hidden=True), items)
+        self.assertNotIn(tile, state._looted)
+        search = next(o for o in outcomes if o.action == actions.SEARCH)
+        use = next(o for o in outcomes if o.action.opcode == Opcode.USE)
+        self.assertEqual((use.effect, use.duration), ("SPEED_BOOST", 5))
+
+        GameEngine(state, scripted([])).step(actions.SEARCH)
+        found = state.items_at_position(*tile)
+        revealed_ids = [item.item_id for item in search.revealed]
+        self.assertEqual([item.item_id for item in found], revealed_ids)
+        take = next(o for o in state.evaluate_actions() if o.action == actions.TAKE_ALL)
+        self.assertEqual(take.taken, tuple(found))
+
+
+class AsyncGameEngineTest(unittest.TestCase):
+    def test_matches_sync_engine_for_same_seed_and_inputs(self) -> None:
+        for seed in range(20):
+            sync_state = create_game_state(seed)
+            sync_policy = RandomPolicy(random.Random(seed))
+            actions = []
+
+            def recording_choice(state, player):
+                action = sync_policy(state, player)
+                actions.append(action)
+                return action
+
+            engine = GameEngine(sync_state, recording_choice)
+            while not sync_state.is_over and sync_state.turn_count < 200:
+                engine.run_turn()
+
+            async_state = create_game_state(seed)
+            replay = list(actions)
+
+            async def async_choice(state, player):
+                await asyncio.sleep(0)
+                return replay.pop(0)
+
+            async_engine = AsyncGameEngine(async_state, async_choice)
+            winner = asyncio.run(async_engine.play(max_turns=200))
+
+            self.assertEqual(winner, sync_state.winner)
+            self.assertEqual(async_state.log, sync_state.log)
+
+
+def chased_state(seed: int):
+    """r4 の (0, 0) に幽霊が1体出現済みの状態。"""
+    state = create_game_state(seed)
+    ghost = state.ghosts[0]
+    ghost.is_spawned = True
+    ghost.move_to("r4")
+    ghost.set_position((0, 0))
+    state.first_ghost_spawned = True
+    return state
+
+
+class SpeculationTest(unittest.TestCase):
+
+    def test_prefetched_fields_are_consumed_without_changing_play(self) -> None:
+        commands = ["move south", "move south", "move east", "wait", "move east", "wait"]
+        baseline = chased_state(4)
+        engine = GameEngine(baseline, scripted(commands))
+        for _ in range(len(commands)):
+            engine.run_turn()
+
+        speculative = chased_state(4)
+        script = scripted(commands)
+
+        def thinking_choice(state, player):
+            time.sleep(0.01)  # 入力待ちの間に先読みが終わるよう少し待つ。
+            return script(state, player)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            engine = GameEngine(speculative, thinking_choice, speculation_executor=executor)
+            for _ in range(len(commands)):
+                engine.run_turn()
+
+        self.assertEqual(speculative.log, baseline.log)
+        fields = speculative.pursuit_fields()
+        self.assertGreater(fields.speculative, 0)
+        self.assertGreater(fields.hits, 0)
+
+    def test_chased_state_can_be_copied_and_pickled(self) -> None:
+        state = chased_state(4)
+        engine = GameEngine(state, scripted([]), rng=random.Random(0))
+        engine.run_actions(["move south", "move south", "move east"])
+        self.assertGreater(len(state.pursuit_fields()._fields), 0)
+
+        copied = copy.deepcopy(state)
+        restored = pickle.loads(pickle.dumps(state))
+        for clone in (copied, restored):
+            self.assertEqual(clone.pursuit_fields().cached_bytes, 0)
+            GameEngine(clone, scripted([]), rng=random.Random(1)).run_actions([actions.WAIT] * 3)
+        GameEngine(state, scripted([]), rng=random.Random(1)).run_actions([actions.WAIT] * 3)
+        self.assertEqual(copied.log, state.log)
+        self.assertEqual(restored.log, state.log)
+
+    def test_graph_is_shared_until_a_wall_breaks(self) -> None:
+        first, second = chased_state(4), chased_state(5)
+        self.assertIs(first.pursuit_fields().graph(), second.pursuit_fields().graph())
+
+        room = first.rooms["r4"]
+        room.remove_wall(next(iter(room.layout.walls)))
+        first.layout_version += 1
+        self.assertIsNot(first.pursuit_fields().graph(), second.pursuit_fields().graph())
+
+    def test_field_cache_is_capped_by_bytes(self) -> None:
+        state = chased_state(4)
+        fields = state.pursuit_fields()
+        fields.max_bytes = 20_000
+        for x in range(6):
+            for y in range(6):
+                if state.rooms["r4"].is_walkable((x, y)):
+                    fields.field_for(("r4", (x, y)))
+        self.assertLessEqual(fields.cached_bytes, fields.max_bytes)
+        self.assertGreater(len(fields._fields), 0)
+        cached = sum(sys.getsizeof(field) for field in fields._fields.values())
+        self.assertEqual(fields.cached_bytes, cached)
+
+    def test_prefetch_survives_the_byte_cap_on_a_large_map(self) -> None:
+        setup = build_procedural_dungeon(random.Random(1), columns=30, rows=30)
+        state = create_game_state(1, setup=setup)
+        room = state.rooms["r40"]
+        position, direction = next(
+            ((x, y), direction)
+            for y in range(room.height)
+            for x in range(room.width)
+            for direction in Direction
+            if room.is_walkable((x, y))
+            and room.door_at((x, y)) is None
+            and room.is_walkable((x + direction.delta[0], y + direction.delta[1]))
+        )
+        state.player.move_to("r40")
+        state.player.set_position(position)
+        ghost = state.ghosts[0]
+        ghost.is_spawned = True
+        ghost.move_to("r45")
+        fields = state.pursuit_fields()
+        ghost.set_position(next(tile for tile in fields.graph().index if tile[0] == "r45")[1])
+        state.first_ghost_spawned = True
+
+        def waiting_choice(state, player):
+            while fields._pending:
+                time.sleep(0.005)
+            return Action.move(direction)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            engine = GameEngine(state, waiting_choice, speculation_executor=executor)
+            engine.run_turn()
+
+        self.assertNotEqual(state.player.position, position)
+        self.assertGreater(fields.cached_bytes, fields.max_bytes)  # 固定した先読み分は残る。
+        self.assertEqual(fields.misses, 0)
+        self.assertGreater(fields.hits, 0)
+
+
+class TelemetryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def test_one_record_per_turn_in_gzip_jsonl(self) -> None:
+        path = Path(self._tmp.name) / "turns.jsonl.gz"
+        state = create_game_state(7)
+        with TelemetrySink(path) as sink:
+            engine = GameEngine(state, scripted(["search", "move east"]), telemetry=sink)
+            for _ in range(3):
+                engine.run_turn()
+
+        with gzip.open(path, "rt", encoding="utf-8") as handle:
+            records = [json.loads(line) for line in handle]
+        self.assertEqual([record["turn"] for record in records], [1, 2, 3])
+        self.assertEqual(records[1]["action"], "move east")
+        self.assertEqual(records[0]["player"], ["r0", 2, 5])
+        self.assertIn("ghost_movement", records[0]["timings_ms"])
+        self.assertEqual(sink.dropped, 0)
+
+    def test_full_queue_drops_instead_of_blocking(self) -> None:
+        path = Path(self._tmp.name) / "turns.jsonl"
+        sink = TelemetrySink(path, max_queue=1, autostart=False)
+        self.assertTrue(sink.emit({"turn": 1}))
+        self.assertFalse(sink.emit({"turn": 2}))
+        self.assertEqual(sink.dropped, 1)
+
+        sink.start()
+        sink.close()
+        self.assertEqual(path.read_text(encoding="utf-8").splitlines(), ['{"turn":1}'])
+
+    def test_close_reports_a_dead_writer_without_hanging(self) -> None:
+        blocker = Path(self._tmp.name) / "not_a_directory"
+        blocker.write_text("", encoding="utf-8")
+        sink = TelemetrySink(blocker / "turns.jsonl", max_queue=2, autostart=False)
+        for turn in range(3):
+            sink.emit({"turn": turn})
+        sink.start()  # 出力先のディレクトリを作れずにライタースレッドが止まる。
+
+        started = time.perf_counter()
+        with self.assertRaises(OSError):
+            sink.close(timeout=5.0)
+        self.assertLess(time.perf_counter() - started, 5.0)
+        self.assertIsInstance(sink.error, OSError)
+        self.assertEqual(sink.written, 0)
+        self.assertEqual(sink.dropped, 3)
+
+
+class TracingTest(unittest.TestCase):
+    def test_records_spans_only_while_installed(self) -> None:
+        original = GameEngine.run_turn
+        path = Path(tempfile.mkdtemp()) / "trace.json"
+        state = create_game_state(3)
+        engine = GameEngine(state, scripted(["move east"] * 10))
+        with tracing.tracing(path) as tracer:
+            self.assertIsNot(GameEngine.run_turn, original)
+            for _ in range(10):
+                engine.run_turn()
+            state._shortest_path(("r0", (2, 5)), ("r1", (0, 2)), for_player=True)
+        self.assertIs(GameEngine.run_turn, original)
+
+        events = json.loads(path.read_text(encoding="utf-8"))["traceEvents"]
+        names = {event["name"] for event in events}
+        expected = {"run_turn", "resolve_player_action", "move_ghosts", "check_victory"}
+        self.assertTrue(expected <= names)
+        self.assertEqual(sum(event["name"] == "run_turn" for event in events), 10)
+        self.assertIn("shortest_path", names)
+        self.assertGreater(tracer.nodes_expanded, 0)
+        self.assertIn("bfs", {event["name"] for event in events if event["ph"] == "C"})
+
+    def test_importing_the_package_does_not_install_a_tracer(self) -> None:
+        original = GameEngine.run_turn
+        path = Path(tempfile.mkdtemp()) / "trace.json"
+        with mock.patch.dict(os.environ, {tracing.TRACE_ENV_VAR: str(path)}):
+            importlib.reload(haikyo_escape)
+        self.assertIsNone(tracing.active_tracer())
+        self.assertIs(GameEngine.run_turn, original)
+
+    def test_async_turns_and_speculation_threads_are_traced(self) -> None:
+        replay = ["move east"] * 4
+
+        async def async_choice(state, player):
+            await asyncio.sleep(0)
+            return replay.pop(0)
+
+        chased = chased_state(4)
+        with tracing.tracing() as tracer:
+            asyncio.run(AsyncGameEngine(create_game_state(3), async_choice).play(max_turns=4))
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                engine = GameEngine(chased, scripted([]), speculation_executor=executor)
+                for _ in range(5):
+                    engine.run_turn()
+                    executor.submit(time.sleep, 0.01).result()
+
+        spans = [event for event in tracer.events if event["ph"] == "X"]
+        self.assertEqual(sum(event["name"] == "run_turn" for event in spans), 4 + 5)
+        field_threads = {event["tid"] for event in spans if event["name"] == "pursuit_field"}
+        self.assertTrue(field_threads - {threading.get_ident()})
+
+    def test_counters_are_exact_across_threads(self) -> None:
+        tracer = tracing.Tracer()
+
+        def work() -> None:
+            for _ in range(10_000):
+                tracer.count_nodes(1)
+                tracer.complete("pursuit_field", 0, 1)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(work) for _ in range(8)]:
+                future.result()
+        self.assertEqual(tracer.nodes_expanded, 80_000)
+        self.assertEqual(len(tracer.events), 2 * 80_000)
+
+
+class MetricsTest(unittest.TestCase):
+    def test_phase_histograms_exclude_input_wait(self) -> None:
+        commands = scripted(["search", "move east", "move east", "wait"])
+
+        def slow_choice(state, player):
+            time.sleep(0.02)
+            return commands(state, player)
+
+        registry = MetricsRegistry()
+        state = create_game_state(7)
+        engine = GameEngine(state, slow_choice, metrics=registry)
+        for _ in range(4):
+            engine.run_turn()
+
+        snapshot = registry.snapshot()
+        decision = snapshot["histograms"]["phase.player_decision.seconds"]
+        self.assertEqual(decision["count"], 4)
+        self.assertLess(snapshot["histograms"]["turn.seconds"]["max"], 0.02)
+        self.assertEqual(snapshot["counters"]["log.records"], len(state.log))
+        self.assertGreater(snapshot["counters"]["items.scanned"], 0)
+
+    def test_histogram_percentiles_stay_within_relative_error(self) -> None:
+        histogram = Histogram(relative_error=0.01)
+        for value in range(1, 10001):
+            histogram.observe(value / 1000.0)
+        self.assertAlmostEqual(histogram.percentile(0.5), 5.0, delta=5.0 * 0.02)
+        self.assertAlmostEqual(histogram.percentile(0.99), 9.9, delta=9.9 * 0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
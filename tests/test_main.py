@@ -0,0 +1,58 @@
+"""CLI エントリ（src/main.py）のスクリプトモードのユニットテスト。"""
+
+import contextlib
+import io
+import json
+import unittest
+from unittest import mock
+
+import main
+
+
+class ScriptModeTest(unittest.TestCase):
+    def run_script(self, text: str, quiet: bool = True) -> str:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main.main(7, io.StringIO(text), quiet=quiet)
+        return output.getvalue()
+
+    def test_quiet_script_prints_only_json_summary(self) -> None:
+        errors = io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            output = self.run_script("# warm up\nhelp\nsearch\n\nmove east\ninventory\nwait\n")
+
+        lines = output.strip().splitlines()
+        self.assertEqual(len(lines), 1)
+        summary = json.loads(lines[0])
+        self.assertEqual(summary["seed"], 7)
+        self.assertEqual(summary["turns"], 3)
+        self.assertFalse(summary["is_over"])
+        # 表示系コマンドの出力は標準エラーへ回る。
+        self.assertIn("[Help", errors.getvalue())
+        self.assertIn("Inventory", errors.getvalue())
+
+    def test_script_stops_reading_after_game_over(self) -> None:
+        output = self.run_script("quit\nmove east\nmove east\n", quiet=False)
+
+        summary = json.loads(output.strip().splitlines()[-1])
+        self.assertEqual(summary["winner"], "quit")
+        self.assertEqual(summary["turns"], 1)
+        self.assertIn("=== Game Over ===", output)
+
+    def test_quiet_interactive_play_skips_room_descriptions(self) -> None:
+        for quiet in (True, False):
+            output = io.StringIO()
+            with mock.patch("builtins.input", side_effect=["search", "look", "quit"]):
+                with contextlib.redirect_stdout(output):
+                    main.main(7, quiet=quiet)
+            # `look` で求めたときだけ表示する。
+            self.assertEqual(output.getvalue().count("[Location]"), 1 if quiet else 3)
+
+    def test_seed_is_positional_and_optional(self) -> None:
+        args = main.parse_args(["42", "--script", "-", "--quiet"])
+        self.assertEqual((args.seed, args.script, args.quiet), (42, "-", True))
+        self.assertIsNone(main.parse_args([]).seed)
+
+
+if __name__ == "__main__":
+    unittest.main()
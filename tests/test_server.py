@@ -0,0 +1,119 @@
+"""セッション管理と行プロトコルのユニットテスト。"""
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from haikyo_escape.server import (
+    SessionError,
+    SessionLimitError,
+    SessionManager,
+    _serve_client,
+    handle_line,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SessionManagerTest(unittest.TestCase):
+    def test_step_returns_new_log_entries_and_trims_history(self) -> None:
+        manager = SessionManager(max_log_entries=3)
+        session = manager.create(seed=7)
+        entries = manager.step(session.session_id, "move east")
+        self.assertTrue(entries)
+        for _ in range(5):
+            manager.step(session.session_id, "wait")
+        self.assertLessEqual(len(session.state.log), 3)
+        with self.assertRaises(SessionError):
+            manager.step(session.session_id, "look")
+
+    def test_idle_sessions_are_evicted_and_cap_is_enforced(self) -> None:
+        clock = FakeClock()
+        manager = SessionManager(max_sessions=2, idle_timeout=10.0, clock=clock)
+        first = manager.create(seed=1)
+        clock.now = 5.0
+        second = manager.create(seed=2)
+        with self.assertRaises(SessionLimitError):
+            manager.create(seed=3)
+
+        clock.now = 12.0
+        manager.get(second.session_id)
+        third = manager.create(seed=3)  # 上限到達時はまず放置セッションを掃除する。
+        self.assertNotIn(first.session_id, manager)
+        self.assertIn(second.session_id, manager)
+        self.assertIn(third.session_id, manager)
+
+
+def exchange(manager, lines):
+    """`lines` を1接続で送り、受け取った応答の一覧を返す。"""
+    sent = []
+
+    class Writer:
+        def write(self, data):
+            sent.append(json.loads(data))
+
+        async def drain(self):
+            return None
+
+        def close(self):
+            return None
+
+    async def serve_lines():
+        reader = asyncio.StreamReader()
+        for line in lines:
+            reader.feed_data(line.encode("utf-8") + b"\n")
+        reader.feed_eof()
+        await _serve_client(manager, reader, Writer())
+
+    asyncio.run(serve_lines())
+    return sent
+
+
+class ProtocolTest(unittest.TestCase):
+    def test_line_protocol_round_trip(self) -> None:
+        manager = SessionManager()
+        created = exchange(manager, ["new 7"])[0]
+        session_id = created["session"]
+        responses = exchange(
+            manager,
+            [f"{session_id} search", f"{session_id} look", f"{session_id} dance", "stats"],
+        )
+        self.assertTrue(responses[0]["ok"])
+        self.assertEqual(responses[0]["turn"], 1)
+        self.assertEqual(responses[1]["room"], "r0")
+        self.assertFalse(responses[2]["ok"])
+        self.assertEqual(responses[3]["sessions"], 1)
+
+        self.assertTrue(handle_line(manager, f"{session_id} quit")["over"])
+        self.assertNotIn(session_id, manager)
+
+    def test_only_a_bad_seed_is_reported_as_a_seed_error(self) -> None:
+        manager = SessionManager()
+        response = handle_line(manager, "new seven")
+        self.assertEqual(response, {"ok": False, "error": "seed must be an integer"})
+        session_id = handle_line(manager, "new 3")["session"]
+        with mock.patch.object(manager, "step", side_effect=ValueError("engine bug")):
+            with self.assertRaisesRegex(ValueError, "engine bug"):
+                handle_line(manager, f"{session_id} wait")
+
+    def test_engine_error_is_reported_and_the_connection_stays_open(self) -> None:
+        manager = SessionManager()
+        session_id = handle_line(manager, "new 3")["session"]
+        with mock.patch.object(manager, "step", side_effect=RuntimeError("engine bug")):
+            with self.assertLogs("haikyo_escape.server", level="ERROR") as logs:
+                responses = exchange(manager, [f"{session_id} wait", "stats"])
+        self.assertEqual(responses[0], {"ok": False, "error": "internal error"})
+        self.assertIn("engine bug", logs.output[0])
+        self.assertEqual(responses[1]["sessions"], 1)
+        self.assertTrue(exchange(manager, [f"{session_id} wait"])[0]["ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
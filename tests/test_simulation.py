@@ -0,0 +1,311 @@
+"""自動シミュレーションと結果集計まわりのユニットテスト。"""
+
+import asyncio
+import io
+import json
+import random
+import statistics
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from haikyo_escape.balance import BalanceConfig
+from haikyo_escape.events import EventBus
+from haikyo_escape.heatmap import (
+    CATCHES,
+    SEARCHES,
+    VISITS,
+    Heatmap,
+    TileIndex,
+    collect_heatmap,
+    default_index,
+    render_heatmap,
+)
+from haikyo_escape.loadgen import ThinkTime, run_load
+from haikyo_escape.metrics import TURN_SECONDS
+from haikyo_escape.outcome_store import OutcomeStore
+from haikyo_escape.simulation import GameOutcome, OutcomeSummary, create_game_state, play_game
+from haikyo_escape.stats import KLLSketch, RunningMoments, StreamingStats
+from haikyo_escape import simulation, sweep
+from haikyo_escape.sweep import expand_grid, run_sweep
+
+
+def make_outcome(seed: int, winner, turns: int, catch=None) -> GameOutcome:
+    return GameOutcome(
+        seed=seed,
+        winner=winner,
+        turn_count=turns,
+        total_steps=turns,
+        action_count=turns,
+        first_spawn_turn=None,
+        second_spawn_turn=None,
+        items_used=0,
+        catch_room_id=catch[0] if catch else None,
+        catch_position=catch[1] if catch else None,
+    )
+
+
+class SimulationTest(unittest.TestCase):
+    def test_same_seed_replays_identically(self) -> None:
+        self.assertEqual(play_game(3), play_game(3))
+
+
+class LoadGeneratorTest(unittest.TestCase):
+    def test_reports_throughput_and_phase_latencies(self) -> None:
+        report = asyncio.run(
+            run_load(20, duration=0.2, think_time=ThinkTime(median=0.002, sigma=0.5), seed=1)
+        )
+        summary = report.summary()
+
+        self.assertGreater(report.turns, 20)
+        self.assertGreater(summary["turns_per_second"], 0)
+        self.assertGreaterEqual(summary["games_started"], 20)
+        phases = summary["phases"]
+        self.assertIn("phase.player_decision.seconds", phases)
+        self.assertIsNotNone(phases[TURN_SECONDS]["p99"])
+
+    def test_rejects_empty_load(self) -> None:
+        with self.assertRaises(ValueError):
+            asyncio.run(run_load(0, duration=0.1))
+
+
+class OutcomeStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+
+    def test_append_reopen_and_filter(self) -> None:
+        with OutcomeStore(self._tmp.name, buffer_rows=2) as store:
+            store.append(make_outcome(1, "player", 30))
+            store.append(make_outcome(2, "ghosts", 12, ("r4", (1, 2))))
+            store.append(make_outcome(3, "player", 50))
+            store.append(make_outcome(4, None, 500))
+
+        store = OutcomeStore(self._tmp.name)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(list(store.column("seed")), [1, 2, 3, 4])
+        wins = store.query().where("winner", "==", "player")
+        self.assertEqual(wins.count(), 2)
+        self.assertEqual(wins.mean("turn_count"), 40)
+        self.assertEqual(wins.where("turn_count", "<", 40).count(), 1)
+        caught = store.query().where("catch_room", "==", "r4")
+        self.assertEqual(list(caught.values("catch_x")), [1])
+        self.assertEqual(store.query().value_counts("winner"), {None: 1, "player": 2, "ghosts": 1})
+
+    def test_torn_append_is_truncated_on_open(self) -> None:
+        with OutcomeStore(self._tmp.name) as store:
+            store.append(make_outcome(1, "player", 10))
+        # 1列だけ余分なバイトが残った（書き込み途中で落ちた）状態を再現する。
+        with open(store._path("seed"), "ab") as handle:
+            handle.write(b"\x00" * 3)
+
+        reopened = OutcomeStore(self._tmp.name)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(list(reopened.column("seed")), [1])
+
+    def test_large_procedural_coordinates_fit_and_overflow_is_rejected(self) -> None:
+        with OutcomeStore(self._tmp.name) as store:
+            store.append(make_outcome(1, "ghosts", 20, ("r40000", (300, 200))))
+            with self.assertRaises(ValueError):
+                store.append(make_outcome(2, "player", 10 ** 12))
+            store.append(make_outcome(3, "player", 15))
+        self.assertEqual(list(store.column("seed")), [1, 3])
+        self.assertEqual(list(store.column("catch_x")), [300, -1])
+        self.assertEqual(store.query().where("catch_room", "==", "r40000").count(), 1)
+
+
+class StreamingStatsTest(unittest.TestCase):
+    def test_merged_moments_match_the_whole_series(self) -> None:
+        rng = random.Random(4)
+        values = [rng.gauss(40, 12) for _ in range(1000)]
+        parts = [RunningMoments() for _ in range(3)]
+        for index, value in enumerate(values):
+            parts[index % 3].observe(value)
+        merged = RunningMoments()
+        for part in parts:
+            merged.merge(part)
+        self.assertEqual(merged.count, 1000)
+        self.assertAlmostEqual(merged.mean, statistics.fmean(values), places=9)
+        self.assertAlmostEqual(merged.stdev, statistics.stdev(values), places=9)
+        self.assertEqual((merged.min, merged.max), (min(values), max(values)))
+
+    def test_sketch_stays_small_and_accurate(self) -> None:
+        rng = random.Random(9)
+        values = [rng.expovariate(1 / 50) for _ in range(100_000)]
+        parts = [KLLSketch() for _ in range(4)]
+        for index, value in enumerate(values):
+            parts[index % 4].observe(value)
+        sketch = KLLSketch()
+        for part in parts:
+            sketch.merge(part)
+
+        self.assertEqual(sketch.count, len(values))
+        self.assertLess(len(sketch), 1000)
+        ordered = sorted(values)
+        for fraction in (0.5, 0.9, 0.99):
+            estimate = sketch.percentile(fraction)
+            true_rank = sum(1 for value in ordered if value <= estimate) / len(ordered)
+            self.assertAlmostEqual(true_rank, fraction, delta=0.02)
+
+    def test_small_series_are_exact_and_deterministic(self) -> None:
+        first, second = StreamingStats(), StreamingStats()
+        for value in [5, 1, 4, 2, 3]:
+            first.observe(value)
+            second.observe(value)
+        self.assertEqual(first.percentile(0.5), 3)
+        self.assertEqual(first.summary(), second.summary())
+        self.assertIsNone(StreamingStats().summary()["p50"])
+
+    def test_outcome_summary_counts_winners_and_series(self) -> None:
+        summary = OutcomeSummary()
+        summary.add(make_outcome(1, "player", 30))
+        other = OutcomeSummary()
+        other.add(make_outcome(2, "ghosts", 10, catch=("r3", (4, 0))))
+        other.add(make_outcome(3, None, 500))
+        summary.merge(other)
+        self.assertEqual(summary.games, 3)
+        self.assertAlmostEqual(summary.rate("player"), 1 / 3)
+        self.assertEqual(summary.series["catch_turns"].percentile(0.5), 10)
+        self.assertEqual(summary.summary()["turns"]["max"], 500)
+
+
+class BalanceSweepTest(unittest.TestCase):
+    def test_default_balance_keeps_the_original_rules(self) -> None:
+        self.assertEqual(play_game(5, balance=BalanceConfig()), play_game(5))
+
+    def test_from_params_reads_durations_and_rejects_unknown_keys(self) -> None:
+        config = BalanceConfig.from_params({"spawn_one_in": 3, "duration.GHOST_FREEZE": 4})
+        self.assertEqual(config.spawn_one_in, 3)
+        self.assertEqual(config.item_durations, {"GHOST_FREEZE": 4})
+        with self.assertRaises(ValueError):
+            BalanceConfig.from_params({"aggression": 1})
+        with self.assertRaises(ValueError):
+            BalanceConfig.from_params({"spawn_one_in": 0})
+
+    def test_grid_expands_to_the_cartesian_product(self) -> None:
+        points = expand_grid({"spawn_one_in": [4, 6], "first_spawn_interval": [3, 5, 7]})
+        self.assertEqual(len(points), 6)
+        self.assertEqual(points[1], {"spawn_one_in": 4, "first_spawn_interval": 5})
+
+    def test_parallel_sweep_matches_in_process_sweep(self) -> None:
+        grid = {"spawn_one_in": [2, 12]}
+        output = io.StringIO()
+        local = run_sweep(grid, games=12, workers=0, chunk_size=5, output=output)
+        pooled = run_sweep(grid, games=12, workers=2, chunk_size=5)
+        # チャンクは完了順ではなく開始シードの順に統合するので、ワーカー数によらず一致する。
+        self.assertEqual([r.to_dict() for r in local], [r.to_dict() for r in pooled])
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(row["point"] for row in rows), [0, 1])
+        self.assertTrue(all(row["games"] == 12 and row["turns"]["count"] == 12 for row in rows))
+        # 出現確率を上げた点のほうが捕まりやすい。
+        self.assertGreaterEqual(local[0].summary.rate("ghosts"), local[1].summary.rate("ghosts"))
+
+    def test_interrupted_sweep_resumes_to_identical_results(self) -> None:
+        grid = {"spawn_one_in": [3, 9], "first_spawn_interval": [4]}
+        options = dict(games=9, seed=20, chunk_size=2, workers=0)
+        expected = io.StringIO()
+        run_sweep(grid, output=expected, **options)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "sweep.ckpt"
+            output = io.StringIO()
+            calls = []
+            real_chunk = sweep.run_chunk
+
+            def flaky_chunk(chunk):
+                calls.append(chunk)
+                if len(calls) == 7:
+                    raise KeyboardInterrupt
+                return real_chunk(chunk)
+
+            with mock.patch.object(sweep, "run_chunk", flaky_chunk):
+                with self.assertRaises(KeyboardInterrupt):
+                    run_sweep(
+                        grid, output=output, checkpoint=path, checkpoint_interval=0.0, **options
+                    )
+            self.assertTrue(path.exists())
+            self.assertEqual(len(output.getvalue().splitlines()), 1)  # 1点目の5チャンクだけ終わっている。
+
+            calls.clear()
+            def counting_chunk(chunk):
+                calls.append(chunk)
+                return real_chunk(chunk)
+
+            with mock.patch.object(sweep, "run_chunk", counting_chunk):
+                results = run_sweep(grid, output=output, checkpoint=path, **options)
+            self.assertEqual(len(calls), 4)  # 2点目の残りのチャンクだけを回す。
+            self.assertEqual(output.getvalue(), expected.getvalue())
+            self.assertEqual(results[0].to_dict(), json.loads(expected.getvalue().splitlines()[0]))
+
+            with self.assertRaises(ValueError):
+                run_sweep({"spawn_one_in": [5]}, checkpoint=path, **options)
+
+    def test_procedural_sweep_reuses_cached_dungeons(self) -> None:
+        grid = {"spawn_one_in": [3, 9]}
+        dungeon = {"columns": 4, "rows": 3}
+        options = dict(games=4, chunk_size=2, workers=0, max_turns=60, dungeon=dungeon)
+        uncached = run_sweep(grid, **options)
+        with tempfile.TemporaryDirectory() as directory:
+            built = []
+            real_build = simulation.build_procedural_dungeon
+
+            def counting_build(*args, **kwargs):
+                built.append(args)
+                return real_build(*args, **kwargs)
+
+            with mock.patch.object(simulation, "build_procedural_dungeon", counting_build):
+                cached = run_sweep(grid, cache_dir=directory, **options)
+                self.assertEqual(len(built), 4)  # 2点目は1点目が保存したダンジョンを復元する。
+                run_sweep(grid, cache_dir=directory, **options)
+                self.assertEqual(len(built), 4)
+        self.assertEqual([r.to_dict() for r in cached], [r.to_dict() for r in uncached])
+        standard = run_sweep(grid, **{**options, "dungeon": None})
+        self.assertNotEqual(uncached[0].to_dict(), standard[0].to_dict())
+        with self.assertRaises(ValueError):
+            run_sweep(grid, **{**options, "dungeon": {"columns": 0}})
+
+
+class HeatmapTest(unittest.TestCase):
+    def test_index_is_row_major_over_rooms_height_width(self) -> None:
+        index = default_index()
+        self.assertEqual(index.shape, (9, 6, 6))
+        self.assertEqual(index.offset("r0", (1, 0)), 1)
+        self.assertEqual(index.offset("r1", (0, 1)), 36 + 6)
+
+    def test_counts_follow_the_game(self) -> None:
+        heatmap = Heatmap(default_index())
+        bus = EventBus()
+        heatmap.attach(bus)
+        outcomes = [play_game(seed, events=bus) for seed in range(6)]
+
+        self.assertEqual(heatmap.total(VISITS), sum(o.total_steps for o in outcomes))
+        caught = [o for o in outcomes if o.winner == "ghosts"]
+        self.assertEqual(heatmap.total(CATCHES), len(caught))
+        for outcome in caught:
+            catches = heatmap.count(CATCHES, outcome.catch_room_id, outcome.catch_position)
+            self.assertGreater(catches, 0)
+        self.assertGreater(heatmap.total(SEARCHES), 0)
+
+    def test_partial_heatmaps_merge_by_summation(self) -> None:
+        local = collect_heatmap(range(8), workers=0, chunk_size=3)
+        pooled = collect_heatmap(range(8), workers=2, chunk_size=3)
+        self.assertEqual(local.games, 8)
+        self.assertEqual(local.counts, pooled.counts)
+
+        other = Heatmap(TileIndex(("r0",), 6, 6))
+        with self.assertRaises(ValueError):
+            local.merge(other)
+
+    def test_render_draws_walls_and_counts(self) -> None:
+        heatmap = Heatmap(default_index())
+        heatmap.add(VISITS, "r0", (0, 0), 5)
+        text = render_heatmap(heatmap, VISITS, rooms=create_game_state(0).rooms)
+        lines = text.splitlines()
+        self.assertIn("r0", lines[1])
+        self.assertEqual(lines[3][:3], "|@ ")  # 最大値のマスは最も濃い記号になる。
+        self.assertIn("#", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,15 @@
 """廃墟脱出ゲーム用 GameState のユニットテスト。"""
 
+import random
 import unittest
+from collections import Counter
 
+from haikyo_escape.dungeon import build_default_dungeon
 from haikyo_escape.entities import Ghost, Item, ItemType, Player
+from haikyo_escape.loot import AliasTable, LootEntry, LootTable, LootTables
 from haikyo_escape.room import Door, Room
-from haikyo_escape.state import ActionResult, GameState
+from haikyo_escape.state import ROOM_FREEZE_EFFECT, SPEED_BOOST_EFFECT, ActionResult, GameState
+from haikyo_escape.timers import TimerWheel
 from haikyo_escape.types import Direction
 
 
@@ -125,6 +130,174 @@ class GameStateTest(unittest.TestCase):
         self.assertFalse(room.is_fragile_wall((4, 3)))
         self.assertTrue(any("brittle wall" in entry for entry in state.log))
 
+    def test_broken_wall_stays_local_to_one_game(self) -> None:
+        first = build_default_dungeon()
+        second = build_default_dungeon()
+        self.assertIs(first.rooms["r2"].layout, second.rooms["r2"].layout)
+
+        first.rooms["r2"].remove_wall((4, 4))
+
+        self.assertTrue(first.rooms["r2"].is_walkable((4, 4)))
+        self.assertFalse(first.rooms["r2"].has_fragile_walls())
+        self.assertFalse(second.rooms["r2"].is_walkable((4, 4)))
+        self.assertTrue(second.rooms["r2"].is_fragile_wall((4, 4)))
+        self.assertIn((4, 4), second.rooms["r2"].layout.walls)
+
+    def advance_turn(self, state: GameState) -> None:
+        state.turn_count += 1
+        state.tick_start_of_turn()
+
+    def test_speed_boost_expires_after_duration(self) -> None:
+        state = self.make_state()
+        state.apply_speed_boost(3)
+        speeds = []
+        for _ in range(4):
+            self.advance_turn(state)
+            speeds.append(state.player.current_speed)
+        self.assertEqual(speeds, [2, 2, 1, 1])
+
+    def test_effect_counters_are_set_while_active_only(self) -> None:
+        state = self.make_state()
+        state.apply_speed_boost(3)
+        self.advance_turn(state)
+        self.assertEqual(state.effect_remaining(SPEED_BOOST_EFFECT, state.player.entity_id), 2)
+        self.assertEqual(state.player.speed_turns_remaining, 3)  # 付与時の値のまま。
+        self.advance_turn(state)
+        self.advance_turn(state)
+        self.assertEqual(state.player.speed_turns_remaining, 0)
+        self.assertFalse(hasattr(state.player, "apply_speed_boost"))
+        self.assertFalse(hasattr(state.ghosts[0], "tick_effects"))
+
+    def test_reapplied_freeze_keeps_later_deadline(self) -> None:
+        state = self.make_state()
+        ghost = state.ghosts[0]
+        state.freeze_ghost(ghost, 2)
+        self.advance_turn(state)
+        state.freeze_ghost(ghost, 4)  # 残り1ターンを4ターンへ延長する。
+        self.advance_turn(state)
+        self.advance_turn(state)
+        self.assertGreater(ghost.frozen_turns, 0)
+        self.advance_turn(state)
+        self.advance_turn(state)
+        self.assertEqual(ghost.frozen_turns, 0)
+
+    def test_room_freeze_wears_off_once_due(self) -> None:
+        state = self.make_state()
+        state.freeze_room("room_b", 2)
+        self.advance_turn(state)
+        self.assertTrue(state.is_room_frozen("room_b"))
+        self.assertEqual(state.effect_remaining(ROOM_FREEZE_EFFECT, "room_b"), 1)
+        self.advance_turn(state)
+        self.assertFalse(state.is_room_frozen("room_b"))
+        self.assertEqual(state.log[-1], "The ghost-freeze effect in room_b wears off.")
+
+
+class StateDeltaTest(unittest.TestCase):
+    make_state = GameStateTest.make_state
+
+    def test_first_diff_is_full_then_only_changes(self) -> None:
+        state = self.make_state()
+        full = state.diff_since(0)
+        self.assertTrue(full.full)
+        self.assertIn("ghost", full.ghosts)
+
+        state.move_player_step(Direction.WEST)
+        change = state.diff_since(full.version)
+
+        self.assertFalse(change.full)
+        self.assertEqual(change.player, ["room_a", 3, 2])
+        self.assertEqual(change.ghosts, {})
+        self.assertEqual(change.log, ["Player moved to (3, 2) in room_a."])
+        self.assertEqual(state.diff_since(change.version).log, [])
+
+    def test_same_range_is_memoised_for_many_spectators(self) -> None:
+        state = self.make_state()
+        version = state.diff_since(0).version
+        state.apply_speed_boost(3)
+        first = state.diff_since(version)
+        second = state.diff_since(version)
+
+        self.assertIs(first, second)
+        self.assertIs(first.to_json(), second.to_json())
+        self.assertEqual(first.effects, {f"{SPEED_BOOST_EFFECT}:player": 3})
+
+    def test_trimmed_log_and_expired_effects(self) -> None:
+        state = self.make_state()
+        version = state.diff_since(0).version
+        state.freeze_room("room_b", 1)
+        for index in range(5):
+            state.record(f"entry {index}")
+        state.trim_log(2)
+        state.turn_count += 1
+        state.tick_start_of_turn()
+
+        change = state.diff_since(version)
+        # 削られた記録は返せないため、残っている範囲から返す。
+        expected = ["entry 3", "entry 4", "The ghost-freeze effect in room_b wears off."]
+        self.assertEqual(change.log, expected)
+        self.assertEqual(change.effects, {f"{ROOM_FREEZE_EFFECT}:room_b": 0})
+
+
+class TimerWheelTest(unittest.TestCase):
+    def test_fires_only_due_keys_across_laps(self) -> None:
+        wheel = TimerWheel(slots=4)
+        wheel.schedule(2, "soon")
+        wheel.schedule(6, "next lap")
+        self.assertEqual(wheel.advance(1), [])
+        self.assertEqual(wheel.advance(2), ["soon"])
+        self.assertEqual(wheel.advance(5), [])
+        self.assertEqual(wheel.advance(6), ["next lap"])
+        self.assertEqual(len(wheel), 0)
+
+    def test_large_jump_fires_everything_due_in_order(self) -> None:
+        wheel = TimerWheel(slots=4)
+        for due, key in ((9, "c"), (3, "a"), (5, "b"), (40, "later")):
+            wheel.schedule(due, key)
+        self.assertEqual(wheel.advance(20), ["a", "b", "c"])
+        self.assertEqual(wheel.advance(40), ["later"])
+
+
+class LootTableTest(unittest.TestCase):
+    def test_alias_table_matches_weights(self) -> None:
+        table = AliasTable([1.0, 0.0, 3.0, 4.0])
+        rng = random.Random(0)
+        counts = Counter(table.sample(rng) for _ in range(40_000))
+        self.assertNotIn(1, counts)
+        for index, share in ((0, 0.125), (2, 0.375), (3, 0.5)):
+            self.assertAlmostEqual(counts[index] / 40_000, share, delta=0.01)
+
+    def test_rejects_invalid_weights(self) -> None:
+        with self.assertRaises(ValueError):
+            AliasTable([])
+        with self.assertRaises(ValueError):
+            AliasTable([0.0, 0.0])
+
+    def test_draws_do_not_depend_on_search_order(self) -> None:
+        entries = [LootEntry("a", "A", ItemType.LORE, 1.0), LootEntry("b", "B", ItemType.LORE, 1.0)]
+        table = LootTable(entries, 1.0)
+        loot = LootTables(seed=5, default=table)
+        tiles = [("r0", (x, y)) for x in range(6) for y in range(6)]
+        forward = {tile: loot.draw(*tile) for tile in tiles}
+        backward = {tile: loot.draw(*tile) for tile in reversed(tiles)}
+        self.assertEqual(forward, backward)
+        self.assertIn(None, forward.values())
+
+    def test_search_draws_each_explore_tile_once(self) -> None:
+        state = GameStateTest.make_state(self)
+        charm = LootEntry("charm", "Charm", ItemType.GHOST_FREEZE, 1.0, {"duration": 2})
+        only_freeze = LootTable([charm])
+        state.loot = LootTables(seed=1, rooms={"room_a": only_freeze})
+        before = len(state.items)
+
+        state.player.set_position((3, 3))  # 探索マスではないので抽選しない。
+        self.assertEqual(state.reveal_items_at_player(), [])
+        state.player.set_position((4, 2))
+        revealed = state.reveal_items_at_player()
+        self.assertEqual([item.item_id for item in revealed], ["charm@room_a:4,2"])
+        self.assertEqual(revealed[0].metadata, {"duration": 2})
+        self.assertEqual(state.reveal_items_at_player(), [])
+        self.assertEqual(len(state.items), before + 1)
+
 
 if __name__ == "__main__":
     unittest.main()